@@ -25,9 +25,15 @@ import RTC
 import rtctree.tree
 import rtctree.utils
 import sys
+import threading
 
 from rtshell import gen_comp
 from rtshell import rts_exceptions
+from rtshell import trees
+
+
+# The pool that components are made in, or None for a manager per component
+_pool = None
 
 
 def find_comp_in_mgr(name, mgr):
@@ -114,8 +120,22 @@ def choose_name(base, tree):
     return base + '{0}'.format(matches[-1] + 1)
 
 
+def set_pool(pool):
+    '''Set the ManagerPool that make_comp() makes components in.
+
+    Set to None to start a new manager for each component.
+
+    '''
+    global _pool
+    _pool = pool
+
+
 def make_comp(name_base, tree, cons, port_specs, event=None, rate=1.0,
         max=-1, **kwargs):
+    if _pool is not None:
+        name, comp = _pool.create_comp(name_base, tree, cons, port_specs,
+                event=event, rate=rate, max=max, **kwargs)
+        return name, _pool.manager
     name = choose_name(name_base, tree)
     mgr = OpenRTM_aist.Manager.init(1, [sys.argv[0]])
     mgr.setModuleInitProc(gen_comp.make_init(name, cons, port_specs,
@@ -130,28 +150,55 @@ def delete_comp(mgr, comp):
     mgr.deleteComponent(comp=comp)
 
 
-def shutdown(mgr):
-    '''Shut down the manager.'''
+def shutdown(mgr, comp=None):
+    '''Shut down the manager.
+
+    If the manager is the pool's, only the component is deleted and the
+    manager is left running.
+
+    '''
+    if _pool is not None and mgr is _pool.manager:
+        if comp is not None:
+            _pool.delete_comp(comp)
+        return
     mgr.shutdown()
     mgr.join()
 
 
-def connect(comp, port_specs, tree):
+def connect(comp, port_specs, tree, props=None):
+    '''Connect the ports of a generated component to their targets.
+
+    @param comp The component.
+    @param port_specs The component's port specifications.
+    @param tree An RTCTree holding the target components.
+    @param props The connector properties, as made by conn_opts.make_props().
+                 If None, each value is pushed through a CORBA call as it is
+                 written.
+
+    '''
     def find_local_port(name, ports):
         for p in ports:
             if p.get_port_profile().name.split('.')[-1] == name:
                 return p
         raise rts_exceptions.PortNotFoundError(comp.getTypeName(), name)
 
-    props = {'dataport.dataflow_type':'push',
-            'dataport.interface_type':'corba_cdr',
-            'dataport.subscription_type':'flush'}
+    if props is None:
+        props = {'dataport.dataflow_type':'push',
+                'dataport.interface_type':'corba_cdr',
+                'dataport.subscription_type':'flush'}
+    props = dict(props)
     ports = comp.get_ports()
     conns = []
     for p in port_specs:
         local_port = find_local_port(p.name, ports)
         for t in p.targets:
             dest_port = find_port(t[0], t[1], tree)
+            # Ports list the interface types they support
+            supported = dest_port.properties.get('dataport.interface_type')
+            if supported and props['dataport.interface_type'] not in \
+                    [i.strip() for i in supported.split(',')]:
+                raise rts_exceptions.InterfaceNotSupportedError(t[0], t[1],
+                        props['dataport.interface_type'])
             props['dataport.data_type'] = \
                     dest_port.properties['dataport.data_type']
             prof = RTC.ConnectorProfile(p.name + '_' + t[1],
@@ -192,3 +239,110 @@ def deactivate(comp):
         if ec.deactivate_component(comp.getObjRef()) != RTC.RTC_OK:
             raise rts_exceptions.DeactivateError(comp.getTypeName())
 
+
+
+###############################################################################
+## Manager pool
+##
+## Starting a manager takes far longer than creating a component in it, so a
+## process that makes many components (for example, one running rtprint,
+## rtlog and rtinject repeatedly from a test harness) can keep one manager
+## running in a ManagerPool and create and delete the components in it. Each
+## component gets its own factory, named after the component, which is
+## unregistered when the component is deleted so that the name can be used
+## again. The pool's ORB is given to the trees made by the commands, so that a
+## tree never shuts down the ORB the manager is using.
+
+class ManagerPool(object):
+    def __init__(self, *args, **kwargs):
+        '''Constructor.
+
+        Starts the pool's manager.
+
+        '''
+        super(ManagerPool, self).__init__()
+        self._mutex = threading.Lock()
+        self._names = set()
+        self._mgr = OpenRTM_aist.Manager.init(1, [sys.argv[0]])
+        self._mgr.activateManager()
+        self._mgr.runManager(True)
+        trees.set_orb(self._mgr.getORB())
+
+    @property
+    def manager(self):
+        '''The pool's manager, or None if the pool has been shut down.'''
+        with self._mutex:
+            return self._mgr
+
+    @property
+    def names(self):
+        '''The names of the components in the pool.'''
+        with self._mutex:
+            return sorted(self._names)
+
+    def create_comp(self, name_base, tree, cons, port_specs, event=None,
+            rate=1.0, max=-1, **kwargs):
+        '''Create a generated component in the pool's manager.
+
+        The parameters are those of make_comp().
+
+        @return A tuple of the component's name and the component.
+
+        '''
+        with self._mutex:
+            name = choose_name(name_base, tree)
+            # Components still in the pool may not be in the tree
+            index = int(name[len(name_base):])
+            while name in self._names:
+                index += 1
+                name = name_base + str(index)
+            self._names.add(name)
+            mgr = self._mgr
+        comp = gen_comp.make_init(name, cons, port_specs, event=event,
+                rate=rate, max=max, **kwargs)(mgr)
+        if not comp:
+            self._forget(name)
+            raise rts_exceptions.MissingCompError(name)
+        return name, comp
+
+    def delete_comp(self, comp):
+        '''Delete a component made by create_comp().
+
+        Does nothing if the pool has been shut down, as the component was
+        deleted with the manager.
+
+        '''
+        name = comp.getTypeName()
+        with self._mutex:
+            mgr = self._mgr
+        if mgr is None:
+            return
+        mgr.deleteComponent(comp=comp)
+        self._forget(name)
+
+    def shutdown(self):
+        '''Shut down the pool's manager and every component in it.
+
+        If make_comp() is using this pool, it goes back to starting a new
+        manager for each component.
+
+        '''
+        global _pool
+        if _pool is self:
+            _pool = None
+        with self._mutex:
+            mgr, self._mgr = self._mgr, None
+            self._names.clear()
+        if mgr is None:
+            return
+        trees.set_orb(None)
+        mgr.shutdown()
+        mgr.join()
+
+    def _forget(self, name):
+        with self._mutex:
+            mgr = self._mgr
+            self._names.discard(name)
+        if mgr is None:
+            return
+        mgr.unregisterFactory(name)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Command line options for the connections made by generated components.
+
+'''
+
+
+import optparse
+
+from rtshell import rts_exceptions
+
+
+# When the publisher sends data: for each value as it is written (blocking
+# the writer until it is received), from its own thread when a new value is
+# written, or from its own thread at a fixed rate
+SUBSCRIPTION_TYPES = ['flush', 'new', 'periodic']
+# Which values a new or periodic publisher sends
+PUSH_POLICIES = ['all', 'fifo', 'skip', 'new']
+# What a full buffer does with a new value
+FULL_POLICIES = ['overwrite', 'do_nothing', 'block']
+# What reading an empty buffer gives
+EMPTY_POLICIES = ['readback', 'do_nothing', 'block']
+# Interface type used if none is given
+DEFAULT_INTERFACE = 'corba_cdr'
+
+
+def add_options(parser):
+    '''Add the connection options to an OptionParser.'''
+    def property_callback(option, opt, option_value, parser):
+        if option_value.count('=') != 1:
+            raise optparse.OptionValueError('Bad property format: {0}'.format(
+                option_value))
+        key, equals, value = option_value.partition('=')
+        if not getattr(parser.values, option.dest):
+            setattr(parser.values, option.dest, {})
+        getattr(parser.values, option.dest)[key] = value
+
+    parser.add_option('--buffer-length', dest='buffer_length',
+            action='store', type='int', default=None, metavar='N',
+            help='Length of the connection buffer. [Default: the port\'s]')
+    parser.add_option('--conn-property', dest='conn_properties',
+            action='callback', callback=property_callback, type='string',
+            metavar='KEY=VALUE',
+            help='Other connection property, such as '
+            'dataport.buffer.write.timeout=0.1. May be given more than once.')
+    parser.add_option('--empty-policy', dest='empty_policy', action='store',
+            type='choice', choices=EMPTY_POLICIES, default=None,
+            help='What reading an empty connection buffer does: {0}. '
+            '[Default: the port\'s]'.format(', '.join(EMPTY_POLICIES)))
+    parser.add_option('--full-policy', dest='full_policy', action='store',
+            type='choice', choices=FULL_POLICIES, default=None,
+            help='What writing to a full connection buffer does: {0}. '
+            '[Default: the port\'s]'.format(', '.join(FULL_POLICIES)))
+    parser.add_option('--interface', dest='interface', action='store',
+            type='string', default=DEFAULT_INTERFACE,
+            help='Interface type of the connection, such as corba_cdr or '
+            'shared_memory. [Default: %default]')
+    parser.add_option('--push-policy', dest='push_policy', action='store',
+            type='choice', choices=PUSH_POLICIES, default=None,
+            help='Which values a new or periodic subscription sends: {0}. '
+            '[Default: the port\'s]'.format(', '.join(PUSH_POLICIES)))
+    parser.add_option('--push-rate', dest='push_rate', action='store',
+            type='float', default=None, metavar='HZ',
+            help='Rate at which a periodic subscription sends values. '
+            '[Default: the port\'s]')
+    parser.add_option('--skip-count', dest='skip_count', action='store',
+            type='int', default=None, metavar='N',
+            help='Number of values skipped between values sent with the skip '
+            'push policy. [Default: the port\'s]')
+    parser.add_option('--subscription', dest='subscription', action='store',
+            type='choice', choices=SUBSCRIPTION_TYPES, default='flush',
+            help='Subscription type of the connection: flush (send each '
+            'value as it is written), new (send new values from a separate '
+            'thread) or periodic (send values from a separate thread at the '
+            'push rate). [Default: %default]')
+
+
+def make_props(options):
+    '''Make the connection properties from the connection options.
+
+    @param options The options parsed by an OptionParser given to
+                   add_options().
+    @return A dictionary of connector properties.
+    @raises BadConnectionOptionError
+
+    '''
+    if options.push_rate is not None:
+        if options.subscription != 'periodic':
+            raise rts_exceptions.BadConnectionOptionError(
+                    '--push-rate requires the periodic subscription type')
+        if options.push_rate <= 0:
+            raise rts_exceptions.BadConnectionOptionError(
+                    '--push-rate must be positive')
+    if options.push_policy is not None and options.subscription == 'flush':
+        raise rts_exceptions.BadConnectionOptionError(
+                '--push-policy requires the new or periodic subscription type')
+    if options.skip_count is not None:
+        if options.push_policy != 'skip':
+            raise rts_exceptions.BadConnectionOptionError(
+                    '--skip-count requires the skip push policy')
+        if options.skip_count < 0:
+            raise rts_exceptions.BadConnectionOptionError(
+                    '--skip-count must not be negative')
+    if options.buffer_length is not None and options.buffer_length < 1:
+        raise rts_exceptions.BadConnectionOptionError(
+                '--buffer-length must be at least 1')
+
+    props = {'dataport.dataflow_type': 'push',
+            'dataport.interface_type': options.interface,
+            'dataport.subscription_type': options.subscription}
+    if options.push_rate is not None:
+        props['dataport.publisher.push_rate'] = str(options.push_rate)
+    if options.push_policy is not None:
+        props['dataport.publisher.push_policy'] = options.push_policy
+    if options.skip_count is not None:
+        props['dataport.publisher.skip_count'] = str(options.skip_count)
+    if options.buffer_length is not None:
+        props['dataport.buffer.length'] = str(options.buffer_length)
+    if options.full_policy is not None:
+        props['dataport.buffer.write.full_policy'] = options.full_policy
+    if options.empty_policy is not None:
+        props['dataport.buffer.read.empty_policy'] = options.empty_policy
+    if options.conn_properties:
+        props.update(options.conn_properties)
+    return props
+
+
+# vim: tw=79
@@ -0,0 +1,549 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Server process that runs commands with a warm ORB, and the client that
+passes commands to it.
+
+'''
+
+
+from __future__ import print_function
+
+import functools
+import importlib
+import json
+import os
+import os.path
+import socket
+import stat
+import sys
+import tempfile
+import traceback
+
+from rtshell import rts_exceptions
+from rtshell import trees
+
+
+# Set this environment variable to the path of the daemon's socket to use a
+# socket other than the default
+SOCKET_VAR = 'RTSHELL_DAEMON_SOCKET'
+# Set this environment variable to any value to never pass commands to the
+# daemon
+DISABLE_VAR = 'RTSHELL_NO_DAEMON'
+# Name of the socket file, in the user's runtime directory
+SOCKET_FILE = 'daemon.sock'
+# Commands that are passed to the daemon when it is running. These are the
+# commands that use a tree only while they run; commands that run components
+# or wait for events always run in their own process.
+COMMANDS = ['rtact', 'rtcat', 'rtcomp', 'rtcon', 'rtconf', 'rtcwd',
+        'rtdeact', 'rtdel', 'rtdis', 'rtdoc', 'rtexit', 'rtfind', 'rtls',
+        'rtreset']
+# Commands that only read the tree, so leave cached trees as they are
+READ_ONLY = ['rtcat', 'rtcwd', 'rtdoc', 'rtfind', 'rtls']
+# Commands that remove objects, so remove them from the cached trees
+REMOVING = ['rtdel', 'rtexit']
+# Commands that add objects where they cannot be predicted, so clear the cache
+ADDING = ['rtcomp']
+
+# True in the daemon, so that commands it runs are not passed on again
+_serving = False
+# Encoding of the arguments, environment and paths under Python 2
+_FS_ENCODING = sys.getfilesystemencoding() or 'utf-8'
+
+
+def socket_path():
+    '''Get the path of the daemon's socket for the user.
+
+    This is the value of the SOCKET_VAR environment variable if set, otherwise
+    $XDG_RUNTIME_DIR/rtshell/daemon.sock, or rtshell-<uid>/daemon.sock in the
+    temporary directory if XDG_RUNTIME_DIR is not set.
+
+    The socket is only used if its directory is private to the user (see
+    private_dir()).
+
+    '''
+    if os.environ.get(SOCKET_VAR):
+        return os.environ[SOCKET_VAR]
+    base = os.environ.get('XDG_RUNTIME_DIR')
+    if base:
+        d = os.path.join(base, 'rtshell')
+    else:
+        d = os.path.join(tempfile.gettempdir(),
+                'rtshell-{0}'.format(os.getuid()))
+    return os.path.join(d, SOCKET_FILE)
+
+
+def private_dir(d):
+    '''Check that a directory belongs to the user and only they can use it.
+
+    The daemon is sent the environment of each command and its replies are
+    trusted, so its socket must be in such a directory.
+
+    @param d The path of the directory.
+    @return True if the directory is a real directory (not a symbolic link)
+            owned by the user with mode 0700.
+
+    '''
+    try:
+        st = os.lstat(d or '.')
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and \
+            stat.S_IMODE(st.st_mode) == 0o700
+
+
+def dispatched(main):
+    '''Decorator for a command's main function to run it in the daemon.
+
+    If the daemon is running, the command is run there and its exit status
+    returned. Otherwise, or if a tree is given, the command is run in this
+    process.
+
+    '''
+    # Named from the file, as the module is __main__ when run with -m
+    cmd = os.path.splitext(os.path.basename(
+        sys.modules[main.__module__].__file__))[0]
+    @functools.wraps(main)
+    def wrapper(argv=None, tree=None):
+        if tree is None:
+            if argv is None:
+                argv = sys.argv[1:]
+            result = dispatch(cmd, argv)
+            if result is not None:
+                return result
+        return main(argv=argv, tree=tree)
+    return wrapper
+
+
+def dispatch(cmd, argv):
+    '''Run a command in the daemon.
+
+    The command's output is written to this process's standard output and
+    error.
+
+    @param cmd The name of the command, one of COMMANDS.
+    @param argv The command's arguments.
+    @return The command's exit status, or None if the daemon is not running.
+
+    '''
+    if _serving or DISABLE_VAR in os.environ or \
+            not hasattr(socket, 'AF_UNIX'):
+        return None
+    env = dict(os.environ)
+    size = _terminal_size()
+    if size:
+        env.setdefault('COLUMNS', str(size[0]))
+        env.setdefault('LINES', str(size[1]))
+    try:
+        request = {'request': 'run', 'command': cmd,
+            'argv': [_decode(a) for a in argv], 'prog': _decode(sys.argv[0]),
+            'cwd': _decode(os.getcwd()), 'env': dict((_decode(k),
+                _decode(v)) for k, v in env.items()),
+            'tty': _isatty(sys.stdout)}
+    except UnicodeError:
+        # Cannot be sent as text, so must be run here
+        return None
+    reply = _request(socket_path(), request)
+    if reply is None or reply.get('fallback'):
+        return None
+    if 'error' in reply:
+        print('{0}: {1}'.format(os.path.basename(sys.argv[0]),
+            reply['error']), file=sys.stderr)
+        return 1
+    _write(sys.stdout, reply.get('stdout', ''))
+    _write(sys.stderr, reply.get('stderr', ''))
+    return reply.get('status', 0)
+
+
+def ping(path=None):
+    '''Check if the daemon is running.
+
+    @param path The path of the daemon's socket. If None, socket_path() is
+                used.
+    @return The daemon's process ID, or None if it is not running.
+
+    '''
+    reply = _request(path or socket_path(), {'request': 'ping'})
+    if reply is None:
+        return None
+    return reply.get('pid')
+
+
+def stop(path=None):
+    '''Ask the daemon to stop.
+
+    @param path The path of the daemon's socket. If None, socket_path() is
+                used.
+
+    '''
+    path = path or socket_path()
+    if _request(path, {'request': 'stop'}) is None:
+        raise rts_exceptions.NoDaemonError(path)
+
+
+def _request(path, request):
+    # Send a request and wait for the reply. None is returned if the daemon
+    # could not be reached; an error reply is returned if the connection was
+    # lost after the request was sent, because the command may have run.
+    # A socket in a directory others can use may not be the user's daemon.
+    if not private_dir(os.path.dirname(path)) or not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        try:
+            sock.connect(path)
+        except socket.error:
+            return None
+        try:
+            _send(sock, request)
+            reply = _receive(sock)
+        except (socket.error, ValueError) as e:
+            return {'error': 'Lost the connection to the rtshell daemon: '
+                    '{0}'.format(e)}
+        if reply is None:
+            return {'error': 'Lost the connection to the rtshell daemon.'}
+        return reply
+    finally:
+        sock.close()
+
+
+def _send(sock, msg):
+    sock.sendall((json.dumps(msg) + '\n').encode('utf-8'))
+
+
+def _receive(sock):
+    # Read one message, ended by a new line. None is returned if the
+    # connection was closed first.
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = sock.recv(65536)
+        if not chunk:
+            return None
+        data += chunk
+    return json.loads(data.decode('utf-8'))
+
+
+def _decode(value):
+    # Under Python 2, strings from the system are bytes in the file system
+    # encoding, but JSON holds text
+    if sys.version_info[0] < 3 and isinstance(value, str):
+        return value.decode(_FS_ENCODING)
+    return value
+
+
+def _encode(value):
+    # The reverse of _decode(), so that commands run in the daemon see the
+    # same types as in their own process
+    if sys.version_info[0] < 3 and isinstance(value, unicode):
+        return value.encode(_FS_ENCODING)
+    return value
+
+
+def _write(f, text):
+    if sys.version_info[0] < 3 and isinstance(text, unicode):
+        text = text.encode('utf-8')
+    f.write(text)
+    f.flush()
+
+
+def _isatty(f):
+    try:
+        return f.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def _terminal_size():
+    # The size of the terminal on standard output, which the daemon cannot see
+    try:
+        import fcntl
+        import struct
+        import termios
+        rows, cols = struct.unpack('hh', fcntl.ioctl(sys.stdout.fileno(),
+            termios.TIOCGWINSZ, b'1234'))
+    except Exception:
+        return None
+    if not rows or not cols:
+        return None
+    return cols, rows
+
+
+###############################################################################
+## Daemon
+##
+## The daemon keeps one ORB for its lifetime and gives it to every tree the
+## commands make, and keeps the command modules and the CORBA stubs they need
+## imported. Each command is run in the daemon's process with the client's
+## arguments, working directory and environment, and its output is captured
+## and sent back. Commands are run one at a time, because they change global
+## state (sys.argv, os.environ, the working directory and standard output).
+##
+## If given a time to live for trees, the daemon also keeps the trees made by
+## commands in a TreeCache (see rtshell.trees) for the next commands. After
+## each command the cache is updated according to what the command did: the
+## components changed by a command are reparsed, the objects removed by a
+## command are removed, and the objects used by a command that failed are
+## reparsed.
+
+class Daemon(object):
+    def __init__(self, path=None, verbose=False, tree_ttl=0, *args,
+            **kwargs):
+        '''Constructor.
+
+        @param path The path of the socket to listen on. If None,
+                    socket_path() is used.
+        @param verbose Print information about requests to stderr.
+        @param tree_ttl The time in seconds to keep the trees made by commands
+                        for. If 0, trees are not kept.
+
+        '''
+        super(Daemon, self).__init__()
+        self._path = path or socket_path()
+        self._verb = verbose
+        self._sock = None
+        self._orb = None
+        self._mains = {}
+        self._cache = None
+        if tree_ttl > 0:
+            self._cache = trees.TreeCache(tree_ttl)
+
+    @property
+    def path(self):
+        '''The path of the socket.'''
+        return self._path
+
+    def listen(self):
+        '''Create the socket.
+
+        This must be done before detaching, so that errors can be reported.
+        The command modules are also imported now, for the same reason. A
+        command whose module cannot be imported is left to run in the
+        client's process.
+
+        '''
+        import rtctree.tree
+        import rtctree.utils
+        for cmd in COMMANDS:
+            try:
+                self._mains[cmd] = importlib.import_module(
+                        'rtshell.' + cmd).main
+            except ImportError as e:
+                if self._verb:
+                    print('Not running {0} in the daemon: {1}'.format(cmd, e),
+                            file=sys.stderr)
+        d = os.path.dirname(self._path)
+        if d and not os.path.lexists(d):
+            os.makedirs(d, 0o700)
+        if not private_dir(d):
+            raise rts_exceptions.UnsafeSocketDirError(d)
+        if os.path.exists(self._path):
+            if ping(self._path) is not None:
+                raise rts_exceptions.DaemonRunningError(self._path)
+            # Left behind by a daemon that did not exit cleanly
+            os.remove(self._path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Only the user may connect
+        old_umask = os.umask(0o077)
+        try:
+            self._sock.bind(self._path)
+        finally:
+            os.umask(old_umask)
+        self._sock.listen(5)
+
+    def serve(self):
+        '''Serve requests until asked to stop.'''
+        global _serving
+        _serving = True
+        try:
+            self._make_orb()
+            while True:
+                conn = self._sock.accept()[0]
+                try:
+                    if not self._handle(conn):
+                        break
+                finally:
+                    conn.close()
+        finally:
+            self._close()
+            _serving = False
+
+    def _make_orb(self):
+        # The ORB must be made after detaching, as it starts threads
+        from omniORB import CORBA
+        from rtctree import ORB_ARGS_ENV_VAR
+        if ORB_ARGS_ENV_VAR in os.environ:
+            orb_args = os.environ[ORB_ARGS_ENV_VAR].split(';')
+        else:
+            orb_args = []
+        self._orb = CORBA.ORB_init(orb_args)
+        trees.set_orb(self._orb)
+        trees.set_cache(self._cache)
+
+    def _close(self):
+        trees.set_cache(None)
+        trees.set_orb(None)
+        self._sock.close()
+        try:
+            os.remove(self._path)
+        except OSError:
+            pass
+        if self._orb is not None:
+            self._orb.shutdown(wait_for_completion=False)
+            self._orb.destroy()
+            self._orb = None
+
+    def _handle(self, conn):
+        # Returns False if the daemon should stop
+        try:
+            request = _receive(conn)
+        except (socket.error, ValueError) as e:
+            if self._verb:
+                print('Bad request: {0}'.format(e), file=sys.stderr)
+            return True
+        if request is None:
+            return True
+        kind = request.get('request')
+        if self._verb:
+            print('Request: {0} {1}'.format(kind, ' '.join(
+                [request.get('command', '')] + request.get('argv', []))),
+                file=sys.stderr)
+        if kind == 'run':
+            reply = self._run(request)
+        elif kind == 'ping':
+            reply = {'pid': os.getpid()}
+        elif kind == 'stop':
+            reply = {}
+        else:
+            reply = {'error': 'Unknown request: {0}'.format(kind)}
+        try:
+            _send(conn, reply)
+        except socket.error as e:
+            if self._verb:
+                print('Failed to send the reply: {0}'.format(e),
+                        file=sys.stderr)
+        return kind != 'stop'
+
+    def _run(self, request):
+        cmd = request.get('command')
+        if cmd not in self._mains:
+            return {'fallback': True}
+        main = self._mains[cmd]
+        try:
+            argv = [_encode(a) for a in request.get('argv', [])]
+            prog = _encode(request.get('prog', cmd))
+            env = dict((_encode(k), _encode(v))
+                    for k, v in request.get('env', {}).items())
+            cwd = _encode(request.get('cwd'))
+        except UnicodeError:
+            return {'fallback': True}
+        out = _Output(request.get('tty', False))
+        err = _Output(False)
+        old_argv = sys.argv
+        old_out, old_err = sys.stdout, sys.stderr
+        old_env = dict(os.environ)
+        old_cwd = os.getcwd()
+        if self._cache is not None:
+            self._cache.begin()
+        try:
+            sys.argv = [prog] + argv
+            sys.stdout, sys.stderr = out, err
+            os.environ.clear()
+            os.environ.update(env)
+            os.chdir(cwd or old_cwd)
+            try:
+                status = main(argv)
+            except SystemExit as e:
+                status = e.code
+            except Exception:
+                traceback.print_exc()
+                status = 1
+            if status is None:
+                status = 0
+            elif not isinstance(status, int):
+                print(status, file=sys.stderr)
+                status = 1
+        except OSError as e:
+            # The working directory could not be changed to
+            print('{0}: {1}'.format(cmd, e), file=sys.stderr)
+            status = 1
+        finally:
+            sys.argv = old_argv
+            sys.stdout, sys.stderr = old_out, old_err
+            os.environ.clear()
+            os.environ.update(old_env)
+            os.chdir(old_cwd)
+        if self._cache is not None:
+            self._update_cache(cmd, status)
+        return {'status': status, 'stdout': out.getvalue(),
+                'stderr': err.getvalue()}
+
+    def _update_cache(self, cmd, status):
+        if cmd in ADDING:
+            self._cache.clear()
+        elif status != 0:
+            # A failure may be caused by an out-of-date tree
+            self._cache.invalidate()
+        elif cmd in REMOVING:
+            self._cache.remove()
+        elif cmd not in READ_ONLY:
+            self._cache.refresh()
+        if self._verb:
+            print('Trees cached: {0}'.format(len(self._cache)),
+                    file=sys.stderr)
+
+
+if sys.version_info[0] < 3:
+    from StringIO import StringIO as _StringIO
+else:
+    from io import StringIO as _StringIO
+
+
+class _Output(_StringIO):
+    '''Captured output of a command, which is a terminal if the client's
+    is.'''
+    def __init__(self, tty):
+        _StringIO.__init__(self)
+        self._tty = tty
+
+    def isatty(self):
+        return self._tty
+
+    def getvalue(self):
+        val = _StringIO.getvalue(self)
+        if not isinstance(val, type(u'')):
+            val = val.decode('utf-8', 'replace')
+        return val
+
+
+def detach():
+    '''Detach from the terminal and continue in a background process.
+
+    The original process exits.
+
+    '''
+    if os.fork():
+        os._exit(0)
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+    os.chdir('/')
+    null = os.open(os.devnull, os.O_RDWR)
+    for fd in range(3):
+        os.dup2(null, fd)
+    os.close(null)
+
+
+# vim: tw=79
@@ -0,0 +1,187 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Codecs for serialising the payloads of log channels.
+
+'''
+
+
+import pickle
+
+
+# Payloads that differ from their key frame in more than this fraction of
+# their bytes are stored in full rather than as a delta.
+DELTA_MAX_RATIO = 0.25
+# Sizes of the chunks and blocks compared when making a delta. Chunks that are
+# identical are skipped in one comparison; changed chunks are compared in
+# blocks to find the changed regions.
+_CHUNK = 65536
+_BLOCK = 256
+
+
+###############################################################################
+## Raw codec: the value is stored as-is, and so is pickled along with the
+## entry that holds it (including the full class path of its type).
+
+class RawCodec(object):
+    name = 'raw'
+
+    def __init__(self, type=None, *args, **kwargs):
+        super(RawCodec, self).__init__()
+        self._type = type
+
+    def decode(self, raw):
+        '''Turn a stored payload back into a value.'''
+        return raw
+
+    def encode(self, data):
+        '''Turn a value into a payload for storing.'''
+        return data
+
+
+###############################################################################
+## CDR codec: the value is marshalled using the CORBA type code of its IDL
+## type, exactly as it would be sent over a corba_cdr data port. Only the
+## field values are stored; the type is known from the channel table.
+
+class CdrCodec(RawCodec):
+    name = 'cdr'
+
+    def __init__(self, type=None, *args, **kwargs):
+        super(CdrCodec, self).__init__(type=type, *args, **kwargs)
+        self._tc = _find_type_code(type)
+        if self._tc is None:
+            raise ValueError('No CORBA type code for {0}'.format(type))
+        import omniORB
+        self._unmarshal = omniORB.cdrUnmarshal
+        self._marshal = omniORB.cdrMarshal
+
+    def decode(self, raw):
+        return self._unmarshal(self._tc, raw)
+
+    def encode(self, data):
+        return self._marshal(self._tc, data)
+
+
+###############################################################################
+## Pickle codec: the value is pickled into a byte string of its own. Used when
+## the payloads must be bytes (e.g. for delta encoding) but the type has no
+## CORBA type code.
+
+class PickleCodec(RawCodec):
+    name = 'pickle'
+
+    def decode(self, raw):
+        return pickle.loads(raw)
+
+    def encode(self, data):
+        return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+
+CODECS = dict((c.name, c) for c in (RawCodec, CdrCodec, PickleCodec))
+
+
+def choose_codec(type, need_bytes=False):
+    '''Get the name of the most compact codec that can store a data type.
+
+    @param type The data type constructor.
+    @param need_bytes If True, only codecs that produce byte strings will be
+                 chosen.
+
+    '''
+    if _find_type_code(type) is not None:
+        return CdrCodec.name
+    if need_bytes:
+        return PickleCodec.name
+    return RawCodec.name
+
+
+def make_codec(name, type):
+    '''Create a codec object by name for the given data type.
+
+    @param name The name of the codec, as stored in a log channel table.
+    @param type The data type constructor of the channel.
+
+    '''
+    if name not in CODECS:
+        raise ValueError('Unknown codec: {0}'.format(name))
+    return CODECS[name](type=type)
+
+
+###############################################################################
+## Delta encoding of byte-string payloads
+
+def make_delta(base, new, max_ratio=DELTA_MAX_RATIO):
+    '''Find the edits that turn one payload into another.
+
+    Returns a tuple of (offset, bytes) edits, which is empty if the payloads
+    are identical. If the payloads differ in length or in more than
+    max_ratio of their bytes, None is returned and the new payload should be
+    stored in full.
+
+    '''
+    if len(base) != len(new):
+        return None
+    if base == new:
+        return ()
+    length = len(new)
+    limit = length * max_ratio
+    changed = 0
+    runs = []
+    start = end = None
+    for c in range(0, length, _CHUNK):
+        if base[c:c + _CHUNK] == new[c:c + _CHUNK]:
+            continue
+        for b in range(c, min(c + _CHUNK, length), _BLOCK):
+            if base[b:b + _BLOCK] == new[b:b + _BLOCK]:
+                continue
+            changed += _BLOCK
+            if changed > limit:
+                return None
+            if end == b:
+                end = b + _BLOCK
+            else:
+                if start is not None:
+                    runs.append((start, end))
+                start, end = b, b + _BLOCK
+    runs.append((start, end))
+    return tuple((s, new[s:e]) for s, e in runs)
+
+
+def apply_delta(base, edits):
+    '''Apply the edits made by make_delta to a base payload.'''
+    if not edits:
+        return base
+    parts = []
+    pos = 0
+    for offset, data in edits:
+        parts.append(base[pos:offset])
+        parts.append(data)
+        pos = offset + len(data)
+    parts.append(base[pos:])
+    return b''.join(parts)
+
+
+def _find_type_code(type):
+    '''Find the CORBA type code of an IDL-generated type, if there is one.'''
+    repo_id = getattr(type, '_NP_RepositoryId', None)
+    if not repo_id:
+        return None
+    try:
+        import omniORB
+    except ImportError:
+        return None
+    return omniORB.findTypeCode(repo_id)
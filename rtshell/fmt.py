@@ -19,11 +19,16 @@ Built-in formatters for rtprint.
 '''
 
 import inspect
+import operator
 import sys
 
 from rtshell import rts_exceptions
 
 
+# Sequences longer than this are summarised by the default formatters
+DEFAULT_MAX_ITEMS = 64
+
+
 ###############################################################################
 ## Python source formatter
 
@@ -31,6 +36,169 @@ def rawpy(data):
     return data.__repr__()
 
 
+###############################################################################
+## Compiled default formatters
+##
+## The default formatting of a data type is compiled once into a specialised
+## function, so formatting a value does not require introspecting it. Values
+## of RTC standard types (a tm member holding an RTC.Time and a data member)
+## are printed as "[sec.nsec] data". Other values are printed as their
+## representation, which for IDL structs is made from the type's descriptor
+## in the same form as omniORB prints it. Sequences longer than max_items are
+## summarised as their first max_items elements and their length.
+
+# Cache of compiled formatters by (type, standard type, max items)
+_formatters = {}
+
+
+def compile_formatter(type, standard=False, max_items=DEFAULT_MAX_ITEMS):
+    '''Get the compiled default formatter for a data type.
+
+    @param type The data type constructor.
+    @param standard True if the type is an RTC standard type.
+    @param max_items Sequences longer than this are summarised. Set to 0 to
+                     print sequences in full.
+
+    '''
+    key = (type, standard, max_items)
+    try:
+        return _formatters[key]
+    except KeyError:
+        pass
+    desc = _find_desc(type)
+    if standard:
+        if desc is not None:
+            fields = dict((desc[ii], desc[ii + 1]) \
+                    for ii in range(4, len(desc), 2))
+            data_fmt = _desc_formatter(fields['data'], max_items, top=True)
+        else:
+            data_fmt = _generic_formatter(max_items)
+        def format_standard(d):
+            return '[{0}.{1:09}] {2}'.format(d.tm.sec, d.tm.nsec,
+                    data_fmt(d.data))
+        result = format_standard
+    elif desc is not None:
+        result = _desc_formatter(desc, max_items, top=True)
+    else:
+        result = str
+    _formatters[key] = result
+    return result
+
+
+def _desc_formatter(desc, max_items, top=False):
+    '''Make a formatter from an omniORB type descriptor.
+
+    Nested values are formatted as their representation; top-level scalars
+    are formatted with str(), as print would.
+
+    '''
+    from omniORB import tcInternal
+    desc = _unalias(desc)
+    if type(desc) != tuple:
+        # Basic types
+        if top:
+            return str
+        return repr
+    kind = desc[0]
+    if kind == tcInternal.tv_struct:
+        cls = desc[1]
+        cname = getattr(cls, '_NP_ClassName', None) or \
+                '{0}.{1}'.format(cls.__module__, cls.__name__)
+        names = [desc[ii] for ii in range(4, len(desc), 2)]
+        fmts = [_desc_formatter(desc[ii + 1], max_items) \
+                for ii in range(4, len(desc), 2)]
+        if not names:
+            return lambda v: cname + '()'
+        get = operator.attrgetter(*names)
+        prefix = cname + '('
+        labels = [n + '=' for n in names]
+        if len(names) == 1:
+            f = fmts[0]
+            label = labels[0]
+            def format_struct1(v):
+                return prefix + label + f(get(v)) + ')'
+            return format_struct1
+        fields = list(zip(labels, fmts))
+        def format_struct(v):
+            return prefix + ', '.join([l + f(x) \
+                    for (l, f), x in zip(fields, get(v))]) + ')'
+        return format_struct
+    elif kind in (tcInternal.tv_sequence, tcInternal.tv_array):
+        elem = _unalias(desc[1])
+        if elem in (tcInternal.tv_octet, tcInternal.tv_char):
+            return _bytes_formatter(max_items, top)
+        if type(elem) != tuple or elem[0] in (tcInternal.tv_string,
+                tcInternal.tv_wstring, tcInternal.tv_enum):
+            return _list_formatter(repr, max_items)
+        return _list_formatter(_desc_formatter(elem, max_items), max_items)
+    elif kind in (tcInternal.tv_string, tcInternal.tv_wstring) and top:
+        return str
+    return repr
+
+
+def _generic_formatter(max_items):
+    '''Make a formatter for values of unknown type, summarising lists.'''
+    def format_generic(v):
+        if max_items and isinstance(v, (list, tuple)) and \
+                len(v) > max_items:
+            return _summarise(v, repr, max_items)
+        return str(v)
+    return format_generic
+
+
+def _list_formatter(elem_fmt, max_items):
+    '''Make a formatter for sequences with a formatter for the elements.'''
+    if elem_fmt is repr:
+        def format_list(v):
+            if max_items and len(v) > max_items:
+                return _summarise(v, repr, max_items)
+            # Fast path: the sequence's own representation
+            return repr(v)
+    else:
+        def format_list(v):
+            if max_items and len(v) > max_items:
+                return _summarise(v, elem_fmt, max_items)
+            return '[' + ', '.join([elem_fmt(x) for x in v]) + ']'
+    return format_list
+
+
+def _bytes_formatter(max_items, top):
+    '''Make a formatter for octet and char sequences.'''
+    if top:
+        whole = str
+    else:
+        whole = repr
+    def format_bytes(v):
+        if max_items and len(v) > max_items:
+            return '{0}... ({1} bytes)'.format(repr(v[:max_items]), len(v))
+        return whole(v)
+    return format_bytes
+
+
+def _summarise(v, elem_fmt, max_items):
+    return '[' + ', '.join([elem_fmt(x) for x in v[:max_items]]) + \
+            ', ... ({0} items)]'.format(len(v))
+
+
+def _find_desc(type):
+    '''Find the omniORB type descriptor of a data type, if it is known.'''
+    repo_id = getattr(type, '_NP_RepositoryId', None)
+    if not repo_id:
+        return None
+    try:
+        import omniORB
+    except ImportError:
+        return None
+    return omniORB.findType(repo_id)
+
+
+def _unalias(desc):
+    from omniORB import tcInternal
+    while type(desc) == tuple and desc[0] == tcInternal.tv_alias:
+        desc = desc[3]
+    return desc
+
+
 ###############################################################################
 ## Formatter importer
 
@@ -26,14 +26,16 @@ import RTC
 import sys
 import traceback
 
+from rtshell import fmt
+
 
 ###############################################################################
 ## Port class
 
 class Port(object):
     '''Class to store the objects used for a port.'''
-    def __init__(self, data, port, formatter=None, raw_spec=None, *args,
-            **kwargs):
+    def __init__(self, data, port, formatter=None, raw_spec=None,
+            max_items=fmt.DEFAULT_MAX_ITEMS, *args, **kwargs):
         super(Port, self).__init__()
         self._data = data
         self._port = port
@@ -45,6 +47,12 @@ class Port(object):
             self._standard_type = True
         else:
             self._standard_type = False
+        # The type is fixed, so the way to format it is decided once here
+        if formatter:
+            self._format = formatter
+        else:
+            self._format = fmt.compile_formatter(type(data),
+                    standard=self._standard_type, max_items=max_items)
 
     @property
     def data(self):
@@ -85,33 +93,31 @@ class Port(object):
         '''Read the next value from the port into self.data.'''
         self._data = self._port.read()
 
-    def format(self):
+    def format(self, data=None):
         '''Return a string representation of the value of self.data.
 
+        If data is given, it is formatted instead of self.data. It must be of
+        the port's data type.
+
         If self.formatter is not None, that function will be called to create
-        the string representation. Otherwise, str() will be used except in the
-        cases of data that contains a .tm member of type RTC.Time and a .data
-        member. In that case, the time will be pretty-printed, followed by the
-        data member, printed using str().
+        the string representation. Otherwise, the value will be printed as
+        its representation except in the cases of data that contains a .tm
+        member of type RTC.Time and a .data member. In that case, the time
+        will be pretty-printed, followed by the data member. Long sequences
+        are summarised. See fmt.compile_formatter().
 
         '''
-        if self.formatter:
-            return self.formatter(self.data)
-        else:
-            members = [m for m in dir(self.data) if not m.startswith('_')]
-            if len(members) == 2 and 'tm' in members and \
-                    'data' in members and self.data.tm.__class__ == RTC.Time:
-                return '[{0}.{1:09}] {2}'.format(self.data.tm.sec,
-                        self.data.tm.nsec, self.data.data)
-            else:
-                return str(self.data)
+        if data is None:
+            data = self._data
+        return self._format(data)
 
 
 ###############################################################################
 ## Generated-on-demand component class
 
 class GenComp(OpenRTM_aist.DataFlowComponentBase):
-    def __init__(self, mgr, port_specs, event=None, max=-1, *args, **kwargs):
+    def __init__(self, mgr, port_specs, event=None, max=-1,
+            max_items=fmt.DEFAULT_MAX_ITEMS, *args, **kwargs):
         '''Constructor.
 
         @param mgr Reference to the manager that created this component.
@@ -124,12 +130,16 @@ class GenComp(OpenRTM_aist.DataFlowComponentBase):
                    perform its onExecute function before setting the
                    event to request a shutdown. Defaults to -1, for
                    unlimited.
+        @param max_items Sequences longer than this are summarised when the
+                         values of ports are formatted. Set to 0 to format
+                         sequences in full.
 
         '''
         OpenRTM_aist.DataFlowComponentBase.__init__(self, mgr)
         self._port_specs = port_specs
         self._event = event
         self._max = max
+        self._max_items = max_items
         self._count = 0
 
     def onInitialize(self):
@@ -153,7 +163,8 @@ class GenComp(OpenRTM_aist.DataFlowComponentBase):
                 p_port = port_con(p.name, p_data)
                 port_reg(p.name, p_port)
                 self._ports[p.name] = Port(p_data, p_port,
-                        formatter=p.formatter, raw_spec=p)
+                        formatter=p.formatter, raw_spec=p,
+                        max_items=self._max_items)
         except:
             print(traceback.format_exc(), file=sys.stderr)
             return RTC.RTC_ERROR
@@ -213,7 +224,7 @@ def make_init(name, cons, port_specs, event=None, rate=1.0, max=-1, **kwargs):
         mgr.registerFactory(profile,
                 make_factory(cons, port_specs, event=event, max=max, **kwargs),
                 OpenRTM_aist.Delete)
-        comp = mgr.createComponent(name +
+        return mgr.createComponent(name +
             '?exec_cxt.periodic.type=PeriodicExecutionContext&'
             'exec_cxt.periodic.rate={0}'.format(rate))
     return init_fun
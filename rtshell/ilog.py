@@ -36,6 +36,21 @@ class InvalidIndexError(EOFError):
     pass
 
 
+class UnknownChannelError(KeyError):
+    '''An entry was written for a channel not in the log's channel table.'''
+    pass
+
+
+class ChecksumError(IOError):
+    '''An entry read from the log does not match its checksum.'''
+    pass
+
+
+class NoChecksumsError(Exception):
+    '''The log does not contain checksums to verify.'''
+    pass
+
+
 ###############################################################################
 ## Entry timestamps
 
@@ -130,11 +145,67 @@ class EntryTS(object):
             return int(other), int((other * 1000000000) % 1000000000)
 
 
+###############################################################################
+## Log channels
+
+class Channel(object):
+    '''A single data stream stored in a log.
+
+    Logs that support channels record a table of these in their header.
+    Entries then refer to their channel by its small integer ID rather than
+    repeating the port name and data type in every entry.
+
+    '''
+    def __init__(self, id, name, type=None, type_name='', spec=None,
+            codec='raw', delta=False):
+        '''Constructor.
+
+        @param id The channel's ID in the log. Must be unique within a log.
+        @param name The name of the data stream (the port spec name).
+        @param type The data type constructor of the stream's values.
+        @param type_name The IDL repository ID of the data type.
+        @param spec The port_types.PortSpec object that created this channel.
+        @param codec The name of the data_codec codec used for the payloads.
+        @param delta If True, payloads that are identical or mostly identical
+                     to an earlier payload of the channel are stored as a
+                     reference to that payload plus the changed bytes.
+
+        '''
+        super(Channel, self).__init__()
+        self.id = id
+        self.name = name
+        self.type = type
+        self.type_name = type_name
+        self.spec = spec
+        self.codec = codec
+        self.delta = delta
+
+    def __repr__(self):
+        return 'Channel(id={0}, name={1}, type_name={2}, codec={3}, '\
+                'delta={4})'.format(self.id, self.name, self.type_name,
+                        self.codec, self.delta)
+
+    def __str__(self):
+        return '{0}: {1} ({2})'.format(self.id, self.name, self.type_name)
+
+
+def make_channels(port_specs, delta=False):
+    '''Create a channel table from a list of port_types.PortSpec objects.
+
+    @param port_specs The port specifications to make channels for.
+    @param delta Enable delta encoding for all the channels.
+
+    '''
+    return [Channel(ii, p.name, type=p.type, type_name=p.type_name, spec=p,
+        delta=delta) for ii, p in enumerate(port_specs)]
+
+
 ###############################################################################
 ## Log interface. All loggers must conform to this.
 
 class Log(object):
-    def __init__(self, mode='r', meta=None, verbose=False, *args, **kwargs):
+    def __init__(self, mode='r', meta=None, verbose=False, channels=None,
+            decode=None, *args, **kwargs):
         '''Base constructor.
 
         The log will be opened on construction. It should be closed manually,
@@ -149,11 +220,26 @@ class Log(object):
                     requirement that it can be changed after opening the log
                     for writing. Users should set it before opening the log.
         @param verbose Print verbose output to stderr.
+        @param channels A list of Channel objects describing the data streams
+                        that will be written to the log. Entries written to a
+                        log with channels must be (channel name, data) tuples.
+                        Implementations that do not support channels ignore
+                        this, and in read mode implementations that do will
+                        load the table from the log.
+        @param decode In read mode, the names of the channels whose data
+                      should be decoded. Entries of other channels are
+                      returned with None as their data, saving the cost of
+                      decoding data that will not be used. Defaults to
+                      decoding all channels.
 
         '''
         super(Log, self).__init__()
         self._mode = mode
         self._meta = meta
+        self._chans = channels
+        if decode is not None:
+            decode = set(decode)
+        self._decode_names = decode
         self._vb = verbose
         self.open()
 
@@ -185,6 +271,11 @@ class Log(object):
     def __str__(self):
         return 'Log interface object.'
 
+    @property
+    def channels(self):
+        '''The channel table of the log, or None if it does not have one.'''
+        return self._chans
+
     @property
     def end(self):
         '''The position of the final entry in the log.
@@ -281,6 +372,16 @@ class Log(object):
         '''
         raise NotImplementedError
 
+    def check_flush(self):
+        '''Write out buffered entries if they have been buffered too long.
+
+        Called regularly while recording, including when no entries are
+        being written. Logs that do not buffer entries need not implement
+        this.
+
+        '''
+        pass
+
     def read(self, timestamp=None, number=None):
         '''Read entries from the log.
 
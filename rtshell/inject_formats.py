@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Structured input formats for rtinject.
+
+Values are read as plain data (the fields of the port's data type) and
+constructed directly with the builder for the type, rather than being
+evaluated as Python expressions. The records written by rtprint's json, csv
+and pickle output formats can be read back, as can bare values.
+
+'''
+
+
+import csv
+import json
+import pickle
+import time
+
+from rtshell import rts_exceptions
+from rtshell import struct_fields
+
+
+# Formats other than Python expressions
+FORMATS = ['json', 'csv', 'pickle']
+# Formats read as bytes rather than text
+BINARY_FORMATS = ['pickle']
+# Keys of a record written by rtprint
+_RECORD_KEYS = set(['ts', 'port', 'data'])
+
+
+def binary_stream(stream):
+    '''Get the stream to read the bytes of binary formats from.'''
+    return getattr(stream, 'buffer', stream)
+
+
+def read_values(format, type, stream):
+    '''Read values of a type from a stream.
+
+    @param format The input format (one of FORMATS).
+    @param type The data type to construct.
+    @param stream The stream to read from.
+    @return A generator of values of the type.
+
+    '''
+    if format not in READERS:
+        raise ValueError('Unknown input format: {0}'.format(format))
+    return READERS[format](type)(stream)
+
+
+###############################################################################
+## Readers
+##
+## A reader is made once per data type. It is called with the stream and
+## yields one value of the type per record, until the end of the stream. If
+## the type has a "tm" time stamp field and a record does not give one, it is
+## set to the current time.
+
+class JSONReader(object):
+    '''One JSON value or rtprint record per line.'''
+    def __init__(self, type, *args, **kwargs):
+        super(JSONReader, self).__init__()
+        self._type = type
+        self._build = struct_fields.builder(type)
+        self._stamped = 'tm' in struct_fields.type_field_names(type)
+
+    def __call__(self, stream):
+        for n, line in enumerate(iter(stream.readline, ''), 1):
+            if not line.strip() or line[0] == '#':
+                continue
+            try:
+                plain = json.loads(line)
+            except ValueError as e:
+                raise rts_exceptions.BadInputError(n, e)
+            yield self._make(n, plain)
+
+    def _make(self, n, plain):
+        if isinstance(plain, dict):
+            if _RECORD_KEYS.issubset(plain):
+                plain = plain['data']
+            if self._stamped and isinstance(plain, dict) and \
+                    'tm' not in plain:
+                plain['tm'] = _now()
+        try:
+            return self._build(plain)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise rts_exceptions.BadInputError(n, e)
+
+
+class CSVReader(JSONReader):
+    '''One row per value, after a header row naming the columns.
+
+    The columns are the dotted names of the leaf fields, as written by
+    rtprint, which also writes "ts" and "port" columns that are ignored. Each
+    cell is read as JSON if possible (so numbers and sequences keep their
+    type), or as a string otherwise.
+
+    '''
+    def __call__(self, stream):
+        rows = csv.reader(iter(stream.readline, ''))
+        paths = None
+        for n, row in enumerate(rows, 1):
+            if not row or row[0].startswith('#'):
+                continue
+            if paths is None:
+                paths = [(ii, c.split('.')) for ii, c in enumerate(row) \
+                        if c not in ('ts', 'port')]
+                continue
+            try:
+                cells = [(p, _cell_value(row[ii])) for ii, p in paths]
+            except IndexError:
+                raise rts_exceptions.BadInputError(n,
+                        'expected {0} columns'.format(len(paths)))
+            if len(cells) == 1 and cells[0][0] == ['value']:
+                plain = cells[0][1]
+            else:
+                plain = {}
+                for p, v in cells:
+                    d = plain
+                    for f in p[:-1]:
+                        d = d.setdefault(f, {})
+                    d[p[-1]] = v
+            yield self._make(n, plain)
+
+
+class PickleReader(JSONReader):
+    '''A stream of pickled values or rtprint records.
+
+    Values already of the port's data type are used unchanged.
+
+    '''
+    def __call__(self, stream):
+        stream = binary_stream(stream)
+        n = 0
+        while True:
+            try:
+                plain = pickle.load(stream)
+            except EOFError:
+                return
+            except (pickle.UnpicklingError, AttributeError, ImportError,
+                    IndexError, ValueError) as e:
+                raise rts_exceptions.BadInputError(n + 1, e)
+            n += 1
+            if isinstance(plain, self._type):
+                yield plain
+            else:
+                yield self._make(n, plain)
+
+
+READERS = {'json': JSONReader, 'csv': CSVReader, 'pickle': PickleReader}
+
+
+def _cell_value(cell):
+    '''Convert a CSV cell to plain data.'''
+    try:
+        return json.loads(cell)
+    except ValueError:
+        return cell
+
+
+def _now():
+    '''The current time, as the plain data of an RTC.Time.'''
+    now = time.time()
+    return {'sec': int(now), 'nsec': int((now - int(now)) * 1e9)}
+
+
+# vim: tw=79
+
@@ -0,0 +1,182 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Generators of synthetic port data, for rtinject's load generation mode.
+
+'''
+
+
+import binascii
+import os
+import random
+import time
+
+import RTC
+
+from rtshell import rts_exceptions
+from rtshell import struct_fields
+
+
+# Kinds of generator
+GENERATORS = ['counter', 'ramp', 'random', 'expr']
+# Default minimum, maximum and number of steps of a ramp
+DEFAULT_RAMP = (0.0, 1.0, 100)
+# Random integers are in the range of the smallest IDL integer types
+_RANDOM_INT_MAX = 32767
+
+
+def make_generator(spec, type, mm, size=1):
+    '''Create a generator of values of a type.
+
+    The specification is one of:
+
+    - counter: the sample number, 0, 1, 2, ...
+    - ramp[:MIN:MAX:STEPS]: a sawtooth rising from MIN to MAX in STEPS
+      samples.
+    - random: random values.
+    - expr:TEMPLATE: a Python expression evaluated for each sample. {n} is
+      replaced with the sample number and {time} with the current time.
+
+    Except for expr, the generated values are of data types with a data
+    field and an optional tm field, such as the RTC standard types. The time
+    stamp is set to the current time.
+
+    @param spec The generator specification.
+    @param type The data type to generate values of.
+    @param mm The ModuleMgr used to compile expressions.
+    @param size The length of the values of sequence and string data fields.
+    @return A function receiving the sample number and returning a value.
+
+    '''
+    kind, sep, params = spec.partition(':')
+    if kind not in GENERATORS:
+        raise rts_exceptions.BadGeneratorError(spec,
+                'unknown generator {0}'.format(kind))
+    if kind == 'expr':
+        if not params:
+            raise rts_exceptions.BadGeneratorError(spec, 'no expression')
+        return _expr_generator(params, mm)
+    names = struct_fields.type_field_names(type)
+    if 'data' not in names or not set(names) <= set(['tm', 'data']):
+        raise rts_exceptions.BadGeneratorError(spec,
+                'cannot generate values of {0}; use expr'.format(
+                    type.__name__))
+    field = struct_fields.field_kind(type, 'data')
+    if field is None:
+        # Without the type descriptor, guess from the generator
+        if kind == 'ramp':
+            field = 'float'
+        else:
+            field = 'int'
+    if field in ('struct', 'other'):
+        raise rts_exceptions.BadGeneratorError(spec,
+                'cannot generate the data field of {0}; use expr'.format(
+                    type.__name__))
+    if kind == 'counter':
+        if params:
+            raise rts_exceptions.BadGeneratorError(spec,
+                    'counter takes no parameters')
+        data = _converter(field, size)
+    elif kind == 'ramp':
+        data = _ramp(_converter(field, size), _ramp_params(spec, params))
+    else:
+        if params:
+            raise rts_exceptions.BadGeneratorError(spec,
+                    'random takes no parameters')
+        data = _random(field, size)
+    if 'tm' in names:
+        if names.index('tm') < names.index('data'):
+            return lambda n: type(_now(), data(n))
+        return lambda n: type(data(n), _now())
+    return lambda n: type(data(n))
+
+
+###############################################################################
+## Generators of the data field
+
+def _ramp(conv, params):
+    lo, hi, steps = params
+    step = (hi - lo) / max(steps - 1, 1)
+    def ramp(n):
+        return conv(lo + step * (n % steps))
+    return ramp
+
+
+def _random(field, size):
+    if field == 'int':
+        return lambda n: random.randint(0, _RANDOM_INT_MAX)
+    elif field == 'float':
+        return lambda n: random.random()
+    elif field == 'bool':
+        return lambda n: random.random() < 0.5
+    elif field == 'string':
+        # Printable characters
+        return lambda n: str(binascii.b2a_hex(os.urandom(
+            (size + 1) // 2))[:size].decode('ascii'))
+    elif field == 'bytes':
+        return lambda n: os.urandom(size)
+    elif field == 'int_seq':
+        return lambda n: list(bytearray(os.urandom(size)))
+    return lambda n: [random.random() for ii in range(size)]
+
+
+def _converter(field, size):
+    '''Make the function converting a number to a value of a data field.'''
+    if field == 'int':
+        return int
+    elif field == 'float':
+        return float
+    elif field == 'bool':
+        return lambda x: bool(int(x) % 2)
+    elif field == 'string':
+        return str
+    elif field == 'bytes':
+        return lambda x: bytes(bytearray([int(x) & 0xff]) * size)
+    elif field == 'int_seq':
+        return lambda x: [int(x)] * size
+    return lambda x: [float(x)] * size
+
+
+def _ramp_params(spec, params):
+    if not params:
+        return DEFAULT_RAMP
+    try:
+        lo, hi, steps = params.split(':')
+        lo, hi, steps = float(lo), float(hi), int(steps)
+    except ValueError:
+        raise rts_exceptions.BadGeneratorError(spec,
+                'expected ramp:MIN:MAX:STEPS')
+    if steps < 1:
+        raise rts_exceptions.BadGeneratorError(spec,
+                'the number of steps must be positive')
+    return lo, hi, steps
+
+
+def _expr_generator(template, mm):
+    fun, used = mm.compile_template(template, ['n', 'time'])
+    if 'time' in used:
+        return lambda n: fun(n, _now())
+    return lambda n: fun(n, None)
+
+
+def _now():
+    '''Get the current time as an RTC.Time.'''
+    now = time.time()
+    return RTC.Time(int(now), int((now - int(now)) * 1e9))
+
+
+# vim: tw=79
+
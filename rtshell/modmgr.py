@@ -20,18 +20,33 @@ Objects for managing dynamically-loaded modules and evaluating strings.
 
 from __future__ import print_function
 
+import collections
 import imp
 import inspect
 import OpenRTM_aist
 import os.path
 import re
 import RTC
+import string
 import sys
 import time
+import tokenize
 
 from rtshell import rts_exceptions
 
 
+# Maximum number of compiled expressions kept by ModuleMgr.evaluate
+EVAL_CACHE_SIZE = 256
+# Names of the arguments of compiled expression templates
+_FIELD_ARG = '_rtshell_{0}'
+_LITERALS_ARG = '_rtshell_lits'
+# Decimal numbers that are not part of a name, and string literals
+# Number tokens that are hoisted; others (hex, long, imaginary) are left alone
+_INT_RE = re.compile(r'(?:[1-9]\d*|0)\Z')
+_FLOAT_RE = re.compile(r'(?:(?:\d+\.\d*|\.\d+)(?:[eE][-+]?\d+)?|'
+        r'\d+[eE][-+]?\d+)\Z')
+
+
 ###############################################################################
 ## Module class - stores a dynamically imported module.
 
@@ -85,10 +100,34 @@ class AutoModule(Module):
 ## evaluation of Python expressions
 
 class ModuleMgr(object):
-    def __init__(self, verbose=False, paths=[], *args, **kwargs):
+    def __init__(self, verbose=False, paths=[],
+            eval_cache_size=EVAL_CACHE_SIZE, type_cache=None, *args,
+            **kwargs):
+        '''Constructor.
+
+        @param verbose Print information about imports to stderr.
+        @param paths Directories to add to the module search path.
+        @param eval_cache_size The number of compiled expressions to keep.
+        @param type_cache A type_cache.TypeCache recording the modules that
+                          provide types and the modules that fail to import,
+                          or None.
+
+        '''
         super(ModuleMgr, self).__init__()
         self._mods = {'RTC': Module('RTC', mod=RTC)}
         self._verb = verbose
+        # Indices of the classes of the modules, by name (to a list of
+        # (module name, class), in the order the modules were loaded) and
+        # by IDL repository ID
+        self._classes = {}
+        self._repo_ids = {}
+        # Modules loaded since the indices were updated, and the modules
+        # already indexed
+        self._unindexed = ['RTC']
+        self._indexed = set()
+        self._eval_cache = collections.OrderedDict()
+        self._eval_cache_size = eval_cache_size
+        self._type_cache = type_cache
         self._add_paths(paths)
 
     def _add_paths(self, paths=[]):
@@ -97,67 +136,127 @@ class ModuleMgr(object):
                 print('Adding {0} to PYTHONPATH'.format(p), file=sys.stderr)
             sys.path.insert(0, p)
 
-    def evaluate(self, expr):
-        self._auto_import(expr)
-        repl_expr = self._repl_mod_name(_replace_time(expr))
-        if not repl_expr:
+    def compile_function(self, expr, args):
+        '''Compile an expression into a function.
+
+        The expression is compiled once. Module names in it are imported if
+        necessary and bound when the function is made, so calling the
+        function costs only the evaluation of the expression.
+
+        @param expr The expression, which will be the function's result.
+        @param args The names of the function's arguments, as a list of
+                    strings. Names in the expression starting with these are
+                    not treated as module names.
+
+        '''
+        if not expr.strip():
             raise rts_exceptions.EmptyConstExprError
+        self._auto_import(expr, exclude=args)
+        src = 'lambda {0}: ({1})'.format(', '.join(args), expr)
         if self._verb:
-            print >>sys.stderr, 'Evaluating expression {0}'.format(repl_expr)
-        const = eval(repl_expr)
-        return const
+            print('Compiling expression {0}'.format(src), file=sys.stderr)
+        return eval(compile(src, '<expression>', 'eval'), self._namespace())
+
+    def compile_template(self, template, fields, args=[]):
+        '''Compile an expression template into a function.
+
+        The template is an expression containing {field} placeholders, as
+        used with str.format. Each placeholder becomes an argument of the
+        function rather than being formatted into the expression's text.
+
+        @param template The expression template.
+        @param fields The names of the fields allowed in the template, as a
+                      list of strings. The function's first arguments are
+                      the values of these fields, in this order.
+        @param args The names of any further arguments of the function.
+        @return The function, and the set of the fields that the template
+                uses.
+
+        '''
+        parts = []
+        used = set()
+        for text, field, spec, conv in string.Formatter().parse(template):
+            parts.append(text)
+            if field is None:
+                continue
+            if field not in fields:
+                raise KeyError(field)
+            parts.append(_FIELD_ARG.format(field))
+            used.add(field)
+        return self.compile_function(''.join(parts),
+                [_FIELD_ARG.format(f) for f in fields] + args), used
+
+    def evaluate(self, expr):
+        '''Evaluate an expression.
+
+        Any occurrences of {time} in the expression are replaced with the
+        current time, as an RTC.Time. The expression is compiled the first
+        time it is seen, with {time} and its numeric literals as arguments,
+        and the compiled function is cached. Evaluating the same expression,
+        or one differing only in its numbers, again costs only a call of the
+        function.
+
+        @param expr The expression.
+
+        '''
+        template, literals = _hoist_literals(expr)
+        try:
+            # Removed and added again to keep the most recent entries last
+            fun, timed = self._eval_cache.pop(template)
+        except KeyError:
+            fun, used = self.compile_template(template, ['time'],
+                    [_LITERALS_ARG])
+            timed = 'time' in used
+            if len(self._eval_cache) >= self._eval_cache_size:
+                self._eval_cache.popitem(last=False)
+        self._eval_cache[template] = (fun, timed)
+        if timed:
+            return fun(_now(), literals)
+        return fun(None, literals)
 
     def find_class(self, name):
         '''Find a class constructor in one of the modules.
 
-        The first matching class's constructor will be returned.
+        The first matching class's constructor will be returned. Classes in
+        the RTC module are only returned if no other module has a class of
+        the same name, to allow user types to override RTC types.
+
+        The classes of each module are indexed by name and by IDL repository
+        ID the first time a class is searched for after the module is
+        loaded, so a search costs a dictionary look-up.
+
+        If there is a type cache, the modules recorded for the type are
+        imported instead of every module name in the type's name, and the
+        modules found for new types are recorded.
 
-        @param name The name of the class to search for.
+        @param name The name of the class to search for, as a module path
+                    (e.g. RTC.TimedLong or RTC/TimedLong) or as an IDL
+                    repository ID (e.g. IDL:RTC/TimedLong:1.0).
 
         '''
-        # Replace / in the name with . to create a Python path
-        name = name.replace('/', '.')
-        self._auto_import(name)
-        # Strip the name down to the class
-        name = _find_object_name(name)
-        for m in list(self._mods.values()):
-            if m.name == 'RTC':
-                # Search RTC last to allow user types to override RTC types
-                continue
-            types = [member for member in inspect.getmembers(m.mod,
-                    inspect.isclass) if member[0] == name or "IDL:"+list(self._mods.keys())[0]+"/"+member[0]+":1.0" == name]
-            if len(types) == 0:
-                continue
-            elif len(types) != 1:
-                raise rts_exceptions.AmbiguousTypeError(type_name)
-            else:
-                # Check for the POA module
-                if m.name != 'RTC':
-                    if not [other_m for other_m in list(self._mods.values()) \
-                            if other_m.name == m.name + '__POA']:
-                        raise rts_exceptions.MissingPOAError(m.name)
-                if self._verb:
-                    print >>sys.stderr, 'Found type {0} in module {1}'.format(
-                            name, m.name)
-                return types[0][1]
-        # If got to here, the type was not found in any other module, so search
-        # the RTC module
-        m = self._mods['RTC']
-        types = [member for member in inspect.getmembers(m.mod,
-                inspect.isclass) if member[0] == name]
-        if len(types) != 0:
-            if len(types) != 1:
-                raise rts_exceptions.AmbiguousTypeError(type_name)
-            if self._verb:
-                print >>sys.stderr, 'Found type {0} in module {1}'.format(
-                        name, m.name)
-            return types[0][1]
-        raise rts_exceptions.TypeNotFoundError(name)
+        if self._import_cached(name):
+            try:
+                return self._lookup_class(name)[1]
+            except rts_exceptions.TypeNotFoundError:
+                # The modules no longer provide the type
+                self._type_cache.forget(name)
+        if name.startswith('IDL:'):
+            self._auto_import(_repo_id_to_name(name))
+        else:
+            # Replace / in the name with . to create a Python path
+            self._auto_import(name.replace('/', '.'))
+        mod_name, cls = self._lookup_class(name)
+        if self._type_cache and mod_name != 'RTC':
+            mods = [mod_name, mod_name + '__POA']
+            self._type_cache.add_type(name,
+                    [(m, self._mods[m].mod) for m in mods if m in self._mods])
+        return cls
 
     def load_mod(self, mod):
         '''Load a module.'''
         m = AutoModule(mod)
         self._mods[mod] = m
+        self._unindexed.append(mod)
 
     def load_mods(self, mods):
         '''Load a list of modules.
@@ -187,59 +286,243 @@ class ModuleMgr(object):
     def loaded_mod_names(self):
         return list(self._mods.keys())
 
-    def _auto_import(self, expr):
+    def _lookup_class(self, name):
+        '''Look up a class in the loaded modules.
+
+        @return The module name and the class.
+
+        '''
+        self._index_mods()
+        if name.startswith('IDL:'):
+            try:
+                mod_name, cls = self._repo_ids[name]
+            except KeyError:
+                raise rts_exceptions.TypeNotFoundError(name)
+            if self._verb:
+                print('Found type {0} in module {1}'.format(name, mod_name),
+                        file=sys.stderr)
+            return mod_name, cls
+        # Strip the name down to the class
+        name = _find_object_name(name.replace('/', '.'))
+        candidates = self._classes.get(name, [])
+        # Search RTC last to allow user types to override RTC types
+        for mod_name, cls in candidates:
+            if mod_name == 'RTC':
+                continue
+            # Check for the POA module
+            if mod_name + '__POA' not in self._mods:
+                raise rts_exceptions.MissingPOAError(mod_name)
+            if self._verb:
+                print('Found type {0} in module {1}'.format(name, mod_name),
+                        file=sys.stderr)
+            return mod_name, cls
+        for mod_name, cls in candidates:
+            if mod_name == 'RTC':
+                if self._verb:
+                    print('Found type {0} in module {1}'.format(name,
+                        mod_name), file=sys.stderr)
+                return mod_name, cls
+        raise rts_exceptions.TypeNotFoundError(name)
+
+    def _import_cached(self, name):
+        '''Import the modules recorded in the type cache for a type.
+
+        @return True if the type was in the cache and its modules were
+                imported.
+
+        '''
+        if not self._type_cache:
+            return False
+        mods = self._type_cache.modules(name)
+        if mods is None:
+            return False
+        mods = [m for m in mods if m not in self._mods]
+        if self._verb:
+            print('Importing modules {0} for type {1} from the type '
+                    'cache'.format(mods, name), file=sys.stderr)
+        for m in mods:
+            try:
+                self.load_mod(m)
+            except ImportError:
+                self._type_cache.forget(name)
+                return False
+        return True
+
+    def _probe_mod(self, mod):
+        '''Load a module that may not exist.
+
+        Modules that the type cache records as failing to import are not
+        tried again; ImportError is raised for them immediately.
+
+        '''
+        if self._type_cache and self._type_cache.failed(mod):
+            if self._verb:
+                print('Module {0} failed to import previously'.format(mod),
+                        file=sys.stderr)
+            raise ImportError(mod)
+        try:
+            self.load_mod(mod)
+        except ImportError:
+            if self._type_cache:
+                self._type_cache.add_failure(mod)
+            raise
+
+    def _auto_import(self, expr, exclude=[]):
         '''Tries to import all module names found in an expression.
 
         A failure to import a module will cause a warning, not an error.
 
+        @param expr The expression.
+        @param exclude Names that are not modules (e.g. variables bound in the
+                       expression). Dotted names starting with these are not
+                       imported.
+
         '''
-        names = [m for m in _find_module_names(expr) if m not in self._mods]
+        names = [m for m in _find_module_names(expr) if m not in self._mods \
+                and m.split('.')[0] not in exclude]
         if self._verb:
-            print >>sys.stderr, 'Automatically importing modules {0}'.format(
-                    names)
+            print('Automatically importing modules {0}'.format(names),
+                    file=sys.stderr)
         for n in names:
             try:
-                self.load_mod(n)
+                self._probe_mod(n)
             except ImportError:
-                print >>sys.stderr, \
-                        '{0}: Warning: failed to import module {1}'.format(
-                                os.path.basename(sys.argv[0]), n)
+                print('{0}: Warning: failed to import module {1}'.format(
+                    os.path.basename(sys.argv[0]), n), file=sys.stderr)
                 continue
             try:
-                self.load_mod(n + '__POA')
+                self._probe_mod(n + '__POA')
             except ImportError:
-                print >>sys.stderr, \
-                        '{0}: Warning: failed to import POA module {1}'.format(
-                                os.path.basename(sys.argv[0]), n + '__POA')
+                print('{0}: Warning: failed to import POA module {1}'.format(
+                    os.path.basename(sys.argv[0]), n + '__POA'),
+                    file=sys.stderr)
                 continue
 
-    def _repl_mod_name(self, expr):
-        '''Replace the name of a module.
-
-        Replaces a reference to a module in a string with its reference in
-        the modules array.
+    def _index_mods(self):
+        '''Add the classes of any newly-loaded modules to the indices.'''
+        while self._unindexed:
+            name = self._unindexed.pop(0)
+            if name in self._indexed:
+                # Reloaded, so its classes have been replaced
+                self._unindex_mod(name)
+            self._indexed.add(name)
+            mod = self._mods[name].mod
+            for cls_name, cls in inspect.getmembers(mod, inspect.isclass):
+                self._classes.setdefault(cls_name, []).append((name, cls))
+                repo_id = getattr(cls, '_NP_RepositoryId', None)
+                if repo_id:
+                    self._repo_ids.setdefault(repo_id, (name, cls))
+
+    def _unindex_mod(self, name):
+        '''Remove the classes of a module from the indices.'''
+        for cls_name, entries in list(self._classes.items()):
+            for mod_name, cls in entries:
+                if mod_name == name:
+                    repo_id = getattr(cls, '_NP_RepositoryId', None)
+                    if self._repo_ids.get(repo_id, (None, None))[1] is cls:
+                        del self._repo_ids[repo_id]
+            self._classes[cls_name] = [e for e in entries if e[0] != name]
+        self._indexed.discard(name)
+
+    def _namespace(self):
+        '''Make a namespace binding the names of the loaded modules.
+
+        Dotted module names are reached through their top-level name, as in
+        Python source. Parent packages that have not been loaded are
+        represented by placeholder objects.
 
         '''
-        for m in self._mods:
-            if m in expr:
-                expr = expr.replace(m, 'self._mods["{0}"].mod'.format(m))
-        return expr
-
+        ns = {}
+        # Parents first, so that their children can be attached to them
+        for name in sorted(self._mods, key=lambda n: n.count('.')):
+            parts = name.split('.')
+            if len(parts) == 1:
+                ns[name] = self._mods[name].mod
+                continue
+            parent = ns.setdefault(parts[0], _Package(parts[0]))
+            for p in parts[1:-1]:
+                if not hasattr(parent, p):
+                    setattr(parent, p, _Package(p))
+                parent = getattr(parent, p)
+            if not hasattr(parent, parts[-1]):
+                setattr(parent, parts[-1], self._mods[name].mod)
+        return ns
 
 ###############################################################################
 ## Internal support functions
 
-def _replace_time(expr):
-    '''Replaces any occurances with {time} with the system time.'''
+class _Package(object):
+    '''Placeholder for a package whose submodules have been loaded.'''
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return '<package {0}>'.format(self._name)
+
+
+def _hoist_literals(expr):
+    '''Replace the numeric literals of an expression with argument names.
+
+    @return The expression template, in which the literals are replaced by
+            items of the literals argument, and the values of the literals.
+
+    '''
+    lines = expr.splitlines(True)
+    starts = [0]
+    for l in lines:
+        starts.append(starts[-1] + len(l))
+    it = iter(lines)
+    numbers = []
+    try:
+        for tok in tokenize.generate_tokens(lambda: next(it, '')):
+            # Strings are single tokens, so the numbers in them are kept
+            if tok[0] == tokenize.NUMBER:
+                numbers.append((starts[tok[2][0] - 1] + tok[2][1],
+                    starts[tok[3][0] - 1] + tok[3][1], tok[1]))
+    except (tokenize.TokenError, SyntaxError):
+        # Leave the expression for the compiler to report
+        return expr, []
+    literals = []
+    template = []
+    end = 0
+    for start, stop, text in numbers:
+        if _INT_RE.match(text):
+            literals.append(int(text))
+        elif _FLOAT_RE.match(text):
+            literals.append(float(text))
+        else:
+            continue
+        template.append(expr[end:start])
+        template.append('{0}[{1}]'.format(_LITERALS_ARG, len(literals) - 1))
+        end = stop
+    template.append(expr[end:])
+    return ''.join(template), literals
+
+
+def _now():
+    '''Get the current time as an RTC.Time.'''
     now = time.time()
-    sys_time = RTC.Time(int(now), int((now - int(now)) * 1e9))
-    return expr.format(time=sys_time)
+    return RTC.Time(int(now), int((now - int(now)) * 1e9))
+
+
+def _repo_id_to_name(repo_id):
+    '''Converts an IDL repository ID to a dotted Python name.'''
+    name = repo_id[4:]
+    colon = name.rfind(':')
+    if colon != -1:
+        name = name[:colon]
+    return name.replace('/', '.')
 
 
 def _find_module_names(expr):
-    '''Finds all potential module names in an expression.'''
-    return [x[:-1] for x in re.findall(r'(?P<mod>[a-zA-Z][\w.]*\.)+[a-zA-Z]',
-        expr)]
+    '''Finds all potential module names in an expression.
+
+    Names are only found from their start, so that the end of another name
+    (such as _rtshell_time in _rtshell_time.sec) is not taken for one.
+
+    '''
+    return [x[:-1] for x in re.findall(
+        r'(?<![\w.])(?P<mod>[a-zA-Z][\w.]*\.)+[a-zA-Z]', expr)]
 
 
 def _find_object_name(expr):
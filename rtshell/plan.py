@@ -21,7 +21,6 @@ from __future__ import print_function
 import operator
 import os
 import rtctree.path
-import rtsprofile.message_sending
 import sys
 import threading
 import time
@@ -550,6 +549,7 @@ class Plan(object):
 
     def make(self, rtsprofile, actions, conds_source, monitor_target):
         '''Make a plan from a list of actions and an RTSProfile.'''
+        from rtsprofile import message_sending
         all = {}
         # First build a dictionary indexed by target for each action
         for a in actions:
@@ -567,15 +567,15 @@ class Plan(object):
                           c.target_component.component_id,
                           c.target_component.instance_name)
                 action = all[target]
-                if c.__class__ == rtsprofile.message_sending.Condition:
+                if c.__class__ == message_sending.Condition:
                     # Just a sequencing value
                     action.add_condition(BasicCondition(executor=action,
                             sequence=c.sequence))
-                elif c.__class__ == rtsprofile.message_sending.WaitTime:
+                elif c.__class__ == message_sending.WaitTime:
                     # An action to be executed after a certain amount of time
                     action.add_condition(SleepCondition(executor=action,
                         wait_time=c.wait_time, sequence=c.sequence))
-                elif c.__class__ == rtsprofile.message_sending.Preceding:
+                elif c.__class__ == message_sending.Preceding:
                     # An action that waits for a previous action to
                     # occur/complete.
                     if c.sending_timing == 'SYNC':
@@ -0,0 +1,131 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Windowed aggregation of numeric port data, for rtprint's aggregation mode.
+
+Requires NumPy.
+
+'''
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Number of values per window kept for calculating the summary. Beyond this,
+# the most recent values are used.
+DEFAULT_CAPACITY = 1 << 18
+# Width in characters of the longest bar of a histogram
+HISTOGRAM_WIDTH = 50
+# Percentiles included in summaries
+PERCENTILES = [5, 50, 95]
+
+
+###############################################################################
+## Aggregator of one port's values
+##
+## Values are copied into a preallocated NumPy ring buffer as they arrive; a
+## sequence value is copied in one slice assignment. The summary of a window
+## is calculated over the whole buffer at once when the window ends. For
+## ports of sequence types, the summary is of all elements of all values
+## received in the window.
+
+class Aggregator(object):
+    def __init__(self, name, capacity=DEFAULT_CAPACITY, histogram_bins=0,
+            *args, **kwargs):
+        '''Constructor.
+
+        @param name The name of the port.
+        @param capacity The number of values per window to keep.
+        @param histogram_bins The number of bins of the histogram printed
+                              with each summary. Set to 0 for no histogram.
+
+        '''
+        super(Aggregator, self).__init__()
+        self._name = name
+        self._cap = capacity
+        self._bins = histogram_bins
+        self._buf = numpy.empty(capacity, dtype=numpy.float64)
+        self._n = 0
+        self._samples = 0
+
+    @property
+    def name(self):
+        '''The name of the port.'''
+        return self._name
+
+    def add(self, value):
+        '''Add a value (a number or a sequence of numbers) to the window.
+
+        Raises TypeError or ValueError if the value is not numeric.
+
+        '''
+        if isinstance(value, (list, tuple)):
+            values = numpy.asarray(value, dtype=numpy.float64)
+            k = len(values)
+            if k >= self._cap:
+                # Only the last values fit; they are rotated so that the
+                # oldest is the next to be overwritten
+                self._buf[:] = numpy.roll(values[-self._cap:],
+                        (self._n + k) % self._cap)
+            else:
+                start = self._n % self._cap
+                end = start + k
+                if end <= self._cap:
+                    self._buf[start:end] = values
+                else:
+                    split = self._cap - start
+                    self._buf[start:] = values[:split]
+                    self._buf[:k - split] = values[split:]
+            self._n += k
+        else:
+            self._buf[self._n % self._cap] = float(value)
+            self._n += 1
+        self._samples += 1
+
+    def report(self):
+        '''Summarise the current window and start a new one.
+
+        @return A list of lines of text.
+
+        '''
+        n = min(self._n, self._cap)
+        if not n:
+            lines = ['{0}: no values'.format(self._name)]
+        else:
+            v = self._buf[:n]
+            pcs = numpy.percentile(v, PERCENTILES)
+            lines = ['{0}: {1} samples, {2} values; min {3:g}, max {4:g}, '
+                    'mean {5:g}, stddev {6:g}, {7}'.format(self._name,
+                        self._samples, self._n, v.min(), v.max(), v.mean(),
+                        v.std(), ', '.join(['p{0} {1:g}'.format(p, x) \
+                                for p, x in zip(PERCENTILES, pcs)]))]
+            if self._bins:
+                lines += _histogram(v, self._bins)
+        self._n = 0
+        self._samples = 0
+        return lines
+
+
+def _histogram(values, bins):
+    '''Draw a text histogram of some values.'''
+    counts, edges = numpy.histogram(values, bins=bins)
+    scale = float(HISTOGRAM_WIDTH) / max(counts.max(), 1)
+    return ['  [{0:>11.4g}, {1:>11.4g}) {2:>8} {3}'.format(edges[ii],
+        edges[ii + 1], c, '#' * int(round(c * scale))) \
+                for ii, c in enumerate(counts)]
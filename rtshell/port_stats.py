@@ -0,0 +1,170 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Statistics of the data received on ports, for rtprint's statistics mode.
+
+'''
+
+
+import array
+
+
+# Number of samples per report interval kept for calculating percentiles.
+# Beyond this, the most recent samples are used.
+DEFAULT_CAPACITY = 8192
+# A gap is detected when the time between the time stamps of two consecutive
+# samples is more than this many times the usual publishing period.
+GAP_FACTOR = 1.8
+# Weight of each new publishing period in the running estimate of the usual
+# period.
+_PERIOD_WEIGHT = 0.05
+
+
+###############################################################################
+## Statistics of one port
+##
+## Each sample costs a constant amount of work: the inter-arrival time and
+## latency are stored in preallocated ring buffers and running totals are
+## updated. Percentiles are only calculated when a report is made.
+##
+## Sequence gaps are detected from the time stamps of RTC standard types: the
+## usual publishing period is estimated from the stamps, and an interval much
+## longer than it means samples were lost (e.g. by buffer overflow). Stamps
+## that go backwards are counted separately.
+
+class PortStats(object):
+    def __init__(self, name, capacity=DEFAULT_CAPACITY,
+            gap_factor=GAP_FACTOR, *args, **kwargs):
+        '''Constructor.
+
+        @param name The name of the port.
+        @param capacity The number of samples per report interval to keep
+                        for calculating percentiles.
+        @param gap_factor The multiple of the usual publishing period beyond
+                          which a gap is detected.
+
+        '''
+        super(PortStats, self).__init__()
+        self._name = name
+        self._cap = capacity
+        self._gap_factor = gap_factor
+        self._iats = array.array('d', [0.0]) * capacity
+        self._lats = array.array('d', [0.0]) * capacity
+        self._last_recv = None
+        self._last_stamp = None
+        self._period = None
+        self._total = 0
+        self._start = None
+        self._reset()
+
+    @property
+    def name(self):
+        '''The name of the port.'''
+        return self._name
+
+    @property
+    def total(self):
+        '''The total number of samples received.'''
+        return self._total
+
+    def add(self, recv_time, stamp=None):
+        '''Add a sample.
+
+        @param recv_time The time the sample was received, in seconds.
+        @param stamp The time stamp of the sample, in seconds, or None if
+                     the sample has no time stamp.
+
+        '''
+        if self._last_recv is not None:
+            iat = recv_time - self._last_recv
+            self._iats[self._n_iat % self._cap] = iat
+            self._n_iat += 1
+            self._iat_sum += iat
+        self._last_recv = recv_time
+        self._count += 1
+        self._total += 1
+        if stamp is None:
+            return
+        lat = recv_time - stamp
+        self._lats[self._n_lat % self._cap] = lat
+        self._n_lat += 1
+        self._lat_sum += lat
+        if self._last_stamp is not None:
+            period = stamp - self._last_stamp
+            if period < 0:
+                self._backwards += 1
+            elif self._period is not None and \
+                    period > self._period * self._gap_factor:
+                self._gaps += 1
+                self._missed += int(round(period / self._period)) - 1
+            elif self._period is None:
+                self._period = period
+            else:
+                self._period += (period - self._period) * _PERIOD_WEIGHT
+        self._last_stamp = stamp
+
+    def report(self, now):
+        '''Make the report of the current interval and start a new one.
+
+        @param now The current time, in seconds.
+        @return A line of text summarising the interval.
+
+        '''
+        duration = now - self._start
+        if duration > 0:
+            rate = self._count / duration
+        else:
+            rate = 0.0
+        parts = ['{0}: {1} samples, {2:.1f} Hz'.format(self._name,
+            self._count, rate)]
+        if self._n_iat:
+            parts.append('interval ' + _summary(self._iats,
+                min(self._n_iat, self._cap), self._iat_sum / self._n_iat))
+        if self._n_lat:
+            parts.append('latency ' + _summary(self._lats,
+                min(self._n_lat, self._cap), self._lat_sum / self._n_lat))
+            parts.append('gaps {0} ({1} samples missed)'.format(self._gaps,
+                self._missed))
+            if self._backwards:
+                parts.append('{0} time stamps out of order'.format(
+                    self._backwards))
+        self._reset(now)
+        return '; '.join(parts)
+
+    def start(self, now):
+        '''Start the first report interval.'''
+        self._reset(now)
+
+    def _reset(self, now=None):
+        self._start = now
+        self._count = 0
+        self._n_iat = 0
+        self._iat_sum = 0.0
+        self._n_lat = 0
+        self._lat_sum = 0.0
+        self._gaps = 0
+        self._missed = 0
+        self._backwards = 0
+
+
+def _summary(values, n, mean):
+    '''Summarise the first n values of a buffer, in milliseconds.'''
+    ordered = sorted(values[:n])
+    def pc(q):
+        return ordered[int(q * (n - 1) + 0.5)] * 1000
+    return 'mean {0:.3f} ms, p50 {1:.3f}, p95 {2:.3f}, p99 {3:.3f}, ' \
+            'max {4:.3f}'.format(mean * 1000, pc(0.5), pc(0.95), pc(0.99),
+                    ordered[-1] * 1000)
@@ -22,7 +22,6 @@ Classes and functions for managing port types.
 import re
 import rtctree.path
 
-from rtshell import comp_mgmt
 from rtshell import fmt
 from rtshell import rts_exceptions
 
@@ -119,6 +118,7 @@ def make_port_specs(ports, modmgr, tree):
     @param tree An RTCTree to search for the ports in.
 
     '''
+    from rtshell import comp_mgmt
     result = {}
     index = 0
     for (rtc, port, name, form, raw) in ports:
@@ -0,0 +1,173 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Machine-readable output formats for rtprint.
+
+Each printed value becomes one record holding the time stamp, the name of the
+port it was received on and the value's fields as plain data. Serialisers are
+made once per port; the extractor for the port's data type is generated from
+the IDL type descriptor when it is available, or from the first value
+received otherwise.
+
+'''
+
+
+import csv
+import json
+import pickle
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from rtshell import struct_fields
+
+
+# Formats other than the default human-readable text
+FORMATS = ['json', 'csv', 'msgpack', 'pickle']
+# Formats that produce bytes rather than text
+BINARY_FORMATS = ['msgpack', 'pickle']
+
+
+def have_format(format):
+    '''Check if the modules needed by a format are available.'''
+    if format == 'msgpack':
+        return msgpack is not None
+    return format in FORMATS
+
+
+def binary_stream(stream):
+    '''Get the stream to write the bytes of binary formats to.'''
+    return getattr(stream, 'buffer', stream)
+
+
+def make_serialiser(format, port_name, type=None):
+    '''Create the serialiser of a port's records.
+
+    @param format The output format (one of FORMATS).
+    @param port_name The name of the port, included in each record.
+    @param type The data type of the port. If given, the field extractor is
+                generated from it immediately.
+
+    '''
+    if format not in SERIALISERS:
+        raise ValueError('Unknown output format: {0}'.format(format))
+    return SERIALISERS[format](port_name, type)
+
+
+###############################################################################
+## Serialisers
+##
+## A serialiser is called with the time stamp of a value, as a tuple of
+## (seconds, nanoseconds), and the value, and returns the record to write,
+## including its terminator.
+
+class JSONSerialiser(object):
+    '''One JSON object per line: {"ts": ..., "port": ..., "data": ...}.'''
+    def __init__(self, port_name, type=None, *args, **kwargs):
+        super(JSONSerialiser, self).__init__()
+        self._name = port_name
+        self._extract = None
+        if type is not None:
+            self._extract = self._type_extractor(type)
+
+    def __call__(self, ts, data):
+        if self._extract is None:
+            self._extract = self._sample_extractor(data)
+        return self._record(ts, self._extract(data))
+
+    def _record(self, ts, plain):
+        # The time stamp is written as a number with full precision
+        return '{{"ts": {0}.{1:09}, "port": {2}, "data": {3}}}\n'.format(
+                ts[0], ts[1], json.dumps(self._name), json.dumps(plain))
+
+    def _sample_extractor(self, sample):
+        return struct_fields.dict_extractor(sample)
+
+    def _type_extractor(self, type):
+        return struct_fields.type_dict_extractor(type)
+
+
+class CSVSerialiser(JSONSerialiser):
+    '''One row per value: time stamp, port name and the leaf fields.
+
+    A header row naming the columns is written before the first row of each
+    port.
+
+    '''
+    def __init__(self, port_name, type=None, *args, **kwargs):
+        self._header = True
+        self._buf = _LineBuffer()
+        self._csv = csv.writer(self._buf, lineterminator='\n')
+        super(CSVSerialiser, self).__init__(port_name, type, *args, **kwargs)
+
+    def _record(self, ts, row):
+        if self._header:
+            self._csv.writerow(('ts', 'port') + self._columns)
+            self._header = False
+        self._csv.writerow(('{0}.{1:09}'.format(ts[0], ts[1]), self._name) +
+                row)
+        return self._buf.take()
+
+    def _sample_extractor(self, sample):
+        self._columns, extract = struct_fields.row_extractor(sample)
+        return extract
+
+    def _type_extractor(self, type):
+        result = struct_fields.type_row_extractor(type)
+        if result is None:
+            return None
+        self._columns, extract = result
+        return extract
+
+
+class PickleSerialiser(JSONSerialiser):
+    '''A stream of pickled dictionaries: {'ts': ..., 'port': ..., 'data': ...}.
+
+    The time stamp is a float. The data is plain Python data, so it can be
+    unpickled without the IDL modules of the data type.
+
+    '''
+    def _record(self, ts, plain):
+        # Protocol 2 can be read by both Python 2 and Python 3
+        return pickle.dumps({'ts': ts[0] + ts[1] / 1e9, 'port': self._name,
+            'data': plain}, 2)
+
+
+class MsgpackSerialiser(PickleSerialiser):
+    '''A stream of MessagePack maps: {"ts": ..., "port": ..., "data": ...}.'''
+    def _record(self, ts, plain):
+        return msgpack.packb({'ts': ts[0] + ts[1] / 1e9, 'port': self._name,
+            'data': plain}, use_bin_type=True)
+
+
+SERIALISERS = {'json': JSONSerialiser, 'csv': CSVSerialiser,
+        'msgpack': MsgpackSerialiser, 'pickle': PickleSerialiser}
+
+
+class _LineBuffer(object):
+    '''A file-like object collecting the output of a CSV writer.'''
+    def __init__(self):
+        self._data = []
+
+    def write(self, data):
+        self._data.append(data)
+
+    def take(self):
+        result = ''.join(self._data)
+        self._data = []
+        return result
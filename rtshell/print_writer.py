@@ -0,0 +1,96 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Buffered output of printed data.
+
+'''
+
+
+import sys
+import time
+
+
+###############################################################################
+## Buffered writer
+##
+## Output is accumulated and written to the stream in one call, rather than
+## writing and flushing once per sample. The buffer is flushed when it holds
+## more than buffer_size characters, and at the end of an execution cycle if
+## at least flush_interval seconds have passed since the last flush (so with
+## the default interval of 0, once per cycle). In line-buffered mode every
+## write is flushed immediately, for interactive use.
+
+class BufferedWriter(object):
+    def __init__(self, stream=None, line_buffered=False, buffer_size=65536,
+            flush_interval=0.0, *args, **kwargs):
+        '''Constructor.
+
+        @param stream The stream to write to. Defaults to stdout.
+        @param line_buffered Flush after every write.
+        @param buffer_size The number of characters to buffer before
+                           flushing, regardless of the flush interval.
+        @param flush_interval The minimum time in seconds between flushes
+                              at the end of a cycle.
+
+        '''
+        super(BufferedWriter, self).__init__()
+        if stream is None:
+            stream = sys.stdout
+        self._stream = stream
+        self._line_buf = line_buffered
+        self._buf_size = buffer_size
+        self._flush_int = flush_interval
+        self._chunks = []
+        self._size = 0
+        self._last_flush = time.time()
+
+    @property
+    def line_buffered(self):
+        '''Whether every write is flushed immediately.'''
+        return self._line_buf
+
+    def write(self, data):
+        '''Add data to the buffer, flushing it if necessary.
+
+        The data must include any line terminator. All data written must be
+        of the same type (text or bytes) as the stream accepts.
+
+        '''
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._line_buf or self._size >= self._buf_size:
+            self.flush()
+
+    def end_cycle(self):
+        '''Mark the end of an execution cycle.
+
+        The buffer is flushed if the flush interval has passed.
+
+        '''
+        if self._chunks and \
+                time.time() - self._last_flush >= self._flush_int:
+            self.flush()
+
+    def flush(self):
+        '''Write the buffered data to the stream and flush it.'''
+        if self._chunks:
+            # Join with an empty string of the same type as the data
+            self._stream.write(self._chunks[0][:0].join(self._chunks))
+            self._chunks = []
+            self._size = 0
+        self._stream.flush()
+        self._last_flush = time.time()
+
@@ -0,0 +1,154 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Precise-rate publishing scheduler for rtinject.
+
+'''
+
+
+import time
+
+
+# The clock used for deadlines. Python 2 has no monotonic clock.
+_clock = getattr(time, 'monotonic', time.time)
+# Time before a deadline at which the scheduler stops sleeping and spins, to
+# avoid the wake-up latency of the operating system's sleep.
+SPIN_MARGIN = 0.0002
+
+
+###############################################################################
+## Publishing scheduler
+##
+## Deadlines are calculated from the start time and the sample number, not
+## from the previous deadline, so errors do not accumulate. Each wake-up
+## publishes one batch of samples. If the scheduler falls behind, overdue
+## batches are published immediately one after the other until it has caught
+## up; a wake-up more than one batch interval after its deadline is counted
+## as a deadline miss.
+
+class Scheduler(object):
+    def __init__(self, write, rate, batch=1, max=-1, timeout=None,
+            spin=SPIN_MARGIN, *args, **kwargs):
+        '''Constructor.
+
+        @param write The function that publishes a sample. It receives the
+                     sample number, and may raise StopIteration when there
+                     are no more samples to publish.
+        @param rate The rate in Hertz at which to publish samples.
+        @param batch The number of samples to publish per wake-up.
+        @param max The number of samples to publish, or -1 for no limit.
+        @param timeout The time in seconds after which to stop, or None.
+        @param spin The time before each deadline to spin rather than sleep.
+
+        '''
+        super(Scheduler, self).__init__()
+        self._write = write
+        self._period = 1.0 / rate
+        self._rate = rate
+        self._batch = batch
+        self._max = max
+        self._timeout = timeout
+        self._spin = spin
+        self._written = 0
+        self._wakes = 0
+        self._missed = 0
+        self._max_late = 0.0
+        self._start = None
+        self._last_wake = None
+        self._last_batch = 0
+
+    @property
+    def missed(self):
+        '''The number of deadlines missed.'''
+        return self._missed
+
+    @property
+    def written(self):
+        '''The number of samples published.'''
+        return self._written
+
+    def run(self):
+        '''Publish samples until the maximum number, the timeout or the end
+        of the samples.
+
+        KeyboardInterrupt is passed on to the caller; the report remains
+        valid.
+
+        '''
+        interval = self._period * self._batch
+        start = self._start = _clock()
+        n = 0
+        while self._max < 0 or n < self._max:
+            deadline = start + n * self._period
+            if self._timeout is not None and \
+                    deadline - start >= self._timeout:
+                break
+            now = _clock()
+            if now < deadline:
+                _wait_until(deadline, self._spin)
+                now = _clock()
+            late = now - deadline
+            if late > interval:
+                self._missed += 1
+            if late > self._max_late:
+                self._max_late = late
+            num = self._batch
+            if self._max > -1:
+                num = min(num, self._max - n)
+            end = n
+            try:
+                for ii in range(n, n + num):
+                    self._write(ii)
+                    end = ii + 1
+            except StopIteration:
+                # The samples ran out; this is the normal end
+                num = 0
+            if end > n:
+                self._last_wake = now
+                self._last_batch = end - n
+                self._wakes += 1
+                self._written += end - n
+            if not num:
+                break
+            n += num
+
+    def report(self):
+        '''Report the achieved rate and the deadlines missed.'''
+        if self._wakes < 2 or self._last_wake <= self._start:
+            rate = ''
+        else:
+            # The samples published before the last wake-up
+            achieved = (self._written - self._last_batch) / \
+                    (self._last_wake - self._start)
+            rate = ': {0:.1f} samples/s (requested {1:.1f} samples/s, ' \
+                    '{2:.1f}%)'.format(achieved, self._rate,
+                            achieved / self._rate * 100)
+        return 'Wrote {0} samples in {1} batches{2}; {3} deadlines missed, ' \
+                'maximum lateness {4:.3f} ms'.format(self._written,
+                        self._wakes, rate, self._missed, self._max_late * 1000)
+
+
+def _wait_until(deadline, spin):
+    '''Sleep until shortly before a deadline, then spin until it.'''
+    remaining = deadline - _clock() - spin
+    if remaining > 0:
+        time.sleep(remaining)
+    while _clock() < deadline:
+        pass
+
+
+# vim: tw=79
+
@@ -19,6 +19,7 @@ Implementation of the command to move a component to the activated state.
 '''
 
 
+from rtshell import daemon
 from rtshell import state_control_base
 
 
@@ -26,6 +27,7 @@ def activate_action(object, ec_index):
     object.activate_in_ec(ec_index)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     return state_control_base.base_main('Activate a component.',
             activate_action, argv)
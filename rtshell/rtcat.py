@@ -24,18 +24,19 @@ import optparse
 import os
 import os.path
 import rtctree.exceptions
-import rtctree.tree
 import rtctree.path
-import rtctree.utils
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
 def format_port(port, comp, start_indent=0, use_colour=True, long=0):
+    import rtctree.utils
     result = []
     indent = start_indent
     if long > 0:
@@ -146,6 +147,7 @@ def find_composite_comp(tree, member, inst_name):
 
 
 def format_composite(comp, tree, start_indent=0, use_colour=True, long=0):
+    import rtctree.utils
     result = []
     indent = start_indent
     for o in comp.organisations:
@@ -181,6 +183,7 @@ def format_composite(comp, tree, start_indent=0, use_colour=True, long=0):
 
 
 def format_comp_member(comp, tree, start_indent=0, use_colour=True, long=0):
+    import rtctree.utils
     result = []
     indent = start_indent
     for po in comp.parent_organisations:
@@ -215,6 +218,7 @@ def format_comp_member(comp, tree, start_indent=0, use_colour=True, long=0):
 
 
 def format_ec(ec, start_indent=0, use_colour=True, long=0):
+    import rtctree.utils
     result = []
     indent = start_indent
     handle_str = rtctree.utils.build_attr_string('bold',
@@ -380,6 +384,7 @@ missing. Possible version conflict between rtshell and OpenRTM-aist.'.format(\
 
 
 def cat_target(cmd_path, full_path, options, tree=None):
+    import rtctree.utils
     use_colour = rtctree.utils.colour_supported(sys.stdout)
 
     path, port = rtctree.path.parse_path(full_path)
@@ -396,7 +401,7 @@ def cat_target(cmd_path, full_path, options, tree=None):
             filter = []
         else:
             filter = [path]
-        tree = rtctree.tree.RTCTree(paths=path, filter=filter)
+        tree = trees.make_tree(paths=path, filter=filter)
 
     if not tree.has_path(path):
         raise rts_exceptions.NoSuchObjectError(cmd_path)
@@ -426,6 +431,7 @@ def cat_target(cmd_path, full_path, options, tree=None):
             raise rts_exceptions.NoSuchObjectError(cmd_path)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] [path]
 Display information about a manager or component.'''
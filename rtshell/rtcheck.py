@@ -24,14 +24,13 @@ from __future__ import print_function
 import optparse
 import os
 import rtctree.path
-import rtctree.tree
-import rtsprofile.rts_profile
 import sys
 import traceback
 
 from rtshell import actions
 from rtshell import option_store
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -144,6 +143,7 @@ def check_states(rtsprofile, expected, req_cb):
 
 
 def check(profile=None, xml=True, state='Active', dry_run=False, tree=None):
+    import rtsprofile.rts_profile
     # Load the profile
     if profile:
         # Read from a file
@@ -170,7 +170,7 @@ def check(profile=None, xml=True, state='Active', dry_run=False, tree=None):
     else:
         if not tree:
             # Load the RTC Tree, using the paths from the profile
-            tree = rtctree.tree.RTCTree(paths=[rtctree.path.parse_path(
+            tree = trees.make_tree(paths=[rtctree.path.parse_path(
                 '/' + c.path_uri)[0] for c in rtsp.components])
         for a in actions:
             a(tree)
@@ -25,17 +25,14 @@ import optparse
 import os
 import rtctree.exceptions
 import rtctree.path
-import rtctree.tree
-import rtctree.utils
-import SDOPackage
-import SDOPackage__POA
 import sys
 import traceback
 from functools import reduce
 
+from rtshell import daemon
 from rtshell import path
-from rtshell import rtmgr
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -177,7 +174,7 @@ def manage_composition(tgt_raw_path, tgt_full_path, options, tree=None):
     # Make a tree
     if not tree:
         paths = [tgt_path] + [y for x, y, z in add_paths + rem_paths]
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
     tgt_obj = tree.get_node(tgt_path)
     if not tgt_obj:
         raise rts_exceptions.NoSuchObjectError(tgt_raw_path)
@@ -240,6 +237,7 @@ def manage_composition(tgt_raw_path, tgt_full_path, options, tree=None):
                     file=sys.stderr)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <manager:name|composite component path>
 Manage composite components.'''
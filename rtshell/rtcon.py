@@ -24,13 +24,14 @@ import optparse
 import os
 import os.path
 import rtctree.exceptions
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -68,7 +69,7 @@ def connect_ports(paths, options, tree=None):
     paths, ports = list(zip(*pathports))
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
 
     port_objs = []
     for ii, p in enumerate(pathports):
@@ -101,6 +102,7 @@ def connect_ports(paths, options, tree=None):
             props=options.properties)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     def property_callback(option, opt, option_value, parser):
         if option_value.count('=') != 1:
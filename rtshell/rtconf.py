@@ -24,14 +24,14 @@ import optparse
 import os
 import os.path
 import rtctree.exceptions
-import rtctree.tree
 import rtctree.path
-import rtctree.utils
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -42,6 +42,7 @@ def is_hidden(name):
 
 
 def format_conf_set(set_name, set, is_active, use_colour, long):
+    import rtctree.utils
     result = []
     indent = 0
     if long:
@@ -96,7 +97,7 @@ def get_comp(cmd_path, full_path, tree=None):
         raise rts_exceptions.NoSuchObjectError(cmd_path)
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     comp = tree.get_node(path)
     if not comp:
@@ -110,6 +111,7 @@ def get_comp(cmd_path, full_path, tree=None):
 
 
 def print_conf_sets(cmd_path, full_path, options, tree=None):
+    import rtctree.utils
     use_colour = rtctree.utils.colour_supported(sys.stdout)
     tree, comp = get_comp(cmd_path, full_path, tree)
 
@@ -166,6 +168,7 @@ def activate_set(cmd_path, full_path, options, tree=None):
     comp.activate_conf_set(options.set_name)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog <path> [options] [command] [args]
 Display and edit configuration parameters and sets.'''
@@ -24,20 +24,12 @@ from __future__ import print_function
 import datetime
 import optparse
 import os.path
-import rtctree.tree
 import rtctree.path
-import rtsprofile
-import rtsprofile.rts_profile
-import rtsprofile.component
-import rtsprofile.config_set
-import rtsprofile.exec_context
-import rtsprofile.port_connectors
-import rtsprofile.ports
-import rtsprofile.targets
 import sys
 import traceback
 
 from rtshell import option_store
+from rtshell import trees
 import rtshell
 
 
@@ -83,6 +75,8 @@ def find_all_used_components(tree):
 
 
 def find_unique_connectors(tree, components):
+    import rtsprofile.port_connectors
+    import rtsprofile.targets
     # Finds all unique connections between the components
     data_connectors = []
     seen_svc_connectors = []
@@ -172,6 +166,10 @@ def find_unique_connectors(tree, components):
 
 
 def tree_comps_to_rts_comps(components):
+    import rtsprofile.component
+    import rtsprofile.config_set
+    import rtsprofile.exec_context
+    import rtsprofile.ports
     rts_comps = []
     for comp in components:
         active_conf_set = comp.active_conf_set_name if comp.active_conf_set \
@@ -208,6 +206,7 @@ def tree_comps_to_rts_comps(components):
 
 
 def data_conns_to_rts_conns(connectors):
+    import rtsprofile.targets
     result = []
     for conn in connectors:
         source_port = rtsprofile.targets.TargetPort()
@@ -217,8 +216,9 @@ def data_conns_to_rts_conns(connectors):
 
 def freeze_dry(servers, dest='-', xml=True, abstract='', vendor='', sysname='',
         version='', tree=None):
+    import rtsprofile.rts_profile
     if not tree:
-        tree = rtctree.tree.RTCTree(servers=servers)
+        tree = trees.make_tree(servers=servers)
     # Run through the tree finding component names and connections to
     # preserve.
     components = find_all_used_components(tree)
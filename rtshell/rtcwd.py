@@ -21,13 +21,14 @@ Create a command to change the current working directory environment variable.
 from __future__ import print_function
 
 import os
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 
 if sys.platform == 'win32':
     SET_CMD = 'set'
@@ -55,7 +56,7 @@ def cd(cmd_path, full_path):
     if not path[-1]:
         # Remove trailing slash part
         path = path[:-1]
-    tree = rtctree.tree.RTCTree(paths=path)
+    tree = trees.make_tree(paths=path)
     if not tree.has_path(path):
         raise rts_exceptions.NotADirectoryError(cmd_path)
     if not tree.is_directory(path):
@@ -63,6 +64,7 @@ def cd(cmd_path, full_path):
     return make_cmd_line(full_path)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     if argv:
         sys.argv = [sys.argv[0]] + argv
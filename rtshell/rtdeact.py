@@ -19,6 +19,7 @@ Implementation of the command to move a component to the inactive state.
 '''
 
 
+from rtshell import daemon
 from rtshell import state_control_base
 
 
@@ -26,6 +27,7 @@ def deactivate_action(object, ec_index):
     object.deactivate_in_ec(ec_index)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     return state_control_base.base_main('Deactivate a component.',
             deactivate_action, argv)
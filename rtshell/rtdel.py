@@ -23,13 +23,14 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -45,7 +46,7 @@ def delete_object_reference(cmd_path, full_path, options, tree=None):
         raise rts_exceptions.UndeletableObjectError(cmd_path)
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     if options.zombies and not tree.is_zombie(path):
         raise rts_exceptions.NotZombieObjectError(cmd_path)
@@ -63,7 +64,7 @@ def delete_object_reference(cmd_path, full_path, options, tree=None):
 
 def delete_all_zombies(options, tree=None):
     if not tree:
-        tree = rtctree.tree.RTCTree()
+        tree = trees.make_tree()
     if not tree:
         return 1
     def del_zombie(node, args):
@@ -76,6 +77,7 @@ def delete_all_zombies(options, tree=None):
     tree.iterate(del_zombie, filter=['is_zombie'])
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <path>
 Delete an object from a name server.'''
@@ -23,13 +23,14 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -38,7 +39,7 @@ def disconnect_all(cmd_path, full_path, options, tree=None):
     if not path[-1]:
         raise rts_exceptions.NoSuchObjectError(cmd_path)
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     object = tree.get_node(path)
     if not object:
@@ -86,7 +87,7 @@ def disconnect_ports(paths, options, tree=None):
     paths, ports = list(zip(*pathports))
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
 
     port_objs = []
     for ii, p in enumerate(pathports):
@@ -123,6 +124,7 @@ def disconnect_ports(paths, options, tree=None):
         c.disconnect()
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <source path> [destination path]
 Remove connections.'''
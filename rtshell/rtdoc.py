@@ -23,13 +23,14 @@ import docutils.core
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -203,7 +204,7 @@ def get_docs(cmd_path, full_path, options, tree=None):
         raise rts_exceptions.NotAComponentError(cmd_path)
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path)
+        tree = trees.make_tree(paths=path)
 
     if not tree.has_path(path):
         raise rts_exceptions.NoSuchObjectError(cmd_path)
@@ -217,6 +218,7 @@ def get_docs(cmd_path, full_path, options, tree=None):
         raise rts_exceptions.NotAComponentError(cmd_path)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <path>
 Display component documentation.'''
@@ -23,14 +23,14 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
-import RTC
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -44,7 +44,7 @@ def exit_target(cmd_path, full_path, options, tree=None):
         raise rts_exceptions.NotAComponentError(cmd_path)
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     if not tree.has_path(path):
         raise rts_exceptions.NoSuchObjectError(cmd_path)
@@ -57,6 +57,7 @@ def exit_target(cmd_path, full_path, options, tree=None):
     object.exit()
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] <path>
 Make a component exit.'''
@@ -24,13 +24,14 @@ import optparse
 import os
 import os.path
 import re
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -84,7 +85,7 @@ def search(cmd_path, full_path, options, tree=None):
         path = path[:-1]
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     # Find the root node of the search
     root = tree.get_node(path)
@@ -119,6 +120,7 @@ def search(cmd_path, full_path, options, tree=None):
     return root.iterate(get_result, filter=[matches_search])
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog <search path> [options]
 Find entries in the RTC tree matching given constraints.'''
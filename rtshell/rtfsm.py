@@ -25,14 +25,12 @@ import argparse
 import os
 import rtctree.exceptions
 import rtctree.path
-import rtctree.tree
-import rtctree.utils
-import rtctree.rtc.RTC
 import sys
 import traceback
 
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 def getstate(fsm, arg):
@@ -56,6 +54,7 @@ def getstructure(fsm, arg):
     return result
 
 def seteventprofiles(fsm, arg):
+    import rtctree.rtc.RTC
     ret, struct = fsm.get_fsm_structure()
     struct.event_profiles = []
     for a in arg:
@@ -86,7 +85,7 @@ def manage_fsm(tgt_raw_path, tgt_full_path, command, argument, options, tree=Non
         raise rts_exceptions.NotAComponentError(tgt_raw_path)
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     if not tree.has_path(path):
         raise rts_exceptions.NoSuchObjectError(path)
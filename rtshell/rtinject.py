@@ -20,29 +20,43 @@ Implementation of the command to print data sent by ports to the console.
 
 from __future__ import print_function
 
+import itertools
 import optparse
 import os.path
-import rtctree.tree
-import rtctree.utils
 import sys
 import threading
 import time
 import traceback
-import OpenRTM_aist
-import RTC
 
-from rtshell import comp_mgmt
-from rtshell import modmgr
+from rtshell import conn_opts
+from rtshell import inject_formats
 from rtshell import path
-from rtshell import port_types
-from rtshell import rtinject_comp
+from rtshell import publish_sched
+from rtshell import rts_exceptions
+from rtshell import trees
+from rtshell import type_cache
+from rtshell import value_queue
+from rtshell import value_table
 import rtshell
 
 
+# Rate of the execution context of the component when values are written by
+# the publishing scheduler
+_SCHEDULED_EC_RATE = 1.0
+
+
 def write_to_ports(raw_paths, options, tree=None):
+    from rtshell import comp_mgmt
+    from rtshell import inject_gen
+    from rtshell import modmgr
+    from rtshell import port_types
+    from rtshell import rtinject_comp
+
+    conn_props = conn_opts.make_props(options)
     event = threading.Event()
 
-    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths)
+    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths,
+            type_cache=type_cache.user_cache(options.verbose))
     mm.load_mods_and_poas(options.modules)
     if options.verbose:
         print('Pre-loaded modules: {0}'.format(mm.loaded_mod_names),
@@ -52,9 +66,18 @@ def write_to_ports(raw_paths, options, tree=None):
         val = mm.evaluate(options.const)
         if options.verbose:
             print('Evaluated value to {0}'.format(val), file=sys.stderr)
+    elif options.generate:
+        if options.verbose:
+            print('Generating values with {0}, {1} per cycle.'.format(
+                options.generate, options.burst), file=sys.stderr)
+    elif options.from_file:
+        if options.verbose:
+            print('Reading values from {0} in {1} format.'.format(
+                options.from_file, options.input_format), file=sys.stderr)
     else:
         if options.verbose:
-            print('Reading values from stdin.', file=sys.stderr)
+            print('Reading values from stdin in {0} format.'.format(
+                options.input_format), file=sys.stderr)
 
     if options.timeout == -1:
         max = options.max
@@ -69,69 +92,163 @@ def write_to_ports(raw_paths, options, tree=None):
     targets = port_types.parse_targets(raw_paths)
     if not tree:
         paths = [t[0] for t in targets]
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
     port_specs = port_types.make_port_specs(targets, mm, tree)
     port_types.require_all_output(port_specs)
     if options.verbose:
         print('Port specifications: {0}'.format([str(p) for p in port_specs]),
                 file=sys.stderr)
 
-    if options.const:
+    if options.generate:
+        if options.generate.startswith('expr:'):
+            # Expressions make their own values, of any type
+            type = None
+        else:
+            type = _port_type(port_specs)
+        gen = inject_gen.make_generator(options.generate, type, mm,
+                size=options.size)
+    elif options.from_file:
+        table = _make_table(options.from_file, options.input_format,
+                port_specs, mm, loop=options.loop,
+                chunk_size=options.chunk_size)
+    if options.precise:
+        # The execution context does not write, so it can run slowly
+        comp_name, mgr = comp_mgmt.make_comp('rtinject_writer', tree,
+                rtinject_comp.ScheduledWriter, port_specs, event=event,
+                rate=_SCHEDULED_EC_RATE)
+    elif options.const:
         comp_name, mgr = comp_mgmt.make_comp('rtinject_writer', tree,
                 rtinject_comp.Writer, port_specs, event=event, rate=options.rate,
                 max=max, val=val)
+    elif options.from_file:
+        comp_name, mgr = comp_mgmt.make_comp('rtinject_writer', tree,
+                rtinject_comp.TableWriter, port_specs, event=event,
+                rate=options.rate, max=max, table=table)
+    elif options.generate:
+        comp_name, mgr = comp_mgmt.make_comp('rtinject_writer', tree,
+                rtinject_comp.GenWriter, port_specs, event=event,
+                rate=options.rate, max=max, gen=gen, burst=options.burst,
+                target_rate=options.rate)
     else:
-        buffer = []
-        mutex = threading.RLock()
+        values = _read_values(options.input_format, port_specs, mm,
+                sys.stdin)
+        if max > -1:
+            values = itertools.islice(values, max)
+        queue = value_queue.ValueQueue(size=options.buffer_size,
+                overflow=options.overflow)
         comp_name, mgr = comp_mgmt.make_comp('rtinject_writer', tree,
                 rtinject_comp.StdinWriter, port_specs, event=event,
-                rate=options.rate, max=max, buf=buffer, mutex=mutex)
+                rate=options.rate, max=max, queue=queue)
     if options.verbose:
         print('Created component {0}'.format(comp_name), file=sys.stderr)
     comp = comp_mgmt.find_comp_in_mgr(comp_name, mgr)
-    comp_mgmt.connect(comp, port_specs, tree)
+    comp_mgmt.connect(comp, port_specs, tree, conn_props)
     comp_mgmt.activate(comp)
-    if options.const:
-        try:
-            if options.timeout != -1:
-                event.wait(options.timeout)
-            elif options.max > -1:
-                event.wait()
+    try:
+        if options.precise:
+            if options.const:
+                sample = lambda n: val
+            elif options.from_file:
+                sample = lambda n: table.next()
             else:
-                if sys.version_info[0] == 3:
-                    input()
+                sample = gen
+            _publish(comp, sample, max, options)
+        elif options.from_file:
+            # Wait until the last value has been written
+            try:
+                if options.timeout != -1:
+                    event.wait(options.timeout)
+                else:
+                    event.wait()
+            except KeyboardInterrupt:
+                pass
+        elif options.const or options.generate:
+            try:
+                if options.timeout != -1:
+                    event.wait(options.timeout)
+                elif options.max > -1:
+                    event.wait()
                 else:
-                    raw_input()
-        except KeyboardInterrupt:
-            pass
-        except EOFError:
-            pass
+                    if sys.version_info[0] == 3:
+                        input()
+                    else:
+                        raw_input()
+            except KeyboardInterrupt:
+                pass
+            except EOFError:
+                pass
+        else:
+            # Read stdin until we receive max number of values or Ctrl-C is hit
+            try:
+                for val in values:
+                    queue.put(val)
+                # Wait until every value read has been written
+                queue.wait_empty()
+            except KeyboardInterrupt:
+                pass
+            if options.verbose and queue.dropped:
+                print('Dropped {0} values because the buffer was full.'.format(
+                    queue.dropped), file=sys.stderr)
+    finally:
+        comp_mgmt.disconnect(comp)
+        comp_mgmt.deactivate(comp)
+        tree.give_away_orb()
+        del tree
+        comp_mgmt.shutdown(mgr, comp)
+
+
+def _publish(comp, sample, max, options):
+    '''Write values from the precise-rate publishing scheduler.'''
+    if options.timeout == -1:
+        timeout = None
     else:
-        # Read stdin until we receive max number of values or Ctrl-C is hit
-        val_cnt = 0
-        try:
-            while val_cnt < max or max < 0:
-                l = sys.stdin.readline()
-                if not l:
-                    break
-                if l[0] == '#':
-                    continue
-                val = mm.evaluate(l)
-                with mutex:
-                    buffer.append(val)
-                val_cnt += 1
-        except KeyboardInterrupt:
-            pass
-        # Wait until the buffer has been cleared
-        while True:
-            with mutex:
-                if not buffer:
-                    break
-    comp_mgmt.disconnect(comp)
-    comp_mgmt.deactivate(comp)
-    tree.give_away_orb()
-    del tree
-    comp_mgmt.shutdown(mgr)
+        timeout = options.timeout
+    def publish(n):
+        comp.write(sample(n))
+    sched = publish_sched.Scheduler(publish, options.rate,
+            batch=options.batch, max=max, timeout=timeout)
+    try:
+        sched.run()
+    except KeyboardInterrupt:
+        pass
+    print(sched.report())
+
+
+def _make_table(filename, format, port_specs, mm, loop=False,
+        chunk_size=0):
+    '''Load the values to write from a file.'''
+    if format in inject_formats.BINARY_FORMATS:
+        mode = 'rb'
+    else:
+        mode = 'r'
+    def load():
+        with open(filename, mode) as f:
+            for v in _read_values(format, port_specs, mm, f):
+                yield v
+    return value_table.ValueTable(load, loop=loop, chunk_size=chunk_size)
+
+
+def _read_values(format, port_specs, mm, stream):
+    '''Get a generator of the values read from a stream.'''
+    if format == 'python':
+        return _eval_lines(stream, mm)
+    return inject_formats.read_values(format, _port_type(port_specs), stream)
+
+
+def _port_type(port_specs):
+    '''Get the data type of the ports, which must all be the same.'''
+    types = set([p.type for p in port_specs])
+    if len(types) != 1:
+        raise rts_exceptions.MixedInputTypesError
+    return types.pop()
+
+
+def _eval_lines(stream, mm):
+    '''Evaluate each line of a stream as a Python expression.'''
+    for l in iter(stream.readline, ''):
+        if l[0] == '#':
+            continue
+        yield mm.evaluate(l)
 
 
 def main(argv=None, tree=None):
@@ -139,10 +256,46 @@ def main(argv=None, tree=None):
 Write a constant value to one or more ports.'''
     version = rtshell.RTSH_VERSION
     parser = optparse.OptionParser(usage=usage, version=version)
+    parser.add_option('-b', '--buffer-size', dest='buffer_size',
+            action='store', type='int', default=value_queue.DEFAULT_SIZE,
+            help='The number of values read from standard in that can be '
+            'waiting to be written. Set to 0 for no limit. '
+            '[Default: %default]')
+    parser.add_option('--batch', dest='batch', action='store', type='int',
+            default=1, help='With --precise, the number of values to write '
+            'per wake-up of the scheduler. [Default: %default]')
+    parser.add_option('--burst', dest='burst', action='store', type='int',
+            default=1, help='The number of generated values to write per '
+            'execution cycle. [Default: %default]')
+    parser.add_option('--chunk-size', dest='chunk_size', action='store',
+            type='int', default=0, help='With --from-file, load the values '
+            'in chunks of this many in the background while writing, '
+            'instead of all before writing. [Default: %default]')
     parser.add_option('-c', '--const', dest='const', action='store',
             type='string', default='',
             help='The constant value to send, as a Python expression. If '
             'not specified, values will be read from standard in.')
+    parser.add_option('-f', '--from-file', dest='from_file',
+            action='store', type='string', default='',
+            help='Read the values to write from a file, in the input '
+            'format, instead of from standard in. All values are read and '
+            'constructed before writing begins.')
+    parser.add_option('-g', '--generate', dest='generate', action='store',
+            type='string', default='',
+            help='Generate varying values for load testing, instead of '
+            'writing a constant or reading standard in. One of counter, '
+            'ramp[:MIN:MAX:STEPS], random, or expr:EXPRESSION (where {n} is '
+            'the sample number). The achieved throughput is reported.')
+    parser.add_option('-i', '--input-format', dest='input_format',
+            action='store', type='choice',
+            choices=['python'] + inject_formats.FORMATS, default='python',
+            help='The format of the values read from standard in or a '
+            'file: Python expressions, or the fields of the data type as '
+            'JSON, CSV or pickled data (as printed by rtprint). Structured '
+            'formats are much faster to read. [Default: %default]')
+    parser.add_option('--loop', dest='loop', action='store_true',
+            default=False, help='With --from-file, start again from the '
+            'first value after writing the last. [Default: %default]')
     parser.add_option('-m', '--mod', dest='modules', action='append',
             type='string', default=[],
             help='Extra modules to import. If automatic module loading '
@@ -152,13 +305,29 @@ Write a constant value to one or more ports.'''
             type='int', default='1',
             help='Specify the number of times to write to the port. '
             '[Default: %default]')
+    parser.add_option('-o', '--overflow', dest='overflow', action='store',
+            type='choice', choices=value_queue.OVERFLOW_POLICIES,
+            default='block',
+            help='What to do when a value is read and the buffer is full: '
+            'wait until there is space (block), discard the oldest value '
+            'waiting (drop-oldest), or discard the new value (drop-newest). '
+            '[Default: %default]')
     parser.add_option('-p', '--path', dest='paths', action='append',
             type='string', default=[],
             help='Extra module search paths to add to the PYTHONPATH.')
+    parser.add_option('--precise', dest='precise', action='store_true',
+            default=False, help='Write values from a dedicated scheduler '
+            'using a monotonic clock, rather than from the execution '
+            'context, for a precise rate. Requires --const, --generate or '
+            '--from-file. The achieved rate and the number of deadlines '
+            'missed are reported. [Default: %default]')
     parser.add_option('-r', '--rate', dest='rate', action='store',
             type='float', default=1.0,
             help='Specify the rate in Hertz at which to emit data. '
             '[Default: %default]')
+    parser.add_option('--size', dest='size', action='store', type='int',
+            default=1, help='The length of generated sequences and strings. '
+            '[Default: %default]')
     parser.add_option('-t', '--timeout', dest='timeout', action='store',
             type='float', default=-1, help='Write data for this many seconds, '
             'then stop. This option overrides --number. [Default: %default]')
@@ -166,6 +335,8 @@ Write a constant value to one or more ports.'''
             default=False,
             help='Output verbose information. [Default: %default]')
 
+    conn_opts.add_options(parser)
+
     if argv:
         sys.argv = [sys.argv[0]] + argv
     try:
@@ -177,6 +348,45 @@ Write a constant value to one or more ports.'''
     if len(args) < 1:
         print(usage, file=sys.stderr)
         return 1
+    if len([o for o in (options.const, options.generate,
+            options.from_file) if o]) > 1:
+        print('{0}: Only one of --const, --generate and --from-file can be '
+            'used'.format(os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.precise and not (options.const or options.generate or
+            options.from_file):
+        print('{0}: --precise requires --const, --generate or '
+            '--from-file'.format(os.path.basename(sys.argv[0])),
+            file=sys.stderr)
+        return 1
+    if options.chunk_size < 0:
+        print('{0}: --chunk-size cannot be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.precise and options.burst != 1:
+        print('{0}: --burst cannot be used with --precise; use '
+            '--batch'.format(os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.batch < 1:
+        print('{0}: --batch must be at least 1'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.rate <= 0:
+        print('{0}: --rate must be positive'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.burst < 1:
+        print('{0}: --burst must be at least 1'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.size < 0:
+        print('{0}: --size cannot be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.buffer_size < 0:
+        print('{0}: --buffer-size cannot be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
 
     try:
         write_to_ports([path.cmd_path_to_full_path(p) \
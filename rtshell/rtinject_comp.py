@@ -19,11 +19,14 @@ Writer component used by rtinject
 '''
 
 
+from __future__ import print_function
+
 from rtshell import gen_comp
 
 import OpenRTM_aist
 import RTC
 import sys
+import time
 
 
 ###############################################################################
@@ -35,31 +38,129 @@ class Writer(gen_comp.GenComp):
         self._val = val
 
     def _behv(self, ec_id):
-        for p in list(self._ports.values()):
-            p.port.write(self._val)
+        self.write(self._val)
         return RTC.RTC_OK, 1
 
+    def write(self, val):
+        '''Write a value to all ports.'''
+        for p in list(self._ports.values()):
+            p.port.write(val)
+
 
 ###############################################################################
 ## From-standard-input writer component for rtinject
 
 class StdinWriter(Writer):
-    def __init__(self, mgr, port_specs, buf=None, mutex=None, *args,
-            **kwargs):
+    def __init__(self, mgr, port_specs, queue=None, *args, **kwargs):
+        Writer.__init__(self, mgr, port_specs, *args, **kwargs)
+        if queue is None:
+            raise ValueError('queue cannot be None.')
+        self._val_queue = queue
+
+    def _behv(self, ec_id):
+        try:
+            self._val = self._val_queue.get()
+        except IndexError:
+            return RTC.RTC_OK, 0
+        try:
+            return Writer._behv(self, ec_id)
+        finally:
+            # Only now has the value been written
+            self._val_queue.done()
+
+
+###############################################################################
+## Value table writer component for rtinject
+
+class TableWriter(Writer):
+    def __init__(self, mgr, port_specs, table=None, *args, **kwargs):
         Writer.__init__(self, mgr, port_specs, *args, **kwargs)
-        if buf is None:
-            raise ValueError('buf cannot be None.')
-        if mutex is None:
-            raise ValueError('mutex cannot be None.')
-        self._val_buffer = buf
-        self._mutex = mutex
+        if table is None:
+            raise ValueError('table cannot be None.')
+        self._table = table
+
+    def _behv(self, ec_id):
+        try:
+            self._val = self._table.next()
+        except StopIteration:
+            # All values have been written
+            self._set()
+            return RTC.RTC_OK, 0
+        return Writer._behv(self, ec_id)
+
+
+###############################################################################
+## Scheduled writer component for rtinject
+##
+## Values are written by the caller, from a publishing scheduler; the
+## execution context does nothing.
 
+class ScheduledWriter(Writer):
     def _behv(self, ec_id):
-        with self._mutex:
-            if self._val_buffer:
-                self._val = self._val_buffer.pop(0)
-                result = Writer._behv(self, ec_id)
-                return result
-            else:
-                return RTC.RTC_OK, 0
+        return RTC.RTC_OK, 0
+
+
+###############################################################################
+## Generated-value writer component for rtinject
+
+class GenWriter(Writer):
+    def __init__(self, mgr, port_specs, gen=None, burst=1, target_rate=1.0,
+            *args, **kwargs):
+        '''Constructor.
+
+        @param gen The generator of values, a function receiving the sample
+                   number and returning a value.
+        @param burst The number of values to write per execution cycle.
+        @param target_rate The requested rate of execution cycles, for the
+                           throughput report.
 
+        '''
+        Writer.__init__(self, mgr, port_specs, *args, **kwargs)
+        if gen is None:
+            raise ValueError('gen cannot be None.')
+        self._gen = gen
+        self._burst = burst
+        self._target_rate = target_rate
+        self._n = 0
+        self._cycles = 0
+        self._first = None
+        self._last = None
+
+    def onActivated(self, ec_id):
+        self._n = 0
+        self._cycles = 0
+        self._first = None
+        return RTC.RTC_OK
+
+    def onDeactivated(self, ec_id):
+        print(self._report())
+        sys.stdout.flush()
+        return RTC.RTC_OK
+
+    def _behv(self, ec_id):
+        num = self._burst
+        if self._max > -1:
+            num = min(num, self._max - self._count)
+        for ii in range(num):
+            self._val = self._gen(self._n)
+            self._n += 1
+            Writer._behv(self, ec_id)
+        self._last = time.time()
+        if self._first is None:
+            self._first = self._last
+        self._cycles += 1
+        return RTC.RTC_OK, num
+
+    def _report(self):
+        '''Report the achieved and requested throughput.'''
+        requested = self._target_rate * self._burst
+        if self._cycles < 2 or self._last <= self._first:
+            return 'Wrote {0} samples in {1} cycles (requested {2:.1f} ' \
+                    'samples/s)'.format(self._n, self._cycles, requested)
+        # The time between the first and last cycles covers all but one cycle
+        achieved = (self._cycles - 1) / (self._last - self._first) * \
+                self._n / self._cycles
+        return 'Wrote {0} samples in {1} cycles over {2:.3f} s: {3:.1f} ' \
+                'samples/s (requested {4:.1f} samples/s, {5:.1f}%)'.format(
+                        self._n, self._cycles, self._last - self._first,
+                        achieved, requested, achieved / requested * 100)
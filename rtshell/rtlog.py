@@ -23,27 +23,28 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
-import rtctree.utils
 import sys
 import threading
 import time
 import traceback
-import OpenRTM_aist
-import RTC
 
-from rtshell import comp_mgmt
-from rtshell import modmgr
+from rtshell import conn_opts
 from rtshell import path
-from rtshell import port_types
-from rtshell import rtlog_comps
 from rtshell import rts_exceptions
 from rtshell import simpkl_log
 from rtshell import text_log
+from rtshell import trees
+from rtshell import type_cache
 import rtshell
 
 
 def record_log(raw_paths, options, tree=None):
+    from rtshell import comp_mgmt
+    from rtshell import modmgr
+    from rtshell import port_types
+    from rtshell import rtlog_comps
+
+    conn_props = conn_opts.make_props(options)
     event = threading.Event()
 
     if options.end is not None and options.end < 0:
@@ -52,7 +53,8 @@ def record_log(raw_paths, options, tree=None):
         print('{0}: WARNING: --index has no effect without --end'.format(
             os.path.basename(sys.argv[0])), file=sys.stderr)
 
-    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths)
+    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths,
+            type_cache=type_cache.user_cache(options.verbose))
     mm.load_mods_and_poas(options.modules)
     if options.verbose:
         print('Pre-loaded modules: {0}'.format(mm.loaded_mod_names),
@@ -73,15 +75,18 @@ def record_log(raw_paths, options, tree=None):
 
     if options.logger == 'simpkl':
         l_type = simpkl_log.SimplePickleLog
-    elif options.logger == 'text':
+        l_opts = {}
+    elif options.logger in text_log.TextLog.FORMATS:
         l_type = text_log.TextLog
+        l_opts = {'format': options.logger,
+                'flush_interval': options.flush_int}
     else:
         raise rts_exceptions.BadLogTypeError(options.logger)
 
     sources = port_types.parse_targets(raw_paths)
     if not tree:
         paths = [s[0] for s in sources]
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
     port_specs = port_types.make_port_specs(sources, mm, tree)
     port_types.require_all_input(port_specs)
     if options.verbose:
@@ -94,14 +99,14 @@ def record_log(raw_paths, options, tree=None):
         end = options.end
     comp_name, mgr = comp_mgmt.make_comp('rtlog_recorder', tree,
             rtlog_comps.Recorder, port_specs, event=event,
-            logger_type=l_type, filename=options.filename,
-            lims_are_ind=options.index, end=end,
+            logger_type=l_type, logger_opts=l_opts, filename=options.filename,
+            lims_are_ind=options.index, end=end, delta=options.delta,
             verbose=options.verbose, rate=options.exec_rate)
     if options.verbose:
         print('Created component {0}'.format(comp_name), file=sys.stderr)
     try:
         comp = comp_mgmt.find_comp_in_mgr(comp_name, mgr)
-        comp_mgmt.connect(comp, port_specs, tree)
+        comp_mgmt.connect(comp, port_specs, tree, conn_props)
         comp_mgmt.activate(comp)
     except Exception as e:
         #comp_mgmt.shutdown(mgr)
@@ -129,10 +134,16 @@ def record_log(raw_paths, options, tree=None):
         pass
     tree.give_away_orb()
     del tree
-    comp_mgmt.shutdown(mgr)
+    comp_mgmt.shutdown(mgr, comp)
 
 
 def play_log(raw_paths, options, tree=None):
+    from rtshell import comp_mgmt
+    from rtshell import modmgr
+    from rtshell import port_types
+    from rtshell import rtlog_comps
+
+    conn_props = conn_opts.make_props(options)
     event = threading.Event()
 
     if not options.filename:
@@ -146,7 +157,8 @@ def play_log(raw_paths, options, tree=None):
                 '--start or --end'.format(os.path.basename(sys.argv[0])),
                 file=sys.stderr)
 
-    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths)
+    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths,
+            type_cache=type_cache.user_cache(options.verbose))
     mm.load_mods_and_poas(options.modules)
     if options.verbose:
         print('Pre-loaded modules: {0}'.format(mm.loaded_mod_names),
@@ -187,17 +199,22 @@ def play_log(raw_paths, options, tree=None):
                 print('Playing from {0} ({1}).'.format(start_str,
                     options.start), file=sys.stderr)
 
+    l_opts = {}
     if options.logger == 'simpkl':
         l_type = simpkl_log.SimplePickleLog
-    elif options.logger == 'text':
-        raise rts_exceptions.UnsupportedLogTypeError('text', 'playback')
+    elif options.logger == 'jsonl':
+        l_type = text_log.TextLog
+        l_opts = {'format': options.logger}
+    elif options.logger in text_log.TextLog.FORMATS:
+        raise rts_exceptions.UnsupportedLogTypeError(options.logger,
+                'playback')
     else:
         raise rts_exceptions.BadLogTypeError(options.logger)
 
     targets = port_types.parse_targets(raw_paths)
     if not tree:
         paths = [t[0] for t in targets]
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
     port_specs = port_types.make_port_specs(targets, mm, tree)
     if options.verbose:
         print('Port specifications: {0}'.format([str(p) for p in port_specs]),
@@ -214,14 +231,15 @@ def play_log(raw_paths, options, tree=None):
         end = options.end
     comp_name, mgr = comp_mgmt.make_comp('rtlog_player', tree,
             rtlog_comps.Player, port_specs, event=event, logger_type=l_type,
-            filename=options.filename, lims_are_ind=options.index, start=start,
-            end=end, scale_rate=options.rate, abs_times=options.abs_times,
+            logger_opts=l_opts, filename=options.filename,
+            lims_are_ind=options.index, start=start, end=end,
+            scale_rate=options.rate, abs_times=options.abs_times,
             ignore_times=options.ig_times, verbose=options.verbose,
             rate=options.exec_rate)
     if options.verbose:
         print('Created component {0}'.format(comp_name), file=sys.stderr)
     comp = comp_mgmt.find_comp_in_mgr(comp_name, mgr)
-    comp_mgmt.connect(comp, port_specs, tree)
+    comp_mgmt.connect(comp, port_specs, tree, conn_props)
     comp_mgmt.activate(comp)
     try:
         if options.timeout is not None:
@@ -254,21 +272,28 @@ def play_log(raw_paths, options, tree=None):
         pass
     tree.give_away_orb()
     del tree
-    comp_mgmt.shutdown(mgr)
+    comp_mgmt.shutdown(mgr, comp)
 
 
 def display_info(options):
+    from rtshell import modmgr
     if not options.filename:
         raise rts_exceptions.NoLogFileNameError
 
+    l_opts = {}
     if options.logger == 'simpkl':
         l_type = simpkl_log.SimplePickleLog
-    elif options.logger == 'text':
-        raise rts_exceptions.UnsupportedLogTypeError('text', 'inspection')
+    elif options.logger == 'jsonl':
+        l_type = text_log.TextLog
+        l_opts = {'format': options.logger}
+    elif options.logger in text_log.TextLog.FORMATS:
+        raise rts_exceptions.UnsupportedLogTypeError(options.logger,
+                'inspection')
     else:
         raise rts_exceptions.BadLogTypeError(options.logger)
 
-    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths)
+    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths,
+            type_cache=type_cache.user_cache(options.verbose))
     mm.load_mods_and_poas(options.modules)
     if options.verbose:
         print('Pre-loaded modules: {0}'.format(mm.loaded_mod_names),
@@ -284,7 +309,8 @@ def display_info(options):
         size_str = '{0:.2f}KiB ({1}B)'.format(size / 1024.0, size)
     else:
         size_str = '{0}B'.format(size)
-    log = l_type(filename=options.filename, mode='r', verbose=options.verbose)
+    log = l_type(filename=options.filename, mode='r', verbose=options.verbose,
+            **l_opts)
 
     start_time, port_specs = log.metadata
     start_time_str = time.strftime('%Y-%m-%d %H:%M:%S',
@@ -302,13 +328,50 @@ def display_info(options):
     print('First entry time: {0} ({1})'.format(first_time_str, first_time))
     print('End time: {0} ({1})'.format(end_time_str, end_time))
     print('Number of entries: {0}'.format(end_ind + 1))
-    for ii, p in enumerate(port_specs):
-        print('Channel {0}'.format(ii + 1))
-        print('  Name: {0}'.format(p.name))
-        print('  Data type: {0} ({1})'.format(p.type_name, p.type))
-        print('  Sources:')
-        for r in p.raw:
-            print('    {0}'.format(r))
+    if log.channels:
+        for c in log.channels:
+            print('Channel {0}'.format(c.id + 1))
+            print('  Name: {0}'.format(c.name))
+            print('  Data type: {0} ({1})'.format(c.type_name, c.type))
+            if c.delta:
+                print('  Encoding: {0} (delta)'.format(c.codec))
+            else:
+                print('  Encoding: {0}'.format(c.codec))
+            if c.spec is not None:
+                print('  Sources:')
+                for r in c.spec.raw:
+                    print('    {0}'.format(r))
+    else:
+        for ii, p in enumerate(port_specs):
+            print('Channel {0}'.format(ii + 1))
+            print('  Name: {0}'.format(p.name))
+            print('  Data type: {0} ({1})'.format(p.type_name, p.type))
+            print('  Sources:')
+            for r in p.raw:
+                print('    {0}'.format(r))
+
+
+def verify_log(options):
+    if not options.filename:
+        raise rts_exceptions.NoLogFileNameError
+
+    if options.logger in text_log.TextLog.FORMATS:
+        raise rts_exceptions.UnsupportedLogTypeError(options.logger,
+                'verification')
+    elif options.logger != 'simpkl':
+        raise rts_exceptions.BadLogTypeError(options.logger)
+
+    start = time.time()
+    checked, bad = simpkl_log.verify_log(options.filename, jobs=options.jobs,
+            fail_fast=options.fail_fast)
+    if options.verbose:
+        print('Verified {0} entries in {1:.3f}s'.format(checked,
+            time.time() - start), file=sys.stderr)
+    for index, pos in bad:
+        print('Bad entry {0} at file position {1}'.format(index, pos))
+    if bad:
+        raise rts_exceptions.CorruptLogError(options.filename, len(bad))
+    print('{0}: OK ({1} entries)'.format(options.filename, checked))
 
 
 def main(argv=None, tree=None):
@@ -324,28 +387,44 @@ Record data from output ports, or replay data into input ports.'''
     parser.add_option('-d', '--display-info', dest='display_info',
             action='store_true', default=False, help='Display the log '
             'information and exit.')
+    parser.add_option('--delta', dest='delta', action='store_true',
+            default=False, help='(Record mode only.) Store samples that are '
+            'identical or mostly identical to an earlier sample of the same '
+            'port as a reference to that sample plus the changed bytes. '
+            'Useful for large, slowly-changing data. [Default: %default]')
     parser.add_option('-e', '--end', dest='end', action='store', type='float',
             default=None,
             help='Time or entry index to stop recording or playback. Must be '
             'within the bounds of the log. Specify -1 to record forever or '
             'replay to the end of the log. Use --index to specify that this '
             'value is an index. [Default: %default]')
+    parser.add_option('--fail-fast', dest='fail_fast', action='store_true',
+            default=False, help='(Verify mode only.) Stop verifying at the '
+            'first corrupt entry found. [Default: %default]')
     parser.add_option('-f', '--filename', dest='filename', action='store',
             type='string', default='', help='File name of the log file to '
             'record to/playback from. If not specified for recording, a '
             'default will be created based on the current time. Must be '
             'specified for playback.')
+    parser.add_option('--flush-interval', dest='flush_int', action='store',
+            type='float', default=1.0, help='(Text loggers only.) Maximum '
+            'time in seconds that recorded entries are buffered before being '
+            'written to the file. [Default: %default]')
     parser.add_option('--path', dest='paths', action='append', type='string',
             default=[], help='Extra module search paths to add to the '
             'PYTHONPATH.')
     parser.add_option('-i', '--index', dest='index', action='store_true',
             default=False, help='Interpret the start and end values as entry '
             'indices. [Default: %default]')
+    parser.add_option('--jobs', dest='jobs', action='store', type='int',
+            default=None, help='(Verify mode only.) Number of processes to '
+            'verify with. [Default: number of CPUs]')
     parser.add_option('-l', '--logger', dest='logger', action='store',
             type='string', default='simpkl', help='The type of logger to '
             'use. The default is the SimplePickle logger. Alternatively, '
-            'the text logger (specify using "text") may be used. The text '
-            'logger does not support playback.')
+            'the text logger (specify using "text"), or the text logger in '
+            'CSV ("csv") or JSON Lines ("jsonl") format may be used. Of the '
+            'text loggers, only JSON Lines logs can be played back.')
     parser.add_option('-m', '--mod', dest='modules', action='append',
             type='string', default=[],
             help='Extra modules to import. If automatic module loading '
@@ -373,11 +452,16 @@ Record data from output ports, or replay data into input ports.'''
     parser.add_option('-v', '--verbose', dest='verbose', action='store_true',
             default=False,
             help='Output verbose information. [Default: %default]')
+    parser.add_option('--verify', dest='verify', action='store_true',
+            default=False, help='Verify the checksums of the entries in the '
+            'log and exit. [Default: %default]')
     parser.add_option('-x', '--exec-rate', dest='exec_rate', action='store',
             type='float', default=100.0,
             help='Specify the rate in Hertz at which to run the component. '
             '[Default: %default]')
 
+    conn_opts.add_options(parser)
+
     if argv:
         sys.argv = [sys.argv[0]] + argv
     try:
@@ -386,13 +470,15 @@ Record data from output ports, or replay data into input ports.'''
         print('OptionError:', e, file=sys.stderr)
         return 1
 
-    if len(args) < 1 and not options.display_info:
+    if len(args) < 1 and not options.display_info and not options.verify:
         print(usage, file=sys.stderr)
         return 1
 
     try:
         if options.display_info:
             display_info(options)
+        elif options.verify:
+            verify_log(options)
         elif options.play:
             play_log([path.cmd_path_to_full_path(p) for p in args],
                     options, tree)
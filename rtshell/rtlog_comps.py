@@ -36,8 +36,9 @@ from rtshell import rts_exceptions
 ## Recorder component for rtlog
 
 class Recorder(gen_comp.GenComp):
-    def __init__(self, mgr, port_specs, logger_type=None, filename='',
-            lims_are_ind=False, end=-1, verbose=False, *args, **kwargs):
+    def __init__(self, mgr, port_specs, logger_type=None, logger_opts={},
+            filename='', lims_are_ind=False, end=-1, delta=False,
+            verbose=False, *args, **kwargs):
         if lims_are_ind:
             max = end
             self._end = -1
@@ -51,7 +52,9 @@ class Recorder(gen_comp.GenComp):
         gen_comp.GenComp.__init__(self, mgr, port_specs, max=max, *args,
                 **kwargs)
         self._logger_type = logger_type
+        self._logger_opts = logger_opts
         self._fn = filename
+        self._delta = delta
         self._verb = verbose
 
     def onActivated(self, ec_id):
@@ -62,8 +65,11 @@ class Recorder(gen_comp.GenComp):
         # Make file name from activated time
         if not self._fn:
             self._fn = 'rtlog_{0}.rtlog'.format(int(start))
-        # Create log, record meta data
-        self._l = self._logger_type(filename=self._fn, mode='w', meta=meta, verbose=self._verb)
+        # Create log, record meta data and the channel table
+        self._l = self._logger_type(filename=self._fn, mode='w', meta=meta,
+                channels=ilog.make_channels(self._port_specs,
+                    delta=self._delta),
+                verbose=self._verb, **self._logger_opts)
         return RTC.RTC_OK
 
     def onFinalize(self):
@@ -74,6 +80,8 @@ class Recorder(gen_comp.GenComp):
     def _behv(self, ec_id):
         execed = 0
         result = RTC.RTC_OK
+        # Written entries must not wait for the next value to be flushed
+        self._l.check_flush()
         for name in self._ports:
             p = self._ports[name]
             if p.port.isNew():
@@ -101,9 +109,10 @@ class Recorder(gen_comp.GenComp):
 ## Player component for rtlog
 
 class Player(gen_comp.GenComp):
-    def __init__(self, mgr, port_specs, logger_type=None, filename='',
-            lims_are_ind=False, start=0, end=-1, scale_rate=1.0, abs_times=False,
-            ignore_times=False, verbose=False, *args, **kwargs):
+    def __init__(self, mgr, port_specs, logger_type=None, logger_opts={},
+            filename='', lims_are_ind=False, start=0, end=-1, scale_rate=1.0,
+            abs_times=False, ignore_times=False, verbose=False, *args,
+            **kwargs):
         if end >= 0:
             if lims_are_ind:
                 if start == 0:
@@ -126,6 +135,7 @@ class Player(gen_comp.GenComp):
         gen_comp.GenComp.__init__(self, mgr, port_specs, max=max, *args,
                 **kwargs)
         self._logger_type = logger_type
+        self._logger_opts = logger_opts
         self._fn = filename
         self._rate = scale_rate
         self._abs = abs_times
@@ -134,11 +144,15 @@ class Player(gen_comp.GenComp):
 
     def onActivated(self, ec_id):
         try:
+            # Only the data of channels with a port will be decoded
             self._l = self._logger_type(filename=self._fn, mode='r',
-                    verbose=self._verb)
+                    verbose=self._verb, decode=list(self._ports.keys()),
+                    **self._logger_opts)
             # Read the metadata block
             start, log_port_specs = self._l.metadata
             self._vprint('Log started at {0}'.format(start))
+            if self._l.channels:
+                log_port_specs = self._l.channels
             self._vprint('Log port specs are {0}'.format(
                 [str(s) for s in log_port_specs]))
 
@@ -154,7 +168,13 @@ class Player(gen_comp.GenComp):
                             'times in the log.'.format(name), file=sys.stderr)
                     continue
                 m = matches[0]
-                if m.type != self._ports[name].raw.type:
+                if m.type is None:
+                    # Only the IDL type name is known (e.g. JSON Lines logs)
+                    matched = m.type_name == getattr(self._ports[name].raw.type,
+                            '_NP_RepositoryId', None)
+                else:
+                    matched = m.type == self._ports[name].raw.type
+                if not matched:
                     print('ERROR: Port {0} is incorrect data '\
                             'type; should be {1}.'.format(name,
                                 type(self._ports[name].data)), file=sys.stderr)
@@ -23,18 +23,19 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
-import rtctree.utils
 import sys
 import traceback
 
+from rtshell import daemon
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
 def get_node_long_lines(nodes, use_colour=True):
+    import rtctree.utils
     info_strings = []
     state_width = 0
     total_width = 0
@@ -191,6 +192,7 @@ def get_node_long_lines(nodes, use_colour=True):
 
 
 def format_items_list(items):
+    import rtctree.utils
     gap = '  '
     term_rows, term_cols = rtctree.utils.get_terminal_size()
     nrows, ncols, col_widths = rtctree.utils.get_num_columns_and_rows(
@@ -207,6 +209,7 @@ def format_items_list(items):
 
 
 def list_directory(dir_node, long=False):
+    import rtctree.utils
     listing = dir_node.children
     use_colour = rtctree.utils.colour_supported(sys.stdout)
     if long:
@@ -241,6 +244,7 @@ def list_directory(dir_node, long=False):
 
 
 def list_target(cmd_path, full_path, options, tree=None):
+    import rtctree.utils
     use_colour = rtctree.utils.colour_supported(sys.stdout)
 
     path, port = rtctree.path.parse_path(full_path)
@@ -254,7 +258,7 @@ def list_target(cmd_path, full_path, options, tree=None):
         path = path[:-1]
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     if not tree.has_path(path):
         raise rts_exceptions.NoSuchObjectError(cmd_path)
@@ -312,6 +316,7 @@ def list_target(cmd_path, full_path, options, tree=None):
         raise rts_exceptions.UnknownObjectError(cmd_path)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     usage = '''Usage: %prog [options] [path]
 List a name server, directory, manager or component.'''
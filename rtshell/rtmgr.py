@@ -23,21 +23,16 @@ from __future__ import print_function
 import rtctree
 import rtctree.exceptions
 import rtctree.path
-import rtctree.tree
-import CosNaming
-import omniORB
 import optparse
 import os
 import os.path
 import re
-import OpenRTM_aist
-import RTC
-import RTM
 import sys
 import traceback
 
 from rtshell import rts_exceptions
 from rtshell import path
+from rtshell import trees
 import rtshell
 
 
@@ -46,6 +41,8 @@ class DirectManager(object):
         self._connect(self._fix_address(address))
 
     def _connect(self, address):
+        import omniORB
+        import RTM
         if rtctree.ORB_ARGS_ENV_VAR in os.environ:
             orb_args = os.environ[ORB_ARGS_ENV_VAR].split(';')
         else:
@@ -86,6 +83,8 @@ class DirectManager(object):
         return ':'.join(parts)
 
     def load_module(self, path, init_func):
+        import omniORB
+        import RTC
         try:
             if self._mgr.load_module(path, init_func) != RTC.RTC_OK:
                 raise rtctree.exceptions.FailedToLoadModuleError(path)
@@ -97,6 +96,7 @@ class DirectManager(object):
                 raise
 
     def unload_module(self, path):
+        import RTC
         if self._mgr.unload_module(path) != RTC.RTC_OK:
             raise rtctree.exceptions.FailedToUnloadModuleError(path)
 
@@ -105,6 +105,7 @@ class DirectManager(object):
             raise rtctree.exceptions.FailedToCreateComponentError(module_name)
 
     def delete_component(self, instance_name):
+        import RTC
         if not self._mgr.delete_component(instance_name) != RTC.RTC_OK:
             raise rtctree.exceptions.FailedToDeleteComponentError(instance_name)
 
@@ -119,7 +120,7 @@ def get_manager(cmd_path, full_path, tree=None):
         path = path[:-1]
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=path, filter=[path])
+        tree = trees.make_tree(paths=path, filter=[path])
 
     object = tree.get_node(path)
     if not object:
@@ -22,31 +22,55 @@ from __future__ import print_function
 
 import optparse
 import os.path
-import rtctree.tree
-import rtctree.utils
 import sys
 import threading
 import time
 import traceback
-import OpenRTM_aist
-import RTC
 
-from rtshell import comp_mgmt
-from rtshell import modmgr
+from rtshell import conn_opts
+from rtshell import fmt
 from rtshell import path
-from rtshell import port_types
-from rtshell import rtprint_comp
+from rtshell import port_aggregate
+from rtshell import print_formats
+from rtshell import rts_exceptions
+from rtshell import trees
+from rtshell import type_cache
 import rtshell
 
 
+# Default time in seconds between statistics reports
+DEFAULT_STATS_INTERVAL = 1.0
+
+
 def read_from_ports(raw_paths, options, tree=None):
+    from rtshell import comp_mgmt
+    from rtshell import modmgr
+    from rtshell import port_types
+    from rtshell import rtprint_comp
+
+    conn_props = conn_opts.make_props(options)
     event = threading.Event()
 
-    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths)
+    if options.aggregate is not None and port_aggregate.numpy is None:
+        raise rts_exceptions.MissingModuleError('numpy', '--aggregate')
+    if options.format != 'text' and \
+            not print_formats.have_format(options.format):
+        raise rts_exceptions.MissingModuleError(options.format,
+                '--format={0}'.format(options.format))
+
+    mm = modmgr.ModuleMgr(verbose=options.verbose, paths=options.paths,
+            type_cache=type_cache.user_cache(options.verbose))
     mm.load_mods_and_poas(options.modules)
     if options.verbose:
         print('Pre-loaded modules: {0}'.format(mm.loaded_mod_names),
                 file=sys.stderr)
+    if options.filter is not None:
+        try:
+            filter = mm.compile_function(options.filter, ['data', 'port'])
+        except SyntaxError as e:
+            raise rts_exceptions.BadFilterError(options.filter, e)
+    else:
+        filter = None
     if options.timeout == -1:
         max = options.max
         if options.verbose:
@@ -60,20 +84,31 @@ def read_from_ports(raw_paths, options, tree=None):
     targets = port_types.parse_targets(raw_paths)
     if not tree:
         paths = [t[0] for t in targets]
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
     port_specs = port_types.make_port_specs(targets, mm, tree)
     port_types.require_all_input(port_specs)
+    if options.stats_int is not None:
+        stats_int = options.stats_int
+    elif options.stats:
+        stats_int = DEFAULT_STATS_INTERVAL
+    else:
+        stats_int = None
     if options.verbose:
         print('Port specifications: {0}'.format([str(p) for p in port_specs]),
                 file=sys.stderr)
 
     comp_name, mgr = comp_mgmt.make_comp('rtprint_reader', tree,
             rtprint_comp.Reader, port_specs, event=event, rate=options.rate,
-            max=max)
+            max=max, max_items=options.max_items, format=options.format,
+            line_buffered=options.line_buffered, stats_interval=stats_int,
+            aggregate_window=options.aggregate,
+            histogram_bins=options.histogram, latest=options.latest,
+            every=options.every, max_rate=options.max_rate, filter=filter,
+            flush_interval=options.flush_int)
     if options.verbose:
         print('Created component {0}'.format(comp_name), file=sys.stderr)
     comp = comp_mgmt.find_comp_in_mgr(comp_name, mgr)
-    comp_mgmt.connect(comp, port_specs, tree)
+    comp_mgmt.connect(comp, port_specs, tree, conn_props)
     comp_mgmt.activate(comp)
     try:
         if options.timeout != -1:
@@ -98,7 +133,7 @@ def read_from_ports(raw_paths, options, tree=None):
         pass
     tree.give_away_orb()
     del tree
-    comp_mgmt.shutdown(mgr)
+    comp_mgmt.shutdown(mgr, comp)
 
 
 def main(argv=None, tree=None):
@@ -106,6 +141,47 @@ def main(argv=None, tree=None):
 Print the data being sent by one or more output ports.'''
     version = rtshell.RTSH_VERSION
     parser = optparse.OptionParser(usage=usage, version=version)
+    parser.add_option('-a', '--aggregate', dest='aggregate', action='store',
+            type='float', default=None, metavar='WINDOW', help='Print a '\
+            'summary (minimum, maximum, mean, standard deviation and '\
+            'percentiles) of the numeric data received on each port every '\
+            'WINDOW seconds instead of printing the data. Requires NumPy.')
+    parser.add_option('-e', '--every', dest='every', action='store',
+            type='int', default=1, metavar='N', help='Print only every Nth '\
+            'value received on each port. [Default: %default]')
+    parser.add_option('--filter', dest='filter', action='store',
+            type='string', default=None, metavar='EXPR', help='Print only '\
+            'values for which this Python expression is true. The value is '\
+            'available as "data" and the port name as "port".')
+    parser.add_option('-f', '--format', dest='format', action='store',
+            type='choice', choices=['text'] + print_formats.FORMATS,
+            default='text', help='Output format: text (human-readable), '\
+            'json (one JSON object per line), csv, msgpack or pickle. '\
+            'Formatters given with the port are only used for text output. '\
+            '[Default: %default]')
+    parser.add_option('--flush-interval', dest='flush_int', action='store',
+            type='float', default=0.0, help='Minimum time in seconds between '\
+            'writes of the buffered output. By default, output is written '\
+            'once per execution cycle. [Default: %default]')
+    parser.add_option('--histogram', dest='histogram', action='store',
+            type='int', default=0, metavar='BINS', help='Print a histogram '\
+            'with this many bins with each summary made by --aggregate. '\
+            '[Default: no histogram]')
+    parser.add_option('-l', '--latest', dest='latest', action='store_true',
+            default=False, help='Print only the most recent value received '\
+            'on each port in each cycle, discarding older values. '\
+            '[Default: %default]')
+    parser.add_option('--line-buffered', dest='line_buffered',
+            action='store_true', default=False, help='Write each value as '\
+            'soon as it is printed, rather than buffering output. '\
+            '[Default: %default]')
+    parser.add_option('--max-items', dest='max_items', action='store',
+            type='int', default=fmt.DEFAULT_MAX_ITEMS, help='Sequences '\
+            'longer than this are summarised in text output. Specify 0 to '\
+            'print sequences in full. [Default: %default]')
+    parser.add_option('--max-rate', dest='max_rate', action='store',
+            type='float', default=None, metavar='M', help='Print at most M '\
+            'values per second from each port. [Default: no limit]')
     parser.add_option('-m', '--mod', dest='modules', action='append',
             type='string', default=[],
             help='Extra modules to import. If automatic module loading '\
@@ -120,6 +196,14 @@ Print the data being sent by one or more output ports.'''
     parser.add_option('-r', '--rate', dest='rate', action='store',
             type='float', default=100.0, help='Specify the rate in Hertz at '\
             'which to read and print. [Default: %default]')
+    parser.add_option('-s', '--stats', dest='stats', action='store_true',
+            default=False, help='Print statistics of the data received on '\
+            'each port periodically instead of printing the data. '\
+            '[Default: %default]')
+    parser.add_option('--stats-interval', dest='stats_int', action='store',
+            type='float', default=None, help='Time in seconds between '\
+            'statistics reports. Implies --stats. [Default: {0}]'.format(
+                DEFAULT_STATS_INTERVAL))
     parser.add_option('-t', '--timeout', dest='timeout', action='store',
             type='float', default=-1, help='Read data for this many seconds, '\
             'then stop. Specify -1 for no timeout. This option overrides '\
@@ -128,6 +212,8 @@ Print the data being sent by one or more output ports.'''
             default=False,
             help='Output verbose information. [Default: %default]')
 
+    conn_opts.add_options(parser)
+
     if argv:
         sys.argv = [sys.argv[0]] + argv
     try:
@@ -136,6 +222,43 @@ Print the data being sent by one or more output ports.'''
         print('OptionError:', e, file=sys.stderr)
         return 1
 
+    if options.every < 1:
+        print('{0}: --every must be at least 1'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.max_rate is not None and options.max_rate <= 0:
+        print('{0}: --max-rate must be positive'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+
+    if options.max_items < 0:
+        print('{0}: --max-items must not be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+
+    if options.aggregate is not None and options.aggregate <= 0:
+        print('{0}: --aggregate window must be positive'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.aggregate is not None and \
+            (options.stats or options.stats_int is not None):
+        print('{0}: --aggregate and --stats cannot be used together'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.histogram < 0:
+        print('{0}: --histogram must not be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.stats_int is not None and options.stats_int <= 0:
+        print('{0}: --stats-interval must be positive'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+
+    if options.flush_int < 0:
+        print('{0}: --flush-interval must not be negative'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+
     if len(args) < 1:
         print(usage, file=sys.stderr)
         return 1
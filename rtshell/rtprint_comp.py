@@ -18,8 +18,18 @@ Reader component used by rtprint
 
 '''
 
+from __future__ import print_function
+
+import os.path
+import sys
+import time
+import traceback
 
 from rtshell import gen_comp
+from rtshell import port_aggregate
+from rtshell import port_stats
+from rtshell import print_formats
+from rtshell import print_writer
 
 import OpenRTM_aist
 import RTC
@@ -29,18 +39,228 @@ import RTC
 ## Reader component for rtprint
 
 class Reader(gen_comp.GenComp):
-    def __init__(self, mgr, port_specs, *args, **kwargs):
+    def __init__(self, mgr, port_specs, format='text', line_buffered=False,
+            flush_interval=0.0, stats_interval=None, aggregate_window=None,
+            histogram_bins=0, latest=False, every=1, max_rate=None,
+            filter=None, *args, **kwargs):
         gen_comp.GenComp.__init__(self, mgr, port_specs, *args, **kwargs)
+        self._format = format
+        self._stats_int = stats_interval
+        self._agg_window = aggregate_window
+        self._hist_bins = histogram_bins
+        self._latest = latest
+        self._every = every
+        if max_rate:
+            self._min_period = 1.0 / max_rate
+        else:
+            self._min_period = None
+        self._decimate = latest or every > 1 or max_rate
+        # Predicate function of (value, port name) selecting values to print
+        self._filter = filter
+        self._filter_errors = set()
+        if format in print_formats.BINARY_FORMATS:
+            stream = print_formats.binary_stream(sys.stdout)
+        else:
+            stream = sys.stdout
+        self._out = print_writer.BufferedWriter(stream,
+                line_buffered=line_buffered, flush_interval=flush_interval)
+
+    def onInitialize(self):
+        result = gen_comp.GenComp.onInitialize(self)
+        if result != RTC.RTC_OK or self._format == 'text':
+            return result
+        try:
+            # Make the serialisers now so that the per-sample cost is only
+            # that of the generated field extractors
+            self._serialisers = dict((name, print_formats.make_serialiser(
+                self._format, name, p.raw.type)) \
+                        for name, p in self._ports.items())
+        except:
+            print(traceback.format_exc(), file=sys.stderr)
+            return RTC.RTC_ERROR
+        return RTC.RTC_OK
+
+    def onActivated(self, ec_id):
+        if self._stats_int is not None:
+            now = time.time()
+            self._stats = dict((name, port_stats.PortStats(name)) \
+                    for name in self._ports)
+            for s in self._stats.values():
+                s.start(now)
+            self._last_report = now
+        elif self._agg_window is not None:
+            self._aggs = dict((name, port_aggregate.Aggregator(name,
+                histogram_bins=self._hist_bins)) for name in self._ports)
+            self._last_report = time.time()
+        elif self._decimate:
+            self._counts = dict((name, 0) for name in self._ports)
+            self._next_print = dict((name, 0) for name in self._ports)
+        return RTC.RTC_OK
+
+    def onDeactivated(self, ec_id):
+        if self._stats_int is not None:
+            self._report_stats(time.time())
+        elif self._agg_window is not None:
+            self._report_aggregates(time.time())
+        self._out.flush()
+        return RTC.RTC_OK
+
+    def onFinalize(self):
+        self._out.flush()
+        return RTC.RTC_OK
 
     def _behv(self, ec_id):
+        if self._stats_int is not None:
+            return self._behv_stats()
+        elif self._agg_window is not None:
+            return self._behv_aggregate()
+        elif self._decimate:
+            return self._behv_decimated()
         execed = 0
-        for p in list(self._ports.values()):
+        for name, p in list(self._ports.items()):
             if p.port.isNew():
                 execed = 1
                 p.read()
-                print(p.format())
+                if self._filter is None or self._matches(name, p.data):
+                    self._write(name, p, p.data)
+        self._out.end_cycle()
+        return RTC.RTC_OK, execed
+
+    def _behv_aggregate(self):
+        '''Read every waiting sample and report aggregates each window.'''
+        execed = 0
+        for name, p in list(self._ports.items()):
+            while p.port.isNew():
+                execed = 1
+                p.read()
+                if name not in self._aggs:
+                    continue
+                if p.standard_type:
+                    value = p.data.data
+                else:
+                    value = p.data
+                try:
+                    self._aggs[name].add(value)
+                except (TypeError, ValueError):
+                    print('{0}: Port {1} does not have numeric data; it will '\
+                            'not be aggregated.'.format(
+                                os.path.basename(sys.argv[0]), name),
+                            file=sys.stderr)
+                    del self._aggs[name]
+        now = time.time()
+        if now - self._last_report >= self._agg_window:
+            self._report_aggregates(now)
+        return RTC.RTC_OK, execed
+
+    def _behv_decimated(self):
+        '''Read every waiting sample and print a selection of them.
+
+        Every Nth sample of each port is selected. If only the latest sample
+        is wanted, the last selected sample of each port in this cycle is
+        printed; otherwise all selected samples are. Samples are not printed
+        more often than the maximum rate for each port.
+
+        '''
+        execed = 0
+        for name, p in list(self._ports.items()):
+            chosen = None
+            while p.port.isNew():
+                execed = 1
+                p.read()
+                if self._filter is not None and \
+                        not self._matches(name, p.data):
+                    continue
+                n = self._counts[name]
+                self._counts[name] = n + 1
+                if n % self._every:
+                    continue
+                if self._latest:
+                    chosen = p.data
+                elif self._rate_ok(name):
+                    self._write(name, p, p.data)
+            if chosen is not None and self._rate_ok(name):
+                self._write(name, p, chosen)
+        self._out.end_cycle()
+        return RTC.RTC_OK, execed
+
+    def _behv_stats(self):
+        '''Read every waiting sample and report statistics periodically.'''
+        execed = 0
+        for name, p in list(self._ports.items()):
+            stats = self._stats[name]
+            while p.port.isNew():
+                execed = 1
+                p.read()
+                if p.standard_type:
+                    stats.add(time.time(),
+                            p.data.tm.sec + p.data.tm.nsec / 1e9)
+                else:
+                    stats.add(time.time())
+        now = time.time()
+        if now - self._last_report >= self._stats_int:
+            self._report_stats(now)
         return RTC.RTC_OK, execed
 
+    def _matches(self, name, data):
+        '''Check if a value matches the filter.
+
+        Values for which the filter raises an exception do not match; the
+        first such exception for each port is reported.
+
+        '''
+        try:
+            return self._filter(data, name)
+        except Exception as e:
+            if name not in self._filter_errors:
+                self._filter_errors.add(name)
+                print('{0}: Filter failed for a value from port {1}: '\
+                        '{2}'.format(os.path.basename(sys.argv[0]), name, e),
+                        file=sys.stderr)
+            return False
+
+    def _rate_ok(self, name):
+        '''Check if a port's maximum print rate allows printing now.'''
+        if self._min_period is None:
+            return True
+        now = time.time()
+        if now < self._next_print[name]:
+            return False
+        self._next_print[name] = now + self._min_period
+        return True
+
+    def _report_aggregates(self, now):
+        for name in sorted(self._aggs):
+            for l in self._aggs[name].report():
+                self._out.write(l + '\n')
+        self._out.flush()
+        self._last_report = now
+
+    def _report_stats(self, now):
+        for name in sorted(self._stats):
+            self._out.write(self._stats[name].report(now) + '\n')
+        self._out.flush()
+        self._last_report = now
+
+    def _timestamp(self, p, data):
+        '''Get the time stamp of a port's value as (seconds, nanoseconds).
+
+        Values of RTC standard types carry their own time stamp; other values
+        are stamped with the time they were received.
+
+        '''
+        if p.standard_type:
+            return (data.tm.sec, data.tm.nsec)
+        now = time.time()
+        return (int(now), int((now % 1) * 1000000000))
+
+    def _write(self, name, p, data):
+        '''Print a value received on a port.'''
+        if self._format == 'text':
+            self._out.write(p.format(data) + '\n')
+        else:
+            self._out.write(self._serialisers[name](self._timestamp(p, data),
+                data))
+
 
 if __name__ == '__main__':
     main()
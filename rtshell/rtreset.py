@@ -20,6 +20,7 @@ inactive state.
 '''
 
 
+from rtshell import daemon
 from rtshell import state_control_base
 
 
@@ -27,6 +28,7 @@ def reset_action(object, ec_index):
     object.reset_in_ec(ec_index)
 
 
+@daemon.dispatched
 def main(argv=None, tree=None):
     return state_control_base.base_main('Reset a component.', reset_action,
             argv)
@@ -24,13 +24,12 @@ import optparse
 import os
 import os.path
 import rtctree.path
-import rtctree.tree
-import rtsprofile.rts_profile
 import sys
 import traceback
 
 from rtshell import actions
 from rtshell import option_store
+from rtshell import trees
 import rtshell
 
 
@@ -206,6 +205,7 @@ def rebuild_system_actions(rtsprofile):
 
 
 def resurrect(profile=None, xml=True, dry_run=False, tree=None):
+    import rtsprofile.rts_profile
     # Load the profile
     if profile:
         # Read from a file
@@ -230,7 +230,7 @@ def resurrect(profile=None, xml=True, dry_run=False, tree=None):
     else:
         if not tree:
             # Load the RTC Tree, using the paths from the profile
-            tree = rtctree.tree.RTCTree(paths=[rtctree.path.parse_path(
+            tree = trees.make_tree(paths=[rtctree.path.parse_path(
                 '/' + c.path_uri)[0] for c in rtsp.components])
         for a in actions:
             a(tree)
@@ -566,6 +566,17 @@ class UnsupportedLogTypeError(RtShellError):
                 self._type, self._feature)
 
 
+class CorruptLogError(RtShellError):
+    '''A log file failed verification.'''
+    def __init__(self, filename, bad):
+        self._filename = filename
+        self._bad = bad
+
+    def __str__(self):
+        return 'Log file {0} is corrupt: {1} bad entries.'.format(
+                self._filename, self._bad)
+
+
 class NoLogFileNameError(RtShellError):
     '''An expected file name was not provided.'''
     def __str__(self):
@@ -590,5 +601,112 @@ class CannotRemoveFromNewCompositionError(RtShellError):
         return 'Cannot remove components/ports from a new composition.'
 
 
+class BadFilterError(RtShellError):
+    '''A filter expression could not be compiled.'''
+    def __init__(self, expr, error):
+        self._expr = expr
+        self._error = error
+
+    def __str__(self):
+        return 'Bad filter expression "{0}": {1}'.format(self._expr,
+                self._error)
+
+
+class MissingModuleError(RtShellError):
+    '''An optional module needed for a feature is not installed.'''
+    def __init__(self, module, feature):
+        self._module = module
+        self._feature = feature
+
+    def __str__(self):
+        return 'The {0} module is required for {1}.'.format(self._module,
+                self._feature)
+
+
+class BadInputError(RtShellError):
+    '''A record of structured input could not be read.'''
+    def __init__(self, record, error):
+        self._record = record
+        self._error = error
+
+    def __str__(self):
+        return 'Bad input at record {0}: {1}'.format(self._record,
+                self._error)
+
+
+class MixedInputTypesError(RtShellError):
+    '''Typed input was requested for ports of different types.'''
+    def __str__(self):
+        return 'Structured input and generated values require all ports ' \
+                'to have the same data type.'
+
+
+class BadGeneratorError(RtShellError):
+    '''A bad value generator was specified.'''
+    def __init__(self, spec, reason):
+        self._spec = spec
+        self._reason = reason
+
+    def __str__(self):
+        return 'Bad generator "{0}": {1}'.format(self._spec, self._reason)
+
+
+class NoValuesError(RtShellError):
+    '''A file of values to write is empty.'''
+    def __str__(self):
+        return 'No values to write.'
+
+
+class DaemonRunningError(RtShellError):
+    '''The rtshell daemon is already running.'''
+    def __init__(self, path):
+        self._path = path
+
+    def __str__(self):
+        return 'The rtshell daemon is already running on {0}.'.format(
+                self._path)
+
+
+class UnsafeSocketDirError(RtShellError):
+    '''The directory of the daemon's socket is not private to the user.'''
+    def __init__(self, path):
+        self._path = path
+
+    def __str__(self):
+        return 'The socket directory must be owned by the user with mode '\
+                '0700: {0}'.format(self._path)
+
+
+class BadConnectionOptionError(RtShellError):
+    '''A bad combination of connection options was given.'''
+    def __init__(self, reason):
+        self._reason = reason
+
+    def __str__(self):
+        return 'Bad connection options: {0}'.format(self._reason)
+
+
+class InterfaceNotSupportedError(RtShellError):
+    '''A port does not support the requested interface type.'''
+    def __init__(self, rtc, port, interface):
+        self._rtc = rtc
+        self._port = port
+        self._interface = interface
+
+    def __str__(self):
+        return 'Port does not support the {0} interface: {1}'.format(
+                self._interface,
+                rtctree.path.format_path((self._rtc, self._port)))
+
+
+class NoDaemonError(RtShellError):
+    '''The rtshell daemon is not running.'''
+    def __init__(self, path):
+        self._path = path
+
+    def __str__(self):
+        return 'The rtshell daemon is not running on {0}.'.format(self._path)
+
+
 # vim: tw=79
 
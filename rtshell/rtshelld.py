@@ -0,0 +1,115 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Implementation of the command to run the rtshell daemon.
+
+'''
+
+
+from __future__ import print_function
+
+import optparse
+import os
+import os.path
+import socket
+import sys
+import traceback
+
+from rtshell import daemon
+from rtshell import rts_exceptions
+import rtshell
+
+
+def main(argv=None):
+    usage = '''Usage: %prog [options]
+Run the rtshell daemon, which runs commands with a warm ORB.'''
+    version = rtshell.RTSH_VERSION
+    parser = optparse.OptionParser(usage=usage, version=version)
+    parser.add_option('-f', '--foreground', dest='foreground',
+            action='store_true', default=False,
+            help='Stay in the foreground instead of detaching from the '
+            'terminal. [Default: %default]')
+    parser.add_option('-s', '--socket', dest='socket', action='store',
+            type='string', default='',
+            help='Path of the socket to listen on. [Default: {0}]'.format(
+                daemon.socket_path()))
+    parser.add_option('--status', dest='status', action='store_true',
+            default=False,
+            help='Check if the daemon is running. [Default: %default]')
+    parser.add_option('--stop', dest='stop', action='store_true',
+            default=False, help='Stop the daemon. [Default: %default]')
+    parser.add_option('-t', '--tree-ttl', dest='tree_ttl', action='store',
+            type='float', default=0.0,
+            help='Keep the RTC trees made by commands for this many seconds '
+            'and reuse them in later commands. Set to 0 to make a new tree '
+            'for every command. [Default: %default]')
+    parser.add_option('-v', '--verbose', dest='verbose', action='store_true',
+            default=False,
+            help='Output verbose information. [Default: %default]')
+
+    if argv:
+        sys.argv = [sys.argv[0]] + argv
+    try:
+        options, args = parser.parse_args()
+    except optparse.OptionError as e:
+        print('OptionError:', e, file=sys.stderr)
+        return 1
+
+    if args:
+        print(usage, file=sys.stderr)
+        return 1
+    if not hasattr(socket, 'AF_UNIX'):
+        print('{0}: The daemon is not supported on this platform.'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    if options.tree_ttl < 0:
+        print('{0}: The tree time to live cannot be negative.'.format(
+            os.path.basename(sys.argv[0])), file=sys.stderr)
+        return 1
+    path = options.socket or daemon.socket_path()
+
+    try:
+        if options.status:
+            pid = daemon.ping(path)
+            if pid is None:
+                raise rts_exceptions.NoDaemonError(path)
+            print('The rtshell daemon is running on {0} (process {1}).'.format(
+                path, pid))
+        elif options.stop:
+            daemon.stop(path)
+        else:
+            d = daemon.Daemon(path, options.verbose, options.tree_ttl)
+            d.listen()
+            if not options.foreground:
+                daemon.detach()
+            d.serve()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        if options.verbose:
+            traceback.print_exc()
+        print('{0}: {1}'.format(os.path.basename(sys.argv[0]), e),
+                file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(main())
+
+
+# vim: tw=79
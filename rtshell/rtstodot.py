@@ -21,7 +21,6 @@ from __future__ import print_function
 
 import optparse
 import os.path
-import rtsprofile.rts_profile
 import sys
 import traceback
 
@@ -76,6 +75,7 @@ def make_conn_str(s_port, d_port):
 
 
 def visualise(profile=None, xml=True, tree=None):
+    import rtsprofile.rts_profile
     # Load the profile
     if profile:
         # Read from a file
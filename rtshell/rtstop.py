@@ -23,17 +23,14 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.component
 import rtctree.path
-import rtctree.tree
-import rtsprofile.rts_profile
 import sys
 import traceback
 
 from rtshell import actions
 from rtshell import option_store
-from rtshell import plan
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -47,6 +44,9 @@ def deactivate_actions(rtsprofile):
 
 
 def stop(profile=None, xml=True, dry_run=False, tree=None):
+    import rtctree.component
+    import rtsprofile.rts_profile
+    from rtshell import plan
     # Load the profile
     if profile:
         # Read from a file
@@ -73,7 +73,7 @@ def stop(profile=None, xml=True, dry_run=False, tree=None):
     else:
         if not tree:
             # Load the RTC Tree, using the paths from the profile
-            tree = rtctree.tree.RTCTree(paths=[rtctree.path.parse_path(
+            tree = trees.make_tree(paths=[rtctree.path.parse_path(
                 '/' + c.path_uri)[0] for c in rtsp.components])
         try:
             p.execute(tree)
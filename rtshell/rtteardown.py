@@ -24,13 +24,12 @@ import optparse
 import os
 import os.path
 import rtctree.path
-import rtctree.tree
-import rtsprofile.rts_profile
 import sys
 import traceback
 
 from rtshell import actions
 from rtshell import option_store
+from rtshell import trees
 import rtshell
 
 
@@ -71,6 +70,7 @@ def disconnect_actions(rtsprofile):
 
 
 def teardown(profile=None, xml=True, dry_run=False, tree=None):
+    import rtsprofile.rts_profile
     # Load the profile
     if profile:
         # Read from a file
@@ -95,7 +95,7 @@ def teardown(profile=None, xml=True, dry_run=False, tree=None):
     else:
         if not tree:
             # Load the RTC Tree, using the paths from the profile
-            tree = rtctree.tree.RTCTree(paths=[rtctree.path.parse_path(
+            tree = trees.make_tree(paths=[rtctree.path.parse_path(
                 '/' + c.path_uri)[0] for c in rtsp.components])
         for a in actions:
             a(tree)
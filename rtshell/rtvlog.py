@@ -24,14 +24,13 @@ import optparse
 import os
 import os.path
 import rtctree.exceptions
-import rtctree.tree
 import rtctree.path
-import RTC
 import sys
 import traceback
 
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -50,7 +49,7 @@ def print_logs(paths, options, tree=None):
 
     if not tree:
         parsed = [p[2] for p in paths]
-        tree = rtctree.tree.RTCTree(paths=parsed, filter=parsed)
+        tree = trees.make_tree(paths=parsed, filter=parsed)
 
     filters = ','.join(options.filters)
     ids = []
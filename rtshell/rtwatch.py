@@ -24,9 +24,7 @@ import argparse
 import os
 import os.path
 import rtctree.exceptions
-import rtctree.tree
 import rtctree.path
-import RTC
 import sys
 import traceback
 import time
@@ -35,43 +33,38 @@ from threading import Event
 
 from rtshell import path
 from rtshell import rts_exceptions
-from rtctree.component import Component
+from rtshell import trees
 import rtshell
 
-STATUS_CODE_MAP = {
-    Component.INACTIVE: 'INACTIVE',
-    Component.ACTIVE: 'ACTIVE',
-    Component.ERROR: 'ERROR',
-    Component.UNKNOWN: 'UNKNOWN',
-    Component.CREATED: 'CREATED'
-}
+# The maps from event codes to names are filled in by _fill_code_maps from the
+# constants of rtctree.component.Component, so that the module is only
+# imported when events are watched.
+STATUS_CODE_MAP = {}
+STATUS_CODES = ['INACTIVE', 'ACTIVE', 'ERROR', 'UNKNOWN', 'CREATED']
 
-EC_EVENT_CODE_MAP = {
-    Component.EC_ATTACHED: 'EC_ATTACHED',
-    Component.EC_DETACHED: 'EC_DETACHED',
-    Component.EC_RATE_CHANGED: 'EC_RATE_CHANGED',
-    Component.EC_STARTUP: 'EC_STARTUP',
-    Component.EC_SHUTDOWN: 'EC_SHUTDOWN'
-}
+EC_EVENT_CODE_MAP = {}
+EC_EVENT_CODES = ['EC_ATTACHED', 'EC_DETACHED', 'EC_RATE_CHANGED',
+        'EC_STARTUP', 'EC_SHUTDOWN']
 
-PORT_EVENT_CODE_MAP = {
-    Component.PORT_ADD: 'PORT_ADD',
-    Component.PORT_REMOVE: 'PORT_REMOVE',
-    Component.PORT_CONNECT: 'PORT_CONNECT',
-    Component.PORT_DISCONNECT: 'PORT_DISCONNECT'
-}
+PORT_EVENT_CODE_MAP = {}
+PORT_EVENT_CODES = ['PORT_ADD', 'PORT_REMOVE', 'PORT_CONNECT',
+        'PORT_DISCONNECT']
 
-CONFIG_EVENT_CODE_MAP = {
-    Component.CFG_UPDATE_SET: 'CFG_UPDATE_SET',
-    Component.CFG_UPDATE_PARAM: 'CFG_UPDATE_PARAM',
-    Component.CFG_SET_SET: 'CFG_SET_SET',
-    Component.CFG_ADD_SET: 'CFG_ADD_SET',
-    Component.CFG_REMOVE_SET: 'CFG_REMOVE_SET',
-    Component.CFG_ACTIVATE_SET: 'CFG_ACTIVATE_SET'
-}
+CONFIG_EVENT_CODE_MAP = {}
+CONFIG_EVENT_CODES = ['CFG_UPDATE_SET', 'CFG_UPDATE_PARAM', 'CFG_SET_SET',
+        'CFG_ADD_SET', 'CFG_REMOVE_SET', 'CFG_ACTIVATE_SET']
 
 counter = 0
 
+def _fill_code_maps():
+    from rtctree.component import Component
+    for code_map, names in ((STATUS_CODE_MAP, STATUS_CODES),
+            (EC_EVENT_CODE_MAP, EC_EVENT_CODES),
+            (PORT_EVENT_CODE_MAP, PORT_EVENT_CODES),
+            (CONFIG_EVENT_CODE_MAP, CONFIG_EVENT_CODES)):
+        for n in names:
+            code_map[getattr(Component, n)] = n
+
 def rtc_status_cb(eventkind, args, args2):
     global counter
     event = args2[0]
@@ -161,10 +154,11 @@ def print_logs(paths, options, tree=None):
         if not path[-1]:
             raise rts_exceptions.NotAComponentError(p[0])
         p.append(path)
+    _fill_code_maps()
 
     if not tree:
         parsed = [p[2] for p in paths]
-        tree = rtctree.tree.RTCTree(paths=parsed, filter=parsed)
+        tree = trees.make_tree(paths=parsed, filter=parsed)
 
     rtcs = []
     event = Event()
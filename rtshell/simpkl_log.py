@@ -20,10 +20,14 @@ Pickle-based log.
 
 
 import copy
+import multiprocessing
 import os
 import pickle
+import struct
 import traceback
+import zlib
 
+from rtshell import data_codec
 from rtshell import ilog
 
 
@@ -51,8 +55,27 @@ class CurPos(object):
 ## enough).
 ##
 ## The simple pickle-based format is as follows (each entry is serialised):
-## Port specification (in the metadata block)
-## [Data entries: (Index, Time stamp, Data)]
+## Header: {'format': 'simpkl', 'version', 'meta', 'channels', 'checksum'}
+## Buffer space for the end pointer
+## [Data entries: (Index, Time stamp, Data, File position, Previous position)]
+##
+## Logs written before the header was introduced store the metadata block in
+## place of the header.
+##
+## If the header's checksum is 'crc32', each data entry is stored as a block:
+## the length of the pickled entry (4 bytes), the pickled entry, and the
+## CRC32 of the pickled entry (4 bytes). The length prefix allows the blocks
+## to be found without unpickling them, so they can be verified in parallel.
+##
+## If the log has a channel table, each entry's data is a tuple of
+## (channel ID, payload), where the payload has been encoded by the channel's
+## codec, and time stamps are stored as (seconds, nanoseconds) tuples. Both
+## are decoded transparently when reading, so reading a log with channels
+## returns (channel name, value) tuples just like writing takes.
+##
+## Channels with delta encoding enabled store each payload either in full,
+## making that entry the channel's key frame, or as a tuple of (key frame file
+## position, edits) when it is identical or mostly identical to the key frame.
 
 class SimplePickleLog(ilog.Log):
     # Indices in data entries for bits of data
@@ -63,6 +86,10 @@ class SimplePickleLog(ilog.Log):
     PREV = 4
     # Spare space at the start for pointers
     BUFFER_SIZE = 256
+    # Identification of the header block
+    FORMAT = 'simpkl'
+    VERSION = 3
+    CHECKSUM = 'crc32'
 
     def __init__(self, filename='', *args, **kwargs):
         self._is_open = False
@@ -73,6 +100,10 @@ class SimplePickleLog(ilog.Log):
         self._next = None
         self._write_ind = 0
         self._prev_pos = 0
+        self._chan_ids = {}
+        self._codecs = {}
+        self._key_frames = {}
+        self._checksum = None
         super(SimplePickleLog, self).__init__(*args, **kwargs)
 
     def __str__(self):
@@ -80,13 +111,18 @@ class SimplePickleLog(ilog.Log):
                 self._mode, self._cur_pos)
 
     def write(self, timestamp, data):
-        val = (self._write_ind, timestamp, data, self._file.tell(), self._prev_pos)
+        if self._chans:
+            stored_ts, stored_data = self._encode(timestamp, data)
+        else:
+            stored_ts, stored_data = timestamp, data
+        val = (self._write_ind, stored_ts, stored_data, self._file.tell(),
+                self._prev_pos)
         # Track the start of the last entry for later writing at the file start
         self._cur_pos.ts = timestamp
         self._end = copy.copy(self._cur_pos)
         # Record the new "previous" position before writing
         self._prev_pos = self._file.tell()
-        self._write(val)
+        self._write_entry(val)
         # Update the current position to after the new final record
         self._cur_pos.index = val[self.INDEX] + 1
         self._cur_pos.ts = -1
@@ -137,7 +173,7 @@ class SimplePickleLog(ilog.Log):
             # Move back in the file one entry
             self._file.seek(target)
             # Update the next pointer
-            self._next = self._read()
+            self._next = self._read_entry()
             self._update_cur_pos(self._next)
         self._vb_print('New current position: {0}.'.format(self._cur_pos))
 
@@ -156,6 +192,43 @@ class SimplePickleLog(ilog.Log):
             self._end = None
             self._vb_print('Closed file.')
 
+    def _decode(self, entry):
+        '''Decode an entry read from a log with a channel table.'''
+        index, ts, (chan_id, payload), fp, prev = entry
+        if type(ts) == tuple:
+            ts = ilog.EntryTS(sec=ts[0], nsec=ts[1])
+        name, codec, delta = self._codecs[chan_id]
+        if delta and type(payload) != tuple:
+            self._key_frames[chan_id] = (fp, payload)
+        if self._decode_names is not None and name not in self._decode_names:
+            return (index, ts, (name, None), fp, prev)
+        if delta and type(payload) == tuple:
+            key_fp, edits = payload
+            payload = data_codec.apply_delta(self._get_key_frame(chan_id,
+                key_fp), edits)
+        return (index, ts, (name, codec.decode(payload)), fp, prev)
+
+    def _encode(self, timestamp, data):
+        '''Encode a time stamp and (channel name, value) tuple for writing.'''
+        name, value = data
+        try:
+            chan_id = self._chan_ids[name]
+        except KeyError:
+            raise ilog.UnknownChannelError(name)
+        if type(timestamp) == ilog.EntryTS:
+            timestamp = (timestamp.sec, timestamp.nsec)
+        name, codec, delta = self._codecs[chan_id]
+        payload = codec.encode(value)
+        if delta:
+            key = self._key_frames.get(chan_id)
+            if key is not None:
+                edits = data_codec.make_delta(key[1], payload)
+                if edits is not None:
+                    return timestamp, (chan_id, (key[0], edits))
+            # This entry becomes the key frame for following entries
+            self._key_frames[chan_id] = (self._file.tell(), payload)
+        return timestamp, (chan_id, payload)
+
     def _eof(self):
         return self._next is None
 
@@ -173,11 +246,27 @@ class SimplePickleLog(ilog.Log):
         self._vb_print('End position: {0}'.format(self._end))
         return (self._end.index, self._end.ts)
 
+    def _get_key_frame(self, chan_id, key_fp):
+        '''Get the payload of a channel's key frame at a file position.'''
+        key = self._key_frames.get(chan_id)
+        if key is not None and key[0] == key_fp:
+            return key[1]
+        # Not the most-recently read key frame (e.g. after seeking), so read
+        # it from the file
+        self._vb_print('Reading key frame for channel {0} at {1}.'.format(
+            chan_id, key_fp))
+        current = self._file.tell()
+        self._file.seek(key_fp)
+        payload = self._read_raw_entry()[self.DATA][1]
+        self._file.seek(current)
+        self._key_frames[chan_id] = (key_fp, payload)
+        return payload
+
     def _init_log(self):
         if self._mode == 'r':
             self._vb_print('Initialising log for reading.')
-            # Read out the metadata
-            self._meta = self._read()
+            # Read out the header
+            self._read_header()
             pos = self._file.tell()
             # Read the end marker
             self._end = self._read()
@@ -188,12 +277,12 @@ class SimplePickleLog(ilog.Log):
             self._set_start()
             self._cur_pos = copy.copy(self._start)
             # Get the first entry
-            self._next = self._read()
+            self._next = self._read_entry()
         else:
             self._vb_print('Initialising log for writing.')
-            # Write the metadata
-            self._write(self._meta)
-            self._vb_print('Wrote meta data of length {0}'.format(
+            # Write the header, including the metadata and channel table
+            self._write_header()
+            self._vb_print('Wrote header of length {0}'.format(
                 self._file.tell()))
             self._buf_start = self._file.tell()
             # Put some blank space to write the end marker
@@ -232,6 +321,54 @@ class SimplePickleLog(ilog.Log):
             raise ilog.EndOfLogError
         return data
 
+    def _read_block(self):
+        '''Read a single checksummed block from the log.'''
+        pos = self._file.tell()
+        self._vb_print('Reading one checksummed block at {0}.'.format(pos))
+        head = self._file.read(BLOCK_HEAD.size)
+        if len(head) < BLOCK_HEAD.size:
+            self._vb_print('End of log reached.')
+            raise ilog.EndOfLogError
+        length = BLOCK_HEAD.unpack(head)[0]
+        body = self._file.read(length + BLOCK_HEAD.size)
+        if len(body) < length + BLOCK_HEAD.size:
+            self._vb_print('Truncated block at end of log.')
+            raise ilog.EndOfLogError
+        body, crc = body[:length], BLOCK_HEAD.unpack(body[length:])[0]
+        if _crc32(body) != crc:
+            raise ilog.ChecksumError('Bad checksum in block at {0}'.format(
+                pos))
+        return pickle.loads(body)
+
+    def _read_entry(self):
+        '''Read a single data entry from the log, decoding it if necessary.'''
+        entry = self._read_raw_entry()
+        if self._chans and entry:
+            return self._decode(entry)
+        return entry
+
+    def _read_raw_entry(self):
+        '''Read a single data entry from the log without decoding it.'''
+        if self._checksum:
+            return self._read_block()
+        return self._read()
+
+    def _read_header(self):
+        '''Read the header block, setting the metadata and channel table.'''
+        header = self._read()
+        if type(header) == dict and header.get('format') == self.FORMAT:
+            self._vb_print('Log format version {0}'.format(
+                header['version']))
+            self._meta = header['meta']
+            self._set_channels(header['channels'])
+            self._checksum = header.get('checksum')
+        else:
+            # Old logs have only the metadata block
+            self._vb_print('Log has no header; treating as metadata.')
+            self._meta = header
+            self._set_channels(None)
+            self._checksum = None
+
     def _read_number(self, number):
         self._vb_print('Reading {0} entries.'.format(number))
         res = []
@@ -244,7 +381,7 @@ class SimplePickleLog(ilog.Log):
             for ii in range(number):
                 res.append((self._next[self.INDEX], self._next[self.TS],
                     self._next[self.DATA]))
-                self._next = self._read()
+                self._next = self._read_entry()
                 if not self._next:
                     self._set_eof_pos()
                     self._vb_print('End of log during reading, current '\
@@ -278,7 +415,7 @@ class SimplePickleLog(ilog.Log):
             while self._next[self.TS] <= timestamp:
                 res.append((self._next[self.INDEX], self._next[self.TS],
                     self._next[self.DATA]))
-                self._next = self._read()
+                self._next = self._read_entry()
                 if not self._next:
                     self._set_eof_pos()
                     self._vb_print('End of log during reading, current '\
@@ -305,7 +442,7 @@ class SimplePickleLog(ilog.Log):
             res = [(self._next[self.INDEX], self._next[self.TS],
                 self._next[self.DATA])]
             try:
-                self._next = self._read()
+                self._next = self._read_entry()
             except ilog.EndOfLogError:
                 self._next = None
             if not self._next:
@@ -374,18 +511,32 @@ class SimplePickleLog(ilog.Log):
         self._cur_pos.cache = 0 # No valid entry at current file position
         self._cur_pos.fp = self._file.tell() # This is the end of the file
 
+    def _set_channels(self, channels):
+        '''Set the channel table and prepare the codec for each channel.'''
+        self._chans = channels
+        self._chan_ids = {}
+        self._codecs = {}
+        self._key_frames = {}
+        if not channels:
+            return
+        for c in channels:
+            self._chan_ids[c.name] = c.id
+            self._codecs[c.id] = (c.name, data_codec.make_codec(c.codec,
+                c.type), c.delta)
+        self._vb_print('Channel table: {0}'.format(channels))
+
     def _set_start(self):
         # Save the current position
         current = self._file.tell()
         # Move to the start
         self._file.seek(0)
-        # Skip the metadata block
+        # Skip the header block
         self._read()
         # Skip the buffer
         self._file.seek(self.BUFFER_SIZE, os.SEEK_CUR)
         # Read the first entry
         pos = self._file.tell()
-        entry = self._read()
+        entry = self._read_entry()
         self._start = CurPos(entry[self.INDEX], entry[self.TS],
                 entry[self.PREV], pos, self._file.tell())
         self._file.seek(current)
@@ -399,8 +550,136 @@ class SimplePickleLog(ilog.Log):
         self._cur_pos.cache = self._cur_pos.fp
         self._cur_pos.fp = self._file.tell()
 
+    def _write_header(self):
+        '''Write the header block, choosing a codec for each channel.'''
+        if self._chans:
+            for c in self._chans:
+                c.codec = data_codec.choose_codec(c.type, need_bytes=c.delta)
+        self._set_channels(self._chans)
+        self._checksum = self.CHECKSUM
+        self._write({'format': self.FORMAT, 'version': self.VERSION,
+            'meta': self._meta, 'channels': self._chans,
+            'checksum': self._checksum})
+
     def _write(self, data):
         '''Pickle some data and write it to the file.'''
         self._vb_print('Writing one data block.')
         pickle.dump(data, self._file, pickle.HIGHEST_PROTOCOL)
 
+    def _write_entry(self, entry):
+        '''Write a data entry as a checksummed block.'''
+        body = pickle.dumps(entry, pickle.HIGHEST_PROTOCOL)
+        self._file.write(BLOCK_HEAD.pack(len(body)))
+        self._file.write(body)
+        self._file.write(BLOCK_HEAD.pack(_crc32(body)))
+
+
+###############################################################################
+## Log verification
+
+# Length prefix and checksum of a data entry block
+BLOCK_HEAD = struct.Struct('<I')
+# Number of bytes of blocks to verify in each verification job
+VERIFY_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def verify_log(filename, jobs=None, fail_fast=False):
+    '''Verify the checksums of all the entries in a log.
+
+    The log is scanned for the positions of its blocks, which are grouped into
+    chunks and verified in parallel by a pool of worker processes, each of
+    which reads its own chunks from the file. Chunks are handed to the
+    workers as they are found, so verifying starts straight away. The entries
+    are not unpickled.
+
+    Returns a tuple of (number of entries checked, [(index, file position),
+    ...]) listing the entries that failed verification. A block truncated by
+    the end of the file counts as a failed entry.
+
+    @param filename The name of the log file.
+    @param jobs The number of worker processes. Defaults to the number of
+                CPUs.
+    @param fail_fast Stop at the first failed chunk rather than checking the
+                     whole log.
+
+    '''
+    with open(filename, 'rb') as f:
+        header = pickle.load(f)
+        if type(header) != dict or \
+                header.get('checksum') != SimplePickleLog.CHECKSUM:
+            raise ilog.NoChecksumsError('Log {0} has no checksums.'.format(
+                filename))
+        checked = 0
+        bad = []
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for count, result in pool.imap_unordered(_verify_chunk,
+                    _find_chunks(f, f.tell() + SimplePickleLog.BUFFER_SIZE,
+                        filename)):
+                checked += count
+                bad += result
+                if result and fail_fast:
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+    return checked, sorted(bad)
+
+
+def _crc32(data):
+    return zlib.crc32(data) & 0xffffffff
+
+
+def _find_chunks(f, start, filename):
+    '''Find the blocks in a log and group them into chunks for verifying.
+
+    Yields (filename, first index, file position, [block lengths]).
+
+    '''
+    f.seek(start)
+    index = 0
+    pos = chunk_start = start
+    lengths = []
+    chunk_bytes = 0
+    while True:
+        head = f.read(BLOCK_HEAD.size)
+        if len(head) < BLOCK_HEAD.size:
+            break
+        length = BLOCK_HEAD.unpack(head)[0]
+        lengths.append(length)
+        pos += length + 2 * BLOCK_HEAD.size
+        chunk_bytes += length
+        if chunk_bytes >= VERIFY_CHUNK_SIZE:
+            yield (filename, index, chunk_start, lengths)
+            index += len(lengths)
+            chunk_start = pos
+            lengths = []
+            chunk_bytes = 0
+        f.seek(pos)
+    if lengths:
+        yield (filename, index, chunk_start, lengths)
+
+
+def _verify_chunk(chunk):
+    '''Verify the blocks in one chunk of a log.
+
+    Returns a tuple of (number of entries checked, [(index, file position),
+    ...]).
+
+    '''
+    filename, index, start, lengths = chunk
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(sum(lengths) + 2 * BLOCK_HEAD.size * len(lengths))
+    bad = []
+    pos = 0
+    for ii, length in enumerate(lengths):
+        body_start = pos + BLOCK_HEAD.size
+        body_end = body_start + length
+        if body_end + BLOCK_HEAD.size > len(data) or \
+                _crc32(data[body_start:body_end]) != \
+                BLOCK_HEAD.unpack_from(data, body_end)[0]:
+            bad.append((index + ii, start + pos))
+        pos = body_end + BLOCK_HEAD.size
+    return len(lengths), bad
+
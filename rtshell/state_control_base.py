@@ -23,13 +23,13 @@ from __future__ import print_function
 import optparse
 import os
 import os.path
-import rtctree.tree
 import rtctree.path
 import sys
 import traceback
 
 from rtshell import path
 from rtshell import rts_exceptions
+from rtshell import trees
 import rtshell
 
 
@@ -44,7 +44,7 @@ def alter_component_states(action, paths, options, tree=None):
     paths, ports = list(zip(*pathports))
 
     if not tree:
-        tree = rtctree.tree.RTCTree(paths=paths, filter=paths)
+        tree = trees.make_tree(paths=paths, filter=paths)
 
     for ii, p in enumerate(paths):
         if not tree.has_path(p):
@@ -0,0 +1,524 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Cached, per-type access to the fields of IDL structs.
+
+Extractors are Python functions generated from the layout of a type the
+first time it is seen, and cached by type. The layout is taken from the
+omniORB type descriptor of the type when it is available, or otherwise from a
+sample value. Each extractor turns a value into plain Python data (tuples of
+columns, or nested dictionaries) without any introspection of the value.
+
+Builders do the reverse, constructing a value from plain data. They are made
+from the omniORB type descriptor of the type when it is available, so nested
+structs, sequences and enums are reconstructed; otherwise only the top-level
+type is constructed.
+
+'''
+
+
+import inspect
+import sys
+
+
+if sys.version_info[0] == 3:
+    _SCALARS = (bool, int, float, str, type(None))
+    _getargspec = inspect.getfullargspec
+else:
+    _SCALARS = (bool, int, long, float, str, unicode, type(None))
+    _getargspec = inspect.getargspec
+
+
+# Caches of field names, row extractors and dictionary extractors by type
+_names = {}
+_rows = {}
+_dicts = {}
+# Cache of builders by IDL repository ID or type
+_builders = {}
+# Layout of an octet or char sequence leaf, which is written as a list of
+# integers (see Layouts below)
+_BYTES = 'bytes'
+
+
+def field_names(value):
+    '''Get the names of the fields of a struct value, in IDL order.
+
+    The order is that of the arguments of the type's constructor, which for
+    omniORB-generated structs is the order of the fields in the IDL. Values
+    that are not structs have no fields.
+
+    '''
+    t = type(value)
+    try:
+        return _names[t]
+    except KeyError:
+        pass
+    attrs = getattr(value, '__dict__', {})
+    try:
+        args = _getargspec(t.__init__)[0][1:]
+    except TypeError:
+        args = []
+    if args and all(a in attrs for a in args):
+        names = tuple(args)
+    else:
+        names = tuple(sorted(a for a in attrs if not a.startswith('_')))
+    _names[t] = names
+    return names
+
+
+def is_struct(value):
+    '''Check if a value is a struct (an object with fields).'''
+    return not isinstance(value, _SCALARS) and \
+            not isinstance(value, (list, tuple, bytes)) and \
+            bool(field_names(value))
+
+
+def to_plain(value):
+    '''Convert any value to plain Python data.
+
+    Structs become dictionaries, sequences become lists, byte strings (under
+    Python 3) become lists of integers and other non-scalar values (such as
+    enum items) become their string representation. This is the slow, generic
+    path used for leaves whose layout is not known in advance, such as the
+    elements of sequences.
+
+    '''
+    if isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    if isinstance(value, bytes):
+        return list(bytearray(value))
+    names = field_names(value)
+    if names:
+        return dict((n, to_plain(getattr(value, n))) for n in names)
+    return str(value)
+
+
+def leaves(value):
+    '''Get the leaf fields of a value, as [(dotted name, is scalar), ...].
+
+    Nested structs are walked recursively. Sequences are leaves.
+
+    '''
+    def walk(v, prefix):
+        if not is_struct(v):
+            return [(prefix, isinstance(v, _SCALARS))]
+        result = []
+        for n in field_names(v):
+            if prefix:
+                name = prefix + '.' + n
+            else:
+                name = n
+            result += walk(getattr(v, n), name)
+        return result
+    return walk(value, '')
+
+
+def row_extractor(sample):
+    '''Get the row extractor for the type of a sample value.
+
+    Returns a tuple of (column names, extractor). The extractor receives a
+    value of the same type as the sample and returns a tuple of its leaf
+    fields, in the same order as the column names. The type's IDL type
+    descriptor is used if it is known, as only it tells octet and char
+    sequences from strings under Python 2.
+
+    '''
+    t = type(sample)
+    try:
+        return _rows[t]
+    except KeyError:
+        pass
+    result = _make_row_extractor(_sample_layout(sample), t)
+    _rows[t] = result
+    return result
+
+
+def dict_extractor(sample):
+    '''Get the dictionary extractor for the type of a sample value.
+
+    The extractor receives a value of the same type as the sample and
+    returns it as plain Python data, suitable for serialising as JSON: structs
+    become dictionaries of their fields. As with row_extractor(), the type's
+    IDL type descriptor is used if it is known.
+
+    '''
+    t = type(sample)
+    try:
+        return _dicts[t]
+    except KeyError:
+        pass
+    result = _make_dict_extractor(_sample_layout(sample), t)
+    _dicts[t] = result
+    return result
+
+
+def type_row_extractor(type):
+    '''Get the row extractor for a type from its IDL type descriptor.
+
+    As row_extractor, but no sample value is needed. Returns None if the type
+    descriptor is not available.
+
+    '''
+    try:
+        return _rows[type]
+    except KeyError:
+        pass
+    layout = _type_layout(type)
+    if layout is None:
+        return None
+    result = _make_row_extractor(layout, type)
+    _rows[type] = result
+    return result
+
+
+def type_dict_extractor(type):
+    '''Get the dictionary extractor for a type from its IDL type descriptor.
+
+    As dict_extractor, but no sample value is needed. Returns None if the
+    type descriptor is not available.
+
+    '''
+    try:
+        return _dicts[type]
+    except KeyError:
+        pass
+    layout = _type_layout(type)
+    if layout is None:
+        return None
+    result = _make_dict_extractor(layout, type)
+    _dicts[type] = result
+    return result
+
+
+def type_field_names(type):
+    '''Get the names of the fields of a struct type, in IDL order.
+
+    The names are taken from the IDL type descriptor if it is known, or
+    otherwise from the arguments of the type's constructor.
+
+    '''
+    desc = _find_desc(getattr(type, '_NP_RepositoryId', None))
+    if desc is not None:
+        from omniORB import tcInternal
+        desc = _unalias(desc)
+        if not isinstance(desc, tuple) or desc[0] != tcInternal.tv_struct:
+            return []
+        return [desc[ii] for ii in range(4, len(desc), 2)]
+    try:
+        return _getargspec(type.__init__)[0][1:]
+    except TypeError:
+        return []
+
+
+def field_kind(type, name):
+    '''Get the kind of a field of a struct type.
+
+    @param type The struct type.
+    @param name The name of the field.
+    @return One of 'bool', 'int', 'float', 'string', 'bytes', 'int_seq',
+            'float_seq', 'struct' or 'other', or None if the type's IDL type
+            descriptor is not known.
+
+    '''
+    desc = _find_desc(getattr(type, '_NP_RepositoryId', None))
+    if desc is None:
+        return None
+    desc = _unalias(desc)
+    for ii in range(4, len(desc), 2):
+        if desc[ii] == name:
+            return _desc_kind(_unalias(desc[ii + 1]))
+    raise AttributeError(name)
+
+
+def builder(type):
+    '''Get the builder for a type.
+
+    The builder receives plain data, as produced by a dictionary extractor,
+    and returns a value of the type. Structs may be given as dictionaries of
+    their fields or as sequences of their field values in order.
+
+    '''
+    try:
+        return _builders[type]
+    except KeyError:
+        pass
+    desc = _find_desc(getattr(type, '_NP_RepositoryId', None))
+    if desc is not None:
+        result = _desc_builder(desc)
+    else:
+        result = _generic_builder(type)
+    _builders[type] = result
+    return result
+
+
+def builder_for_id(repo_id):
+    '''Get the builder for a type by its IDL repository ID.
+
+    If the type is not known (its module has not been imported, or omniORB is
+    not available), the builder returns the plain data unchanged.
+
+    '''
+    try:
+        return _builders[repo_id]
+    except KeyError:
+        pass
+    desc = _find_desc(repo_id)
+    if desc is not None:
+        result = _desc_builder(desc)
+    else:
+        result = _identity
+    _builders[repo_id] = result
+    return result
+
+
+def _compile(src, t):
+    '''Compile the source of an extractor function.'''
+    ns = {'to_plain': to_plain, 'to_ints': _to_ints}
+    exec(compile(src, '<extractor for {0}>'.format(t.__name__), 'exec'), ns)
+    return ns['extract']
+
+
+###############################################################################
+## Layouts
+##
+## A layout describes how to extract the fields of a type. It is either a
+## boolean, for a leaf field (True if the leaf is a scalar that needs no
+## conversion), _BYTES for an octet or char sequence, or a list of (field
+## name, layout) for a struct. Octet and char sequences are only known from
+## the type descriptor: under Python 2 their values are indistinguishable
+## from strings.
+
+def _sample_layout(sample):
+    '''Get the layout of a type from its descriptor, or else a sample.'''
+    layout = _type_layout(type(sample))
+    if layout is None:
+        return _value_layout(sample)
+    return layout
+
+
+def _value_layout(value):
+    '''Get the layout of a value by inspecting it.'''
+    if not is_struct(value):
+        return isinstance(value, _SCALARS)
+    return [(n, _value_layout(getattr(value, n))) for n in field_names(value)]
+
+
+def _type_layout(type):
+    '''Get the layout of a type from its IDL type descriptor, if known.'''
+    desc = _find_desc(getattr(type, '_NP_RepositoryId', None))
+    if desc is None:
+        return None
+    return _desc_layout(desc)
+
+
+def _desc_layout(desc):
+    '''Get the layout of a type from an omniORB type descriptor.'''
+    from omniORB import tcInternal
+    if type(desc) != tuple:
+        # Basic types
+        return True
+    kind = desc[0]
+    if kind == tcInternal.tv_struct:
+        return [(desc[ii], _desc_layout(desc[ii + 1])) \
+                for ii in range(4, len(desc), 2)]
+    elif kind == tcInternal.tv_alias:
+        return _desc_layout(desc[3])
+    elif kind == tcInternal.tv_string or kind == tcInternal.tv_wstring:
+        return True
+    elif kind in (tcInternal.tv_sequence, tcInternal.tv_array) and \
+            desc[1] in (tcInternal.tv_octet, tcInternal.tv_char):
+        return _BYTES
+    # Sequences, enums, unions, etc. need converting
+    return False
+
+
+def _layout_leaves(layout, prefix=''):
+    '''Get the leaves of a layout, as [(dotted name, is scalar), ...].'''
+    if type(layout) != list:
+        return [(prefix, layout)]
+    result = []
+    for n, sub in layout:
+        if prefix:
+            name = prefix + '.' + n
+        else:
+            name = n
+        result += _layout_leaves(sub, name)
+    return result
+
+
+def _make_row_extractor(layout, t):
+    ls = _layout_leaves(layout)
+    columns = tuple(n or 'value' for n, scalar in ls)
+    src = 'def extract(d):\n    return ({0},)\n'.format(
+            ', '.join(_leaf_expr(n, scalar) for n, scalar in ls))
+    return (columns, _compile(src, t))
+
+
+def _make_dict_extractor(layout, t):
+    def expr(layout, path):
+        if type(layout) != list:
+            return _leaf_expr(path, layout)
+        items = []
+        for n, sub in layout:
+            if path:
+                sub_path = path + '.' + n
+            else:
+                sub_path = n
+            items.append('{0!r}: {1}'.format(n, expr(sub, sub_path)))
+        return '{' + ', '.join(items) + '}'
+    src = 'def extract(d):\n    return {0}\n'.format(expr(layout, ''))
+    return _compile(src, t)
+
+
+def _desc_builder(desc):
+    '''Make a builder from an omniORB type descriptor.'''
+    from omniORB import tcInternal
+    if type(desc) != tuple:
+        # Basic types
+        return _identity
+    kind = desc[0]
+    if kind == tcInternal.tv_struct:
+        cls = desc[1]
+        fields = [(desc[ii], _desc_builder(desc[ii + 1])) \
+                for ii in range(4, len(desc), 2)]
+        def build_struct(plain):
+            if type(plain) == dict:
+                return cls(*[b(plain[n]) for n, b in fields])
+            return cls(*[b(v) for (n, b), v in zip(fields, plain)])
+        return build_struct
+    elif kind in (tcInternal.tv_sequence, tcInternal.tv_array):
+        if desc[1] in (tcInternal.tv_octet, tcInternal.tv_char):
+            return _build_bytes
+        elem = _desc_builder(desc[1])
+        if elem is _identity:
+            return _identity
+        def build_seq(plain):
+            return [elem(v) for v in plain]
+        return build_seq
+    elif kind == tcInternal.tv_enum:
+        items = desc[3]
+        by_name = dict((str(i), i) for i in items)
+        def build_enum(plain):
+            if isinstance(plain, int):
+                return items[plain]
+            return by_name[plain]
+        return build_enum
+    elif kind == tcInternal.tv_alias:
+        return _desc_builder(desc[3])
+    return _identity
+
+
+def _generic_builder(type):
+    '''Make a builder for a type without a type descriptor.
+
+    Only the top-level value is constructed; nested structs are left as plain
+    data.
+
+    '''
+    try:
+        args = _getargspec(type.__init__)[0][1:]
+    except TypeError:
+        args = []
+    if not args:
+        return _identity
+    def build(plain):
+        if isinstance(plain, dict):
+            return type(*[plain.get(a) for a in args])
+        return type(*plain)
+    return build
+
+
+def _build_bytes(plain):
+    '''Build an octet or char sequence from a list of integers or a string.'''
+    if isinstance(plain, list):
+        return bytes(bytearray(plain))
+    return plain
+
+
+def _to_ints(value):
+    '''Convert an octet or char sequence to a list of integers.'''
+    if isinstance(value, (list, tuple)):
+        return [v if isinstance(v, int) else ord(v) for v in value]
+    if not isinstance(value, bytes):
+        # A char sequence as text
+        value = value.encode('latin-1')
+    return list(bytearray(value))
+
+
+def _desc_kind(desc):
+    '''Get the kind of a value from an omniORB type descriptor.'''
+    from omniORB import tcInternal
+    if type(desc) != tuple:
+        if desc == tcInternal.tv_boolean:
+            return 'bool'
+        elif desc in (tcInternal.tv_float, tcInternal.tv_double,
+                tcInternal.tv_longdouble):
+            return 'float'
+        elif desc in (tcInternal.tv_char, tcInternal.tv_wchar):
+            return 'string'
+        return 'int'
+    kind = desc[0]
+    if kind == tcInternal.tv_string or kind == tcInternal.tv_wstring:
+        return 'string'
+    elif kind == tcInternal.tv_struct:
+        return 'struct'
+    elif kind in (tcInternal.tv_sequence, tcInternal.tv_array):
+        if desc[1] in (tcInternal.tv_octet, tcInternal.tv_char):
+            return 'bytes'
+        elem = _desc_kind(_unalias(desc[1]))
+        if elem == 'int':
+            return 'int_seq'
+        elif elem == 'float':
+            return 'float_seq'
+    return 'other'
+
+
+def _find_desc(repo_id):
+    '''Find the omniORB type descriptor of a type, if it is known.'''
+    if not repo_id:
+        return None
+    try:
+        import omniORB
+    except ImportError:
+        return None
+    return omniORB.findType(repo_id)
+
+
+def _unalias(desc):
+    '''Get the descriptor of the type an alias names.'''
+    from omniORB import tcInternal
+    while type(desc) == tuple and desc[0] == tcInternal.tv_alias:
+        desc = desc[3]
+    return desc
+
+
+def _identity(plain):
+    return plain
+
+
+def _leaf_expr(path, scalar):
+    '''Make the expression that extracts a leaf field from the value d.'''
+    if path:
+        expr = 'd.' + path
+    else:
+        expr = 'd'
+    if scalar == _BYTES:
+        return 'to_ints({0})'.format(expr)
+    elif scalar:
+        return expr
+    return 'to_plain({0})'.format(expr)
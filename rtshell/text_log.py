@@ -19,20 +19,69 @@ Text-based log.
 '''
 
 
-import copy
+import array
+import bisect
+import csv
+import json
 import os
+import pickle
+import time
 
 from rtshell import ilog
+from rtshell import struct_fields
 
 
 ###############################################################################
-## Text-based log object. It only supports writing log files. It relies on
-## the data types having suitable __repr__ methods.
+## Text-based log object. Logs in any format can be written; logs in the JSON
+## Lines format can also be read.
+##
+## Three output formats are available:
+## text: One line per entry: the time stamp and the data, separated by a tab.
+##       It relies on the data types having suitable __repr__ methods (the
+##       data of a log with channels is a tuple of (channel name, value)).
+## csv: One row per entry: the time stamp, the channel name and the leaf
+##      fields of the data. A header row naming the columns is written before
+##      the first entry of each channel.
+## jsonl: One JSON object per line. The first line is a header holding the
+##        channel table; each following line is an entry, of the form
+##        {"ts": time stamp, "channel": name, "data": fields}. The time stamp
+##        is always the first member, written with full precision.
+##
+## If the log has a channel table, entries must be (channel name, data)
+## tuples. Otherwise the channel name in CSV and JSON Lines output is empty.
+##
+## Output is buffered; the buffer is flushed when it is full and at least
+## every flush_interval seconds. The interval is checked when an entry is
+## written and when check_flush() is called, which the recorder does every
+## execution cycle so that entries do not wait for the next one when a port
+## goes quiet.
+##
+## When a JSON Lines log is opened for reading, an index of the file position,
+## time stamp and channel of every entry is built by scanning the file without
+## parsing the JSON of the entries. The index is cached next to the log (with
+## the extension .idx added) and reused while the log is unchanged. Entries are
+## only parsed when they are read, and then only if their channel is decoded.
 
 class TextLog(ilog.Log):
-    def __init__(self, filename='', *args, **kwargs):
+    FORMATS = ['text', 'csv', 'jsonl']
+    # Identification of the JSON Lines header
+    JSONL_FORMAT = 'rtshell-jsonl'
+    JSONL_VERSION = 1
+    INDEX_VERSION = 1
+
+    def __init__(self, filename='', format='text', buffer_size=1024 * 1024,
+            flush_interval=1.0, *args, **kwargs):
         self._is_open = False
+        if format not in self.FORMATS:
+            raise ValueError('Unknown text log format: {0}'.format(format))
         self._fn = filename
+        self._format = format
+        self._buf_size = buffer_size
+        self._flush_int = flush_interval
+        self._count = 0
+        self._extractors = {}
+        self._ind = 0
+        self._fpos = 0
         super(TextLog, self).__init__(*args, **kwargs)
 
     def __str__(self):
@@ -42,10 +91,208 @@ class TextLog(ilog.Log):
         else:
             return 'TextLog({0}, {1}).'.format(self._fn, self._mode)
 
+    @property
+    def format(self):
+        '''The output format of the log.'''
+        return self._format
+
     def write(self, timestamp, data):
-        pos = self._file.tell()
-        self._file.write('{0}\t{1}\n'.format(timestamp, data))
-        self._vb_print('Wrote entry at {0}.'.format(pos))
+        if self._format == 'text':
+            self._file.write('{0}\t{1}\n'.format(timestamp, data))
+        else:
+            if self._chans:
+                name, data = data
+            else:
+                name = ''
+            if self._format == 'csv':
+                self._write_csv(timestamp, name, data)
+            else:
+                self._write_jsonl(timestamp, name, data)
+        self._count += 1
+        self.check_flush()
+        if self._vb:
+            self._vb_print('Wrote entry {0}.'.format(self._count))
+
+    def check_flush(self):
+        if self._mode != 'w' or not self._is_open:
+            return
+        now = time.time()
+        if now - self._last_flush >= self._flush_int:
+            self._file.flush()
+            self._last_flush = now
+
+    def read(self, timestamp=None, number=None):
+        self._check_readable()
+        if number is not None:
+            if number < 0:
+                raise ValueError
+            last = min(self._ind + number, len(self._offsets))
+        elif timestamp is not None:
+            if timestamp < 0:
+                raise ValueError
+            last = self._ind
+            ts = _ts_key(timestamp)
+            while last < len(self._offsets) and self._ts_key(last) <= ts:
+                last += 1
+        else:
+            last = min(self._ind + 1, len(self._offsets))
+        res = [self._read_entry(ii) for ii in range(self._ind, last)]
+        self._ind = last
+        self._vb_print('Read {0} entries; current position is {1}.'.format(
+            len(res), self._ind))
+        return res
+
+    def rewind(self):
+        self._check_readable()
+        self._vb_print('Rewinding log from position {0}.'.format(self._ind))
+        self._ind = 0
+
+    def seek(self, timestamp=None, index=None):
+        self._check_readable()
+        self._vb_print('Seeking log from position {0}.'.format(self._ind))
+        if index is not None:
+            if index < 0:
+                raise ilog.InvalidIndexError
+            self._ind = min(index, len(self._offsets))
+        elif timestamp is not None:
+            ts = _ts_key(timestamp)
+            if self._sorted:
+                self._ind = bisect.bisect_left(_TSKeys(self), ts)
+            else:
+                self._ind = 0
+                while self._ind < len(self._offsets) and \
+                        self._ts_key(self._ind) < ts:
+                    self._ind += 1
+        self._vb_print('New current position: {0}.'.format(self._ind))
+
+    def _build_index(self):
+        '''Scan the log for the position, time stamp and channel of entries.'''
+        self._vb_print('Building index of {0}.'.format(self._fn))
+        chan_ids = dict((c.name, c.id) for c in self._chans)
+        raw_names = {}
+        self._offsets = array.array('d')
+        self._secs = array.array('l')
+        self._nsecs = array.array('l')
+        self._chan_of = array.array('l')
+        self._file.seek(0)
+        pos = 0
+        for line in self._file:
+            entry_pos = pos
+            pos += len(line)
+            if not line.startswith(_TS_PREFIX):
+                continue
+            ts_end = line.find(_CHAN_PREFIX)
+            chan_end = line.find(_DATA_PREFIX, ts_end)
+            if ts_end == -1 or chan_end == -1:
+                continue
+            sec, nsec = _parse_ts(line[len(_TS_PREFIX):ts_end])
+            raw_name = line[ts_end + len(_CHAN_PREFIX):chan_end]
+            try:
+                chan = raw_names[raw_name]
+            except KeyError:
+                name = json.loads(raw_name.decode('utf-8'))
+                chan = raw_names[raw_name] = chan_ids.get(name, -1)
+            self._offsets.append(entry_pos)
+            self._secs.append(sec)
+            self._nsecs.append(nsec)
+            self._chan_of.append(chan)
+        self._fpos = pos
+        self._vb_print('Indexed {0} entries.'.format(len(self._offsets)))
+
+    def _check_readable(self):
+        if self._mode != 'r':
+            raise NotImplementedError
+
+    def _eof(self):
+        if self._mode != 'r':
+            return True
+        return self._ind >= len(self._offsets)
+
+    def _get_start(self):
+        self._check_readable()
+        if not self._offsets:
+            return (0, ilog.EntryTS())
+        return (0, self._entry_ts(0))
+
+    def _get_end(self):
+        self._check_readable()
+        if not self._offsets:
+            return (0, ilog.EntryTS())
+        return (len(self._offsets) - 1, self._entry_ts(-1))
+
+    def _entry_ts(self, ii):
+        return ilog.EntryTS(sec=self._secs[ii], nsec=self._nsecs[ii])
+
+    def _load_index(self):
+        '''Load the cached index, or build it and cache it.'''
+        st = os.stat(self._fn)
+        idx_fn = self._fn + '.idx'
+        try:
+            with open(idx_fn, 'rb') as f:
+                idx = pickle.load(f)
+            if idx['version'] == self.INDEX_VERSION and \
+                    idx['size'] == st.st_size and \
+                    idx['mtime'] == st.st_mtime:
+                self._offsets, self._secs, self._nsecs, self._chan_of = \
+                        idx['entries']
+                self._vb_print('Loaded index from {0}.'.format(idx_fn))
+                return
+            self._vb_print('Index {0} is out of date.'.format(idx_fn))
+        except (IOError, OSError, EOFError, KeyError, ValueError,
+                pickle.UnpicklingError):
+            pass
+        self._build_index()
+        try:
+            with open(idx_fn, 'wb') as f:
+                pickle.dump({'version': self.INDEX_VERSION,
+                    'size': st.st_size, 'mtime': st.st_mtime,
+                    'entries': (self._offsets, self._secs, self._nsecs,
+                        self._chan_of)}, f, pickle.HIGHEST_PROTOCOL)
+            self._vb_print('Wrote index to {0}.'.format(idx_fn))
+        except (IOError, OSError):
+            # The index is only a cache, so carry on without it
+            self._vb_print('Failed to write index to {0}.'.format(idx_fn))
+
+    def _read_entry(self, ii):
+        '''Read and decode the entry at an index.'''
+        chan = self._chan_of[ii]
+        if chan < 0:
+            # The channel is not in the channel table
+            name = None
+        else:
+            name = self._chans[chan].name
+        ts = self._entry_ts(ii)
+        if self._decode_names is not None and name not in self._decode_names:
+            return (ii, ts, (name, None))
+        pos = int(self._offsets[ii])
+        if pos != self._fpos:
+            self._file.seek(pos)
+        line = self._file.readline()
+        self._fpos = pos + len(line)
+        entry = json.loads(line.decode('utf-8'))
+        if name is None:
+            return (ii, ts, (entry['channel'], entry['data']))
+        return (ii, ts, (name, self._builders[chan](entry['data'])))
+
+    def _read_header(self):
+        '''Read the JSON Lines header, setting the metadata and channels.'''
+        line = self._file.readline()
+        try:
+            header = json.loads(line.decode('utf-8'))
+        except ValueError:
+            header = None
+        if type(header) != dict or header.get('format') != self.JSONL_FORMAT:
+            raise ValueError('{0} is not a JSON Lines log.'.format(self._fn))
+        self._meta = header.get('meta')
+        self._chans = [ilog.Channel(c['id'], c['name'], type_name=c['type'],
+            codec='json') for c in header['channels']]
+        # Channel IDs are their position in the table
+        self._chans.sort(key=lambda c: c.id)
+        self._builders = [struct_fields.builder_for_id(c.type_name) \
+                for c in self._chans]
+
+    def _ts_key(self, ii):
+        return (self._secs[ii], self._nsecs[ii])
 
     def _close(self):
         if not self._is_open:
@@ -55,6 +302,12 @@ class TextLog(ilog.Log):
         self._vb_print('Closed file.')
 
     def _get_cur_pos(self):
+        if self._mode == 'r':
+            if not self._offsets:
+                return (0, ilog.EntryTS())
+            # At the end of the log, the time stamp is that of the last entry
+            return (self._ind,
+                    self._entry_ts(min(self._ind, len(self._offsets) - 1)))
         if self._is_open:
             self._vb_print('Current position: {0}'.format(self._file.tell()))
             return self._file.tell()
@@ -62,15 +315,123 @@ class TextLog(ilog.Log):
             self._vb_print('Current position: file closed.')
             return 0
 
+    def _get_extractor(self, name, data):
+        '''Get the cached extractor for a channel, making it if necessary.
+
+        The first time a channel is seen, its extractor is created from the
+        data, and for CSV its header row is written.
+
+        '''
+        if self._format == 'csv':
+            columns, extractor = struct_fields.row_extractor(data)
+            self._csv.writerow(('ts', 'channel') + columns)
+        else:
+            extractor = struct_fields.dict_extractor(data)
+        self._extractors[name] = (type(data), extractor)
+        return extractor
+
     def _open(self):
         if self._is_open:
             return
-        if self._mode == 'w':
+        if self._mode == 'r':
+            if self._format != 'jsonl':
+                raise NotImplementedError
+            self._file = open(self._fn, 'rb')
+            self._read_header()
+            self._load_index()
+            self._sorted = all(self._ts_key(ii) <= self._ts_key(ii + 1) \
+                    for ii in range(len(self._offsets) - 1))
+            self._ind = 0
+            self._is_open = True
+            self._vb_print('Opened file {0} in mode {1}.'.format(self._fn,
+                self._mode))
+            return
+        elif self._mode == 'w':
             flags = 'w'
         else:
             raise NotImplementedError
-        self._file = open(self._fn, flags)
+        self._file = open(self._fn, flags, self._buf_size)
+        self._last_flush = time.time()
+        if self._format == 'csv':
+            self._csv = csv.writer(self._file, lineterminator='\n')
+        elif self._format == 'jsonl':
+            self._write_jsonl_header()
         self._is_open = True
         self._vb_print('Opened file {0} in mode {1}.'.format(self._fn,
             self._mode))
 
+    def _write_csv(self, timestamp, name, data):
+        try:
+            t, extractor = self._extractors[name]
+            if type(data) != t:
+                extractor = self._get_extractor(name, data)
+        except KeyError:
+            extractor = self._get_extractor(name, data)
+        self._csv.writerow((_format_ts(timestamp), name) + extractor(data))
+
+    def _write_jsonl(self, timestamp, name, data):
+        try:
+            t, extractor = self._extractors[name]
+            if type(data) != t:
+                extractor = self._get_extractor(name, data)
+        except KeyError:
+            extractor = self._get_extractor(name, data)
+        self._file.write('{{"ts": {0}, "channel": {1}, "data": {2}}}\n'.format(
+            _format_ts(timestamp), json.dumps(name),
+            json.dumps(extractor(data))))
+
+    def _write_jsonl_header(self):
+        if self._chans:
+            chans = [{'id': c.id, 'name': c.name, 'type': c.type_name} \
+                    for c in self._chans]
+        else:
+            chans = []
+        # Objects in the metadata that are not JSON types are stored as strings
+        self._file.write(json.dumps({'format': self.JSONL_FORMAT,
+            'version': self.JSONL_VERSION, 'meta': self._meta,
+            'channels': chans}, default=str) + '\n')
+
+
+###############################################################################
+## Support for reading JSON Lines logs
+
+# The start of each entry line, up to the time stamp, channel and data
+_TS_PREFIX = b'{"ts": '
+_CHAN_PREFIX = b', "channel": '
+_DATA_PREFIX = b', "data": '
+
+
+class _TSKeys(object):
+    '''A sequence view of the time stamps of a log's index, for bisect.'''
+    def __init__(self, log):
+        self._log = log
+
+    def __getitem__(self, ii):
+        return self._log._ts_key(ii)
+
+    def __len__(self):
+        return len(self._log._offsets)
+
+
+def _format_ts(timestamp):
+    '''Format a time stamp as a number with full precision.'''
+    if type(timestamp) == ilog.EntryTS:
+        return str(timestamp)
+    return repr(timestamp)
+
+
+def _parse_ts(raw):
+    '''Parse a time stamp written by _format_ts into (sec, nsec).'''
+    raw = raw.decode('ascii')
+    if 'e' in raw or 'E' in raw:
+        ts = ilog.EntryTS(time=float(raw))
+        return ts.sec, ts.nsec
+    sec, dot, frac = raw.partition('.')
+    return int(sec), int(frac[:9].ljust(9, '0'))
+
+
+def _ts_key(timestamp):
+    '''Get the (sec, nsec) key of a time stamp given as a float or EntryTS.'''
+    if type(timestamp) != ilog.EntryTS:
+        timestamp = ilog.EntryTS(time=timestamp)
+    return (timestamp.sec, timestamp.nsec)
@@ -0,0 +1,230 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Creation of the RTC trees used by the commands, and the cache of trees kept
+by the daemon.
+
+'''
+
+
+import os
+import time
+
+
+# The ORB used by new trees, or None for each tree to make its own
+_orb = None
+# The cache trees are taken from, or None to make a new tree every time
+_cache = None
+
+
+def set_orb(orb):
+    '''Set the ORB used by the trees made from now on.
+
+    A tree does not shut down an ORB it was given, so the ORB stays ready for
+    the next tree. Set to None to have each tree make and shut down its own.
+
+    '''
+    global _orb
+    _orb = orb
+
+
+def set_cache(cache):
+    '''Set the TreeCache that trees are taken from.
+
+    The cache must only be used with a shared ORB (see set_orb()). Set to
+    None to make a new tree every time.
+
+    '''
+    global _cache
+    _cache = cache
+
+
+def make_tree(servers=None, paths=None, filter=[]):
+    '''Make an RTCTree, or take it from the cache.
+
+    The parameters are those of rtctree.tree.RTCTree.
+
+    '''
+    if _cache is None:
+        return _new_tree(servers, paths, filter)
+    return _cache.get(servers, paths, filter)
+
+
+def _new_tree(servers, paths, filter):
+    import rtctree.tree
+    return rtctree.tree.RTCTree(servers=servers, paths=paths, orb=_orb,
+            filter=filter)
+
+
+def _used_paths(paths, filter):
+    # The paths a command will use its tree for: those it was filtered to,
+    # otherwise those it was made from, otherwise the whole tree
+    if filter:
+        return [list(p) for p in filter]
+    if paths:
+        if isinstance(paths[0], (list, tuple)):
+            return [list(p) for p in paths]
+        return [list(paths)]
+    return [['/']]
+
+
+def _freeze(value):
+    # A hashable copy of a list of paths, for use in a cache key
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+###############################################################################
+## Tree cache
+##
+## A tree made from a set of servers, paths and filter is kept and returned
+## for the same parameters until it is older than the time to live. Because
+## each tree only holds the objects its command asked for, the trees are
+## small and each command's tree is kept separately. The name servers from
+## the environment are part of the key, as the tree depends on them.
+##
+## Cached objects go out of date when they are changed. The cache remembers
+## the trees taken by the current command (since begin() was called) and the
+## paths they were taken for, and only the objects at those paths are
+## updated. When a command changes a component, refresh() reparses that
+## component in every tree holding it. When a command removes objects,
+## remove() takes them out of every tree holding them. When a command fails,
+## invalidate() reparses the objects it used in every tree holding them. A
+## tree is only dropped, to be made again from the name servers on next use,
+## when an object in it cannot be updated this way.
+
+class TreeCache(object):
+    def __init__(self, ttl, *args, **kwargs):
+        '''Constructor.
+
+        @param ttl The time in seconds to keep a tree for.
+
+        '''
+        super(TreeCache, self).__init__()
+        self._ttl = ttl
+        self._trees = {}
+        self._taken_keys = []
+        self._taken_paths = []
+
+    def __len__(self):
+        return len(self._trees)
+
+    @property
+    def ttl(self):
+        '''The time in seconds a tree is kept for.'''
+        return self._ttl
+
+    def get(self, servers=None, paths=None, filter=[]):
+        '''Get a tree from the cache, making it if necessary.
+
+        The parameters are those of rtctree.tree.RTCTree.
+
+        '''
+        from rtctree import NAMESERVERS_ENV_VAR
+        now = time.time()
+        self._expire(now)
+        key = (_freeze(servers), _freeze(paths), _freeze(filter),
+                os.environ.get(NAMESERVERS_ENV_VAR))
+        self._taken_keys.append(key)
+        self._taken_paths += _used_paths(paths, filter)
+        if key in self._trees:
+            return self._trees[key][0]
+        tree = _new_tree(servers, paths, filter)
+        self._trees[key] = (tree, now)
+        return tree
+
+    def begin(self):
+        '''Start a new command, forgetting the trees taken so far.'''
+        self._taken_keys = []
+        self._taken_paths = []
+
+    def clear(self):
+        '''Drop every tree.'''
+        self._trees = {}
+
+    def invalidate(self):
+        '''Reparse, in every tree, the objects at the paths the trees taken
+        by the current command were taken for.
+
+        Trees holding an object that cannot be reparsed, and trees taken by
+        the current command that do not hold one of the paths, are dropped.
+
+        '''
+        for key, (tree, made) in list(self._trees.items()):
+            for p in self._taken_paths:
+                if not self._holds(tree, p):
+                    if key in self._taken_keys:
+                        # The object may have been added since
+                        del self._trees[key]
+                        break
+                    continue
+                try:
+                    tree.get_node(p).reparse()
+                except Exception:
+                    del self._trees[key]
+                    break
+
+    def remove(self):
+        '''Remove, from every tree, the objects at the paths the trees taken
+        by the current command were taken for.
+
+        Trees in which one of the paths is the root are dropped.
+
+        '''
+        for key, (tree, made) in list(self._trees.items()):
+            for p in self._taken_paths:
+                if not self._holds(tree, p):
+                    continue
+                node = tree.get_node(p)
+                if node.parent is None:
+                    del self._trees[key]
+                    break
+                node.parent.remove_child(node)
+
+    def refresh(self):
+        '''Reparse, in every tree, the components at the paths the trees
+        taken by the current command were taken for.
+
+        Trees holding any other kind of object at one of the paths, or a
+        component that cannot be reparsed, are dropped.
+
+        '''
+        for key, (tree, made) in list(self._trees.items()):
+            for p in self._taken_paths:
+                if not self._holds(tree, p):
+                    continue
+                node = tree.get_node(p)
+                if not node.is_component:
+                    del self._trees[key]
+                    break
+                try:
+                    node.reparse()
+                except Exception:
+                    del self._trees[key]
+                    break
+
+    def _expire(self, now):
+        for key, (tree, made) in list(self._trees.items()):
+            if now - made >= self._ttl:
+                del self._trees[key]
+
+    def _holds(self, tree, path):
+        path = [p for p in path if p]
+        return bool(path) and tree.has_path(path)
+
+
+# vim: tw=79
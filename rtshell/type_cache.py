@@ -0,0 +1,211 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Persistent cache of the modules providing data types.
+
+'''
+
+
+from __future__ import print_function
+
+import json
+import os
+import os.path
+import sys
+import tempfile
+
+
+# Version of the cache file's format; files of other versions are ignored
+CACHE_VERSION = 1
+# Name of the cache file, in the cache directory
+CACHE_FILE = 'types.json'
+# Set this environment variable to any value to disable the cache
+DISABLE_VAR = 'RTSHELL_NO_TYPE_CACHE'
+
+
+def cache_dir():
+    '''Get the directory holding rtshell's cache files for the user.
+
+    This is $XDG_CACHE_HOME/rtshell (by default ~/.cache/rtshell), or
+    %LOCALAPPDATA%\\rtshell on Windows.
+
+    '''
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME')
+    if not base:
+        base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'rtshell')
+
+
+def user_cache(verbose=False):
+    '''Get the user's type cache.
+
+    @param verbose Print information about the cache to stderr.
+    @return A TypeCache, or None if the user has disabled the cache by
+            setting the DISABLE_VAR environment variable.
+
+    '''
+    if DISABLE_VAR in os.environ:
+        return None
+    return TypeCache(verbose=verbose)
+
+
+###############################################################################
+## Type cache
+##
+## Records, for each data type name that has been found, the modules that had
+## to be imported to find it, with the path and modification time of each
+## module's file. An entry is only used if every module file is unchanged.
+## Module names that failed to import are also recorded, with the
+## modification times of the directories on the module search path; if any
+## of these changes (for example, because a module was installed), the
+## failure is forgotten and the import is tried again.
+##
+## The cache is written whenever it changes, which happens only when a type or
+## module is seen for the first time. Any error reading or writing the file is
+## ignored: the cache only saves time.
+
+class TypeCache(object):
+    def __init__(self, path=None, verbose=False, *args, **kwargs):
+        '''Constructor.
+
+        @param path The path of the cache file. If None, CACHE_FILE in the
+                    user's cache directory is used.
+        @param verbose Print information about the cache to stderr.
+
+        '''
+        super(TypeCache, self).__init__()
+        if path is None:
+            path = os.path.join(cache_dir(), CACHE_FILE)
+        self._path = path
+        self._verb = verbose
+        self._types = {}
+        self._failed = {}
+        self._search_path = None
+        self._read()
+
+    @property
+    def path(self):
+        '''The path of the cache file.'''
+        return self._path
+
+    def modules(self, type_name):
+        '''Get the modules to import to find a type.
+
+        @param type_name The name of the type, as given to
+                         ModuleMgr.find_class.
+        @return A list of module names, or None if the type is not in the
+                cache or one of its modules has changed.
+
+        '''
+        entry = self._types.get(type_name)
+        if entry is None:
+            return None
+        for name, path, mtime in entry:
+            if _mtime(path) != mtime:
+                if self._verb:
+                    print('Module {0} has changed; ignoring the cached '
+                            'modules for type {1}'.format(name, type_name),
+                            file=sys.stderr)
+                self.forget(type_name)
+                return None
+        return [name for name, path, mtime in entry]
+
+    def add_type(self, type_name, mods):
+        '''Record the modules to import to find a type.
+
+        @param type_name The name of the type.
+        @param mods The modules, as a list of (name, module object).
+
+        '''
+        entry = []
+        for name, mod in mods:
+            path = getattr(mod, '__file__', None)
+            if path is None:
+                # Built-in modules cannot be checked for changes
+                return
+            entry.append([name, path, _mtime(path)])
+        if self._types.get(type_name) != entry:
+            self._types[type_name] = entry
+            self._write()
+
+    def forget(self, type_name):
+        '''Remove a type from the cache.'''
+        if self._types.pop(type_name, None) is not None:
+            self._write()
+
+    def failed(self, mod_name):
+        '''Check if a module is known to fail to import.'''
+        return self._failed.get(mod_name) == self._get_search_path()
+
+    def add_failure(self, mod_name):
+        '''Record that a module failed to import.'''
+        search_path = self._get_search_path()
+        if self._failed.get(mod_name) != search_path:
+            self._failed[mod_name] = search_path
+            self._write()
+
+    def _get_search_path(self):
+        # The search path does not change while a tool is looking up types
+        if self._search_path is None:
+            self._search_path = [[p, _mtime(p or '.')] for p in sys.path]
+        return self._search_path
+
+    def _read(self):
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(data, dict) or \
+                data.get('version') != CACHE_VERSION:
+            return
+        self._types = data.get('types', {})
+        self._failed = data.get('failed', {})
+
+    def _write(self):
+        data = {'version': CACHE_VERSION, 'types': self._types,
+                'failed': self._failed}
+        d = os.path.dirname(self._path)
+        try:
+            if not os.path.isdir(d):
+                os.makedirs(d)
+            # Write a new file and rename it over the old one, so that other
+            # tools never read a partly-written file
+            fd, tmp = tempfile.mkstemp(dir=d, prefix='.' + CACHE_FILE)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            _replace(tmp, self._path)
+        except (IOError, OSError) as e:
+            if self._verb:
+                print('Failed to write the type cache {0}: {1}'.format(
+                    self._path, e), file=sys.stderr)
+
+
+# Renaming over an existing file needs os.replace on Windows
+_replace = getattr(os, 'replace', os.rename)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+# vim: tw=79
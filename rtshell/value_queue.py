@@ -0,0 +1,148 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Bounded queue of values passed from a reader thread to a component.
+
+'''
+
+
+import collections
+import threading
+import time
+
+
+# Default number of values that can be waiting to be written
+DEFAULT_SIZE = 1024
+# What to do with a new value when the queue is full: wait for space, discard
+# the oldest value waiting, or discard the new value
+OVERFLOW_POLICIES = ['block', 'drop-oldest', 'drop-newest']
+# Longest time a wait is allowed to block for, so that Ctrl-C is noticed
+_WAIT_SLICE = 0.5
+
+
+###############################################################################
+## Value queue
+##
+## Values are held in a deque, so adding and removing them is O(1) regardless
+## of how many are waiting. The producer (the thread reading standard input)
+## and consumer (the component's execution context) never poll: each waits on
+## a condition variable that the other notifies when it changes the queue.
+##
+## A value removed from the queue has not necessarily been written yet, so,
+## as with Queue.task_done(), the consumer calls done() once it has finished
+## with each value it removed. The queue is only drained when it is empty and
+## every value removed from it is done.
+
+class ValueQueue(object):
+    def __init__(self, size=DEFAULT_SIZE, overflow='block', *args, **kwargs):
+        '''Constructor.
+
+        @param size The maximum number of values waiting to be written. Set
+                    to 0 for no limit.
+        @param overflow The policy applied when a value is added to a full
+                        queue (one of OVERFLOW_POLICIES).
+
+        '''
+        super(ValueQueue, self).__init__()
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('Unknown overflow policy: {0}'.format(overflow))
+        self._size = size
+        self._overflow = overflow
+        self._vals = collections.deque()
+        self._mutex = threading.Lock()
+        self._not_full = threading.Condition(self._mutex)
+        self._not_empty = threading.Condition(self._mutex)
+        self._empty = threading.Condition(self._mutex)
+        self._dropped = 0
+        self._in_flight = 0
+
+    def __len__(self):
+        with self._mutex:
+            return len(self._vals)
+
+    @property
+    def dropped(self):
+        '''The number of values discarded because the queue was full.'''
+        with self._mutex:
+            return self._dropped
+
+    def put(self, val):
+        '''Add a value, applying the overflow policy if the queue is full.'''
+        with self._not_full:
+            if self._size > 0 and len(self._vals) >= self._size:
+                if self._overflow == 'drop-newest':
+                    self._dropped += 1
+                    return
+                elif self._overflow == 'drop-oldest':
+                    self._vals.popleft()
+                    self._dropped += 1
+                else:
+                    while len(self._vals) >= self._size:
+                        self._not_full.wait(_WAIT_SLICE)
+            self._vals.append(val)
+            self._not_empty.notify()
+
+    def get(self, block=False):
+        '''Remove and return the oldest value.
+
+        done() must be called once the value has been used.
+
+        @param block If True, wait for a value if the queue is empty.
+                     Otherwise, IndexError is raised if the queue is empty.
+
+        '''
+        with self._mutex:
+            if block:
+                while not self._vals:
+                    self._not_empty.wait(_WAIT_SLICE)
+            val = self._vals.popleft()
+            self._in_flight += 1
+            self._not_full.notify()
+            return val
+
+    def done(self):
+        '''Mark a value removed by get() as used.'''
+        with self._mutex:
+            if self._in_flight <= 0:
+                raise ValueError('done() called more times than get()')
+            self._in_flight -= 1
+            if not self._vals and not self._in_flight:
+                self._empty.notify_all()
+
+    def wait_empty(self, timeout=None):
+        '''Wait until every value has been removed from the queue and used.
+
+        @param timeout The longest time in seconds to wait, or None to wait
+                       indefinitely.
+        @return True if the queue is drained, False if the timeout passed.
+
+        '''
+        if timeout is not None:
+            end = time.time() + timeout
+        with self._empty:
+            while self._vals or self._in_flight:
+                if timeout is None:
+                    self._empty.wait(_WAIT_SLICE)
+                else:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        break
+                    self._empty.wait(min(remaining, _WAIT_SLICE))
+            return not self._vals and not self._in_flight
+
+
+# vim: tw=79
+
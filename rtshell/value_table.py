@@ -0,0 +1,130 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tables of values prepared before writing, for rtinject's replay from files.
+
+'''
+
+
+import itertools
+import threading
+
+from rtshell import rts_exceptions
+from rtshell import value_queue
+
+
+# Number of loaded chunks that may be waiting to be written
+CHUNKS_AHEAD = 2
+
+
+###############################################################################
+## Value table
+##
+## All values are read and constructed before writing begins, so that taking
+## the next value costs only an index into a list. For files too large to
+## hold in memory, values are instead loaded in chunks by a background thread
+## that stays up to CHUNKS_AHEAD chunks ahead of the writer.
+
+class ValueTable(object):
+    def __init__(self, load, loop=False, chunk_size=0, *args, **kwargs):
+        '''Constructor.
+
+        @param load A function returning an iterator over the values, from
+                    the beginning. It is called again for each loop.
+        @param loop Start again from the first value after the last.
+        @param chunk_size The number of values to load at a time in the
+                          background. If 0, all values are loaded now.
+
+        '''
+        super(ValueTable, self).__init__()
+        self._load = load
+        self._loop = loop
+        self._chunk_size = chunk_size
+        self._ii = 0
+        self._done = False
+        if chunk_size:
+            self._chunks = value_queue.ValueQueue(size=CHUNKS_AHEAD)
+            self._error = None
+            self._loader = threading.Thread(target=self._load_chunks)
+            self._loader.daemon = True
+            self._loader.start()
+            # Wait for the first chunk, so that errors are found now
+            self._vals = []
+            self._next_chunk()
+        else:
+            self._vals = list(load())
+            if not self._vals:
+                raise rts_exceptions.NoValuesError
+
+    def next(self):
+        '''Get the next value.
+
+        Raises StopIteration after the last value if not looping.
+
+        '''
+        try:
+            val = self._vals[self._ii]
+        except IndexError:
+            self._next_chunk()
+            val = self._vals[0]
+        self._ii += 1
+        return val
+
+    __next__ = next
+
+    def __iter__(self):
+        return self
+
+    def _next_chunk(self):
+        '''Move to the next chunk of values, or back to the start.'''
+        if self._done:
+            raise StopIteration
+        if self._chunk_size:
+            chunk = self._chunks.get(block=True)
+            self._chunks.done()
+            if chunk is None:
+                self._done = True
+                if self._error is not None:
+                    raise self._error
+                raise StopIteration
+            self._vals = chunk
+        elif not self._loop:
+            raise StopIteration
+        self._ii = 0
+
+    def _load_chunks(self):
+        try:
+            loaded = False
+            while True:
+                vals = self._load()
+                while True:
+                    chunk = list(itertools.islice(vals, self._chunk_size))
+                    if not chunk:
+                        break
+                    self._chunks.put(chunk)
+                    loaded = True
+                if not loaded:
+                    raise rts_exceptions.NoValuesError
+                if not self._loop:
+                    break
+        except Exception as e:
+            self._error = e
+        # Mark the end of the values
+        self._chunks.put(None)
+
+
+# vim: tw=79
+
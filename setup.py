@@ -436,6 +436,7 @@ setuptools.setup(name='rtshell',
                          'rtpwd = rtshell.rtpwd:main',
                          'rtreset = rtshell.rtreset:main',
                          'rtresurrect = rtshell.rtresurrect:main',
+                         'rtshelld = rtshell.rtshelld:main',
                          'rtstart = rtshell.rtstart:main',
                          'rtstodot = rtshell.rtstodot:main',
                          'rtstop = rtshell.rtstop:main',
@@ -0,0 +1,126 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Benchmark of the time taken to create and delete a generated component, as
+rtprint, rtlog and rtinject do, with a new manager for each component (each
+in a new process, as when the commands are run from the shell) and with a
+manager pool kept running in this process. Needs a running name server.
+
+'''
+
+from __future__ import print_function
+
+import optparse
+import subprocess
+import sys
+import time
+
+from rtshell import comp_mgmt
+from rtshell import gen_comp
+from rtshell import trees
+
+
+# Name of the components made
+_NAME_BASE = 'bench_comp'
+# Run in the new process: make and delete a component with its own manager
+_CHILD = '''
+import time
+from rtshell import comp_mgmt, gen_comp, trees
+tree = trees.make_tree()
+start = time.time()
+name, mgr = comp_mgmt.make_comp({0!r}, tree, gen_comp.GenComp, [])
+comp = comp_mgmt.find_comp_in_mgr(name, mgr)
+created = time.time()
+tree.give_away_orb()
+del tree
+comp_mgmt.shutdown(mgr, comp)
+print(created - start, time.time() - start)
+'''
+
+
+def bench_manager(number):
+    '''Time components made each with their own manager, in new processes.
+
+    @return Lists of the creation times and creation and deletion times.
+
+    '''
+    create, total = [], []
+    for ii in range(number):
+        out = subprocess.check_output([sys.executable, '-c',
+            _CHILD.format(_NAME_BASE)], universal_newlines=True)
+        c, t = [float(x) for x in out.split()[-2:]]
+        create.append(c)
+        total.append(t)
+    return create, total
+
+
+def bench_pool(number):
+    '''Time components made in a manager pool.
+
+    @return The time to start the pool, and lists of the creation times and
+            creation and deletion times.
+
+    '''
+    tree = trees.make_tree()
+    tree.give_away_orb()
+    start = time.time()
+    pool = comp_mgmt.ManagerPool()
+    started = time.time() - start
+    create, total = [], []
+    try:
+        for ii in range(number):
+            start = time.time()
+            name, comp = pool.create_comp(_NAME_BASE, tree, gen_comp.GenComp,
+                    [])
+            create.append(time.time() - start)
+            pool.delete_comp(comp)
+            total.append(time.time() - start)
+    finally:
+        del tree
+        pool.shutdown()
+    return started, create, total
+
+
+def summary(label, times):
+    times = sorted(times)
+    return '{0:24} min {1:8.1f} ms, median {2:8.1f} ms'.format(label,
+            times[0] * 1000, times[len(times) // 2] * 1000)
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('-n', '--number', dest='number', action='store',
+            type='int', default=10,
+            help='Number of components to create. [Default: %default]')
+    options, args = parser.parse_args()
+
+    print('Creating {0} components'.format(options.number))
+    create, total = bench_manager(options.number)
+    print('Manager per component:')
+    print(summary('  create', create))
+    print(summary('  create and delete', total))
+    started, create, total = bench_pool(options.number)
+    print('Manager pool (started in {0:.1f} ms):'.format(started * 1000))
+    print(summary('  create', create))
+    print(summary('  create and delete', total))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim: tw=79
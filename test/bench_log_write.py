@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Micro-benchmark of writing small samples to a SimplePickleLog, comparing
+entries that store the port name and pickled data against entries that
+refer to a channel in the log's channel table.
+
+'''
+
+from __future__ import print_function
+
+import optparse
+import os
+import os.path
+import sys
+import tempfile
+import time
+
+import RTC
+
+import rtshell.ilog
+import rtshell.simpkl_log
+
+
+def write_log(fn, number, channels):
+    name = 'input0'
+    data = RTC.TimedLong(RTC.Time(0, 0), 0)
+    log = rtshell.simpkl_log.SimplePickleLog(filename=fn, mode='w',
+            meta=(time.time(), []), channels=channels)
+    start = time.time()
+    for ii in range(number):
+        data.tm.sec = ii
+        data.data = ii
+        log.write(rtshell.ilog.EntryTS(sec=ii, nsec=0), (name, data))
+    log.close()
+    return time.time() - start
+
+
+def bench(number, channels):
+    fd, fn = tempfile.mkstemp(suffix='.rtlog')
+    os.close(fd)
+    try:
+        # Measure the header size separately so only entries are counted
+        write_log(fn, 0, channels)
+        header = os.path.getsize(fn)
+        duration = write_log(fn, number, channels)
+        size = os.path.getsize(fn) - header
+    finally:
+        os.remove(fn)
+    return size / float(number), duration / number * 1e6
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('-n', '--number', dest='number', action='store',
+            type='int', default=100000,
+            help='Number of entries to write. [Default: %default]')
+    options, args = parser.parse_args()
+
+    chans = [rtshell.ilog.Channel(0, 'input0', type=RTC.TimedLong,
+        type_name=RTC.TimedLong._NP_RepositoryId)]
+    print('Writing {0} RTC.TimedLong entries'.format(options.number))
+    for label, c in [('Port name and pickled data', None),
+            ('Channel table', chans)]:
+        size, us = bench(options.number, c)
+        print('{0}: {1:.1f} bytes/entry, {2:.2f} us/entry'.format(label,
+            size, us))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim: tw=79
@@ -0,0 +1,74 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Micro-benchmark of rtprint's output to a pipe, comparing line-buffered
+output against output buffered once per execution cycle.
+
+'''
+
+from __future__ import print_function
+
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+import rtshell.print_writer
+
+
+def write_lines(number, ports, line_buffered):
+    # Write to a pipe read by another process, as when rtprint is piped
+    p = subprocess.Popen(['cat'], stdin=subprocess.PIPE,
+            stdout=open(os.devnull, 'w'), universal_newlines=True)
+    out = rtshell.print_writer.BufferedWriter(p.stdin,
+            line_buffered=line_buffered)
+    start = time.time()
+    for ii in range(number // ports):
+        for jj in range(ports):
+            out.write('[{0}.000000000] {1}\n'.format(ii, jj))
+        out.end_cycle()
+    out.flush()
+    duration = time.time() - start
+    p.stdin.close()
+    p.wait()
+    return duration
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options]')
+    parser.add_option('-n', '--number', dest='number', action='store',
+            type='int', default=200000,
+            help='Number of values to print. [Default: %default]')
+    parser.add_option('-p', '--ports', dest='ports', action='store',
+            type='int', default=10,
+            help='Number of values printed per cycle. [Default: %default]')
+    options, args = parser.parse_args()
+
+    print('Printing {0} values, {1} per cycle'.format(options.number,
+        options.ports))
+    for label, lb in [('Line-buffered', True), ('Buffered per cycle', False)]:
+        duration = write_lines(options.number, options.ports, lb)
+        print('{0}: {1:.0f} lines/s'.format(label, options.number / duration))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim: tw=79
+
@@ -0,0 +1,121 @@
+#!/usr/bin/env python2
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtshell
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Benchmark of the start-up time of each rtshell command, measured as the wall
+time of a new process running the command's entry point (by default with
+--help, so that no name server is needed). Optionally lists the heavy CORBA
+and OpenRTM modules each command imported, which should be none for --help.
+
+'''
+
+from __future__ import print_function
+
+import optparse
+import os
+import subprocess
+import sys
+import time
+
+
+COMMANDS = ['rtact', 'rtcat', 'rtcheck', 'rtcomp', 'rtcon', 'rtconf',
+        'rtcryo', 'rtdeact', 'rtdel', 'rtdis', 'rtdoc', 'rtexit', 'rtfind',
+        'rtfsm', 'rtinject', 'rtlog', 'rtls', 'rtmgr', 'rtprint', 'rtpwd',
+        'rtreset', 'rtresurrect', 'rtshelld', 'rtstart', 'rtstodot', 'rtstop',
+        'rtteardown', 'rtvlog', 'rtwatch']
+
+# Modules that are slow to import and only needed when talking to components
+HEAVY_MODULES = ['CORBA', 'CosNaming', 'OpenRTM_aist', 'RTC', 'RTM',
+        'SDOPackage', 'omniORB', 'rtctree.tree', 'rtsprofile']
+
+# Marks the list of heavy modules in the output of the new process
+_MARKER = 'Heavy modules:'
+# Run in the new process: import the command and call its main function
+_CHILD = '''
+import sys
+from rtshell import {0} as cmd
+try:
+    cmd.main({1!r})
+except SystemExit:
+    pass
+if {2!r}:
+    heavy = [m for m in sys.modules if sys.modules[m] is not None and
+            any(m == h or m.startswith(h + '.') for h in {3!r})]
+    sys.stderr.write('\\n{4}' + ' '.join(sorted(heavy)))
+'''
+
+
+def run(cmd, args, modules):
+    code = _CHILD.format(cmd, args, modules, HEAVY_MODULES, _MARKER)
+    with open(os.devnull, 'w') as devnull:
+        start = time.time()
+        p = subprocess.Popen([sys.executable, '-c', code], stdout=devnull,
+                stderr=subprocess.PIPE, universal_newlines=True)
+        err = p.communicate()[1]
+        duration = time.time() - start
+    heavy = err.rpartition(_MARKER)[2] if _MARKER in err else ''
+    return duration, heavy.split()
+
+
+def bench(cmd, args, number):
+    times = sorted(run(cmd, args, False)[0] for ii in range(number))
+    return times[0], times[len(times) // 2]
+
+
+def main():
+    parser = optparse.OptionParser(usage='Usage: %prog [options] [command...]')
+    parser.add_option('-a', '--args', dest='args', action='store',
+            type='string', default='--help',
+            help='Arguments to pass to each command. [Default: %default]')
+    parser.add_option('-b', '--budget', dest='budget', action='store',
+            type='float', default=0.0,
+            help='Fail if the median start-up time of any command is above '
+            'this many milliseconds. [Default: no limit]')
+    parser.add_option('-m', '--modules', dest='modules', action='store_true',
+            default=False,
+            help='List the heavy modules imported by each command. '
+            '[Default: %default]')
+    parser.add_option('-n', '--number', dest='number', action='store',
+            type='int', default=10,
+            help='Number of times to start each command. [Default: %default]')
+    options, args = parser.parse_args()
+    cmds = args or COMMANDS
+
+    over = []
+    print('Starting each command {0} times with "{1}"'.format(options.number,
+        options.args))
+    for cmd in cmds:
+        fastest, median = bench(cmd, options.args.split(), options.number)
+        line = '{0:12} min {1:7.1f} ms, median {2:7.1f} ms'.format(cmd,
+                fastest * 1000, median * 1000)
+        if options.modules:
+            heavy = run(cmd, options.args.split(), True)[1]
+            line += ', heavy modules: {0}'.format(
+                    ' '.join(heavy) if heavy else 'none')
+        print(line)
+        if options.budget and median * 1000 > options.budget:
+            over.append(cmd)
+    if over:
+        print('Over the budget of {0:.1f} ms: {1}'.format(options.budget,
+            ' '.join(over)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# vim: tw=79
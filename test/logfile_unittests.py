@@ -20,13 +20,22 @@ Unit tests for the log classes
 
 from __future__ import print_function
 
+import csv
+import json
 import os
 import os.path
 import sys
+import time
 import unittest
 
 import rtshell.ilog
 import rtshell.simpkl_log
+import rtshell.text_log
+
+try:
+    import RTC
+except ImportError:
+    RTC = None
 
 
 METADATA=[1, 'lot', 'of', ('meta', 'data')]
@@ -1369,6 +1378,313 @@ class OtherTests(unittest.TestCase):
             print('===== ===== =====', file=sys.stderr)
 
 
+class ChannelTests(unittest.TestCase):
+    def setUp(self):
+        self.chans = [rtshell.ilog.Channel(0, 'first_channel', type=str),
+                rtshell.ilog.Channel(1, 'second_channel', type=str)]
+        self.entries = [(self.chans[ii % 2].name, d) \
+                for ii, d in enumerate(DATA)]
+
+    def tearDown(self):
+        for fn in ['test.log', 'test_nochans.log']:
+            if os.path.isfile(os.path.join(os.getcwd(), fn)):
+                os.remove(os.path.join(os.getcwd(), fn))
+
+    def write_test_log(self, fn='test.log', channels=None):
+        log = rtshell.simpkl_log.SimplePickleLog(filename=fn, mode='w',
+                meta=METADATA, channels=channels, verbose=VERBOSITY)
+        for t, d in zip(TIMESTAMPS, self.entries):
+            log.write(rtshell.ilog.EntryTS(time=t), d)
+        log.close()
+
+    def test_channel_table(self):
+        self.write_test_log(channels=self.chans)
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='r', verbose=VERBOSITY)
+        self.assertEqual(log.metadata, METADATA)
+        self.assertEqual([(c.id, c.name, c.type, c.codec) \
+                for c in log.channels],
+                [(0, 'first_channel', str, 'raw'),
+                    (1, 'second_channel', str, 'raw')])
+        log.close()
+
+    def test_read_channels(self):
+        self.write_test_log(channels=self.chans)
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='r', verbose=VERBOSITY)
+        for (ii, entry) in enumerate(log):
+            ind, ts, d = entry
+            self.assertEqual(ind, ii)
+            self.assertEqual(type(ts), rtshell.ilog.EntryTS)
+            self.assertEqual(ts, rtshell.ilog.EntryTS(time=TIMESTAMPS[ii]))
+            self.assertEqual(d, self.entries[ii])
+        self.assertEqual(ii, len(DATA) - 1)
+        log.seek(index=3)
+        self.assertEqual(log.read()[0][2], self.entries[3])
+        log.close()
+
+    def test_interned_ids_smaller(self):
+        self.write_test_log(fn='test_nochans.log')
+        self.write_test_log(channels=self.chans)
+        self.assert_(os.path.getsize('test.log') <
+                os.path.getsize('test_nochans.log'))
+
+    def test_delta(self):
+        base = ''.join(chr(ii % 256) for ii in range(4096))
+        values = [base, base, base[:1000] + 'changed' + base[1007:], base,
+                'short', 'short', base, base[:-1] + 'x', base, base]
+        chans = [rtshell.ilog.Channel(0, 'first_channel', type=str,
+            delta=True)]
+        self.entries = [('first_channel', v) for v in values]
+        self.write_test_log(fn='test_nochans.log')
+        self.write_test_log(channels=chans)
+        self.assert_(os.path.getsize('test.log') * 3 <
+                os.path.getsize('test_nochans.log'))
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='r', verbose=VERBOSITY)
+        self.assertEqual(log.channels[0].codec, 'pickle')
+        self.assertEqual([d for ind, ts, d in log], self.entries)
+        # Entries after seeking must reconstruct from the right key frame
+        for ii in [8, 3, 5, 1, 9, 0]:
+            log.seek(index=ii)
+            self.assertEqual(log.read()[0][2], self.entries[ii])
+        log.close()
+
+    def test_unknown_channel(self):
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='w', meta=METADATA, channels=self.chans,
+                verbose=VERBOSITY)
+        self.assertRaises(rtshell.ilog.UnknownChannelError, log.write,
+                TIMESTAMPS[0], ('no_such_channel', DATA[0]))
+        log.close()
+
+
+class VerifyTests(unittest.TestCase):
+    def setUp(self):
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='w', meta=METADATA, verbose=VERBOSITY)
+        for t, d in zip(TIMESTAMPS, DATA):
+            log.write(t, d)
+        log.close()
+        self.chunk_size = rtshell.simpkl_log.VERIFY_CHUNK_SIZE
+
+    def tearDown(self):
+        rtshell.simpkl_log.VERIFY_CHUNK_SIZE = self.chunk_size
+        if os.path.isfile(os.path.join(os.getcwd(), 'test.log')):
+            os.remove(os.path.join(os.getcwd(), 'test.log'))
+
+    def corrupt(self, data):
+        with open('test.log', 'rb') as f:
+            contents = f.read()
+        pos = contents.find(data)
+        with open('test.log', 'r+b') as f:
+            f.seek(pos)
+            f.write(data.upper())
+
+    def test_verify_ok(self):
+        self.assertEqual(rtshell.simpkl_log.verify_log('test.log'),
+                (10, []))
+
+    def test_verify_chunks(self):
+        rtshell.simpkl_log.VERIFY_CHUNK_SIZE = 1
+        self.corrupt('Entry 3')
+        self.corrupt('Val8')
+        checked, bad = rtshell.simpkl_log.verify_log('test.log', jobs=3)
+        self.assertEqual(checked, 10)
+        self.assertEqual([ind for ind, pos in bad], [2, 7])
+
+    def test_verify_fail_fast(self):
+        rtshell.simpkl_log.VERIFY_CHUNK_SIZE = 1
+        self.corrupt('Entry 3')
+        self.corrupt('Val8')
+        checked, bad = rtshell.simpkl_log.verify_log('test.log', jobs=1,
+                fail_fast=True)
+        self.assertEqual([ind for ind, pos in bad], [2])
+
+    def test_read_corrupt(self):
+        self.corrupt('Entry 3')
+        log = rtshell.simpkl_log.SimplePickleLog(filename='test.log',
+                mode='r', verbose=VERBOSITY)
+        # Reading an entry also reads the entry after it
+        self.assertEqual(log.read()[0][2], DATA[0])
+        self.assertRaises(rtshell.ilog.ChecksumError, log.read)
+        log.close()
+
+
+class Time(object):
+    def __init__(self, sec, nsec):
+        self.sec = sec
+        self.nsec = nsec
+
+
+class TimedSeq(object):
+    def __init__(self, tm, data):
+        self.tm = tm
+        self.data = data
+
+
+class TextLogTests(unittest.TestCase):
+    def setUp(self):
+        self.chans = [rtshell.ilog.Channel(0, 'seq', type=TimedSeq,
+            type_name='IDL:TimedSeq:1.0'),
+            rtshell.ilog.Channel(1, 'str', type=str)]
+        self.entries = [('seq', TimedSeq(Time(1, 2), [1, 2])),
+                ('str', 'Val1'), ('seq', TimedSeq(Time(3, 4), [3]))]
+
+    def tearDown(self):
+        for fn in ['test.log', 'test.log.idx']:
+            if os.path.isfile(os.path.join(os.getcwd(), fn)):
+                os.remove(os.path.join(os.getcwd(), fn))
+
+    def write_test_log(self, format):
+        log = rtshell.text_log.TextLog(filename='test.log', mode='w',
+                meta=METADATA, channels=self.chans, format=format,
+                verbose=VERBOSITY)
+        for t, d in zip(TIMESTAMPS, self.entries):
+            log.write(rtshell.ilog.EntryTS(time=t), d)
+        log.close()
+
+    def test_text(self):
+        log = rtshell.text_log.TextLog(filename='test.log', mode='w',
+                meta=METADATA, verbose=VERBOSITY)
+        for t, d in zip(TIMESTAMPS, DATA):
+            log.write(t, d)
+        log.close()
+        with open('test.log') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines, ['{0}\t{1}'.format(t, d) \
+                for t, d in zip(TIMESTAMPS, DATA)])
+
+    def test_csv(self):
+        self.write_test_log('csv')
+        with open('test.log') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows, [
+            ['ts', 'channel', 'tm.sec', 'tm.nsec', 'data'],
+            ['0.200000000', 'seq', '1', '2', '[1, 2]'],
+            ['ts', 'channel', 'value'],
+            ['0.500000000', 'str', 'Val1'],
+            ['1.000000000', 'seq', '3', '4', '[3]']])
+
+    def test_jsonl(self):
+        self.write_test_log('jsonl')
+        with open('test.log') as f:
+            lines = [json.loads(l) for l in f]
+        self.assertEqual(lines[0]['format'], 'rtshell-jsonl')
+        self.assertEqual([(c['id'], c['name'], c['type']) \
+                for c in lines[0]['channels']],
+                [(0, 'seq', 'IDL:TimedSeq:1.0'), (1, 'str', '')])
+        self.assertEqual(lines[1:], [
+            {'ts': 0.2, 'channel': 'seq',
+                'data': {'tm': {'sec': 1, 'nsec': 2}, 'data': [1, 2]}},
+            {'ts': 0.5, 'channel': 'str', 'data': 'Val1'},
+            {'ts': 1.0, 'channel': 'seq',
+                'data': {'tm': {'sec': 3, 'nsec': 4}, 'data': [3]}}])
+
+    def test_check_flush(self):
+        log = rtshell.text_log.TextLog(filename='test.log', mode='w',
+                meta=METADATA, flush_interval=0.1, verbose=VERBOSITY)
+        log.write(TIMESTAMPS[0], DATA[0])
+        log.check_flush()
+        with open('test.log') as f:
+            self.assertEqual(f.read(), '')
+        # Buffered entries are written once the interval has passed, even
+        # if no more entries are written
+        time.sleep(0.2)
+        log.check_flush()
+        with open('test.log') as f:
+            self.assertEqual(f.read().splitlines(),
+                    ['{0}\t{1}'.format(TIMESTAMPS[0], DATA[0])])
+        log.close()
+
+    def test_bad_format(self):
+        self.assertRaises(ValueError, rtshell.text_log.TextLog,
+                filename='test.log', mode='w', format='xml')
+
+    def open_jsonl(self, decode=None):
+        return rtshell.text_log.TextLog(filename='test.log', mode='r',
+                format='jsonl', decode=decode, verbose=VERBOSITY)
+
+    def test_jsonl_read(self):
+        self.write_test_log('jsonl')
+        log = self.open_jsonl()
+        self.assertEqual([(c.id, c.name, c.type_name) for c in log.channels],
+                [(0, 'seq', 'IDL:TimedSeq:1.0'), (1, 'str', '')])
+        self.assertEqual(log.metadata, [1, 'lot', 'of', ['meta', 'data']])
+        self.assertEqual(log.start, (0, rtshell.ilog.EntryTS(time=0.2)))
+        self.assertEqual(log.end, (2, rtshell.ilog.EntryTS(time=1.0)))
+        self.assertEqual(log.pos, (0, rtshell.ilog.EntryTS(time=0.2)))
+        entries = log.read(number=3)
+        self.assertEqual([e[0] for e in entries], [0, 1, 2])
+        self.assertEqual([e[1] for e in entries],
+                [rtshell.ilog.EntryTS(time=t) for t in TIMESTAMPS[:3]])
+        self.assertEqual(entries[0][2], ('seq',
+            {'tm': {'sec': 1, 'nsec': 2}, 'data': [1, 2]}))
+        self.assertEqual(entries[1][2], ('str', 'Val1'))
+        self.assertTrue(log.eof)
+        self.assertEqual(log.pos, (3, rtshell.ilog.EntryTS(time=1.0)))
+        self.assertEqual(log.read(), [])
+        log.close()
+
+    def test_jsonl_seek(self):
+        self.write_test_log('jsonl')
+        log = self.open_jsonl()
+        log.seek(timestamp=0.5)
+        self.assertEqual(log.read()[0][2], ('str', 'Val1'))
+        log.seek(index=0)
+        self.assertEqual([e[0] for e in log.read(timestamp=0.5)], [0, 1])
+        log.rewind()
+        self.assertEqual(log.read()[0][0], 0)
+        log.close()
+
+    def test_jsonl_decode(self):
+        self.write_test_log('jsonl')
+        log = self.open_jsonl(decode=['str'])
+        self.assertEqual([e[2] for e in log.read(number=3)],
+                [('seq', None), ('str', 'Val1'), ('seq', None)])
+        log.close()
+
+    @unittest.skipIf(RTC is None, 'the RTC module is not available')
+    def test_jsonl_octet_seq(self):
+        # Bytes that are not valid as a JSON string under Python 2
+        val = RTC.TimedOctetSeq(RTC.Time(1, 2), b'\xff\x01')
+        log = rtshell.text_log.TextLog(filename='test.log', mode='w',
+                meta=METADATA, channels=[rtshell.ilog.Channel(0, 'oct',
+                    type=RTC.TimedOctetSeq,
+                    type_name='IDL:RTC/TimedOctetSeq:1.0')],
+                format='jsonl', verbose=VERBOSITY)
+        log.write(rtshell.ilog.EntryTS(time=0.2), ('oct', val))
+        log.close()
+        log = self.open_jsonl()
+        name, read = log.read()[0][2]
+        log.close()
+        self.assertEqual(name, 'oct')
+        self.assertEqual((read.tm.sec, read.tm.nsec), (1, 2))
+        self.assertEqual(read.data, b'\xff\x01')
+
+    def test_jsonl_index(self):
+        self.write_test_log('jsonl')
+        self.open_jsonl().close()
+        self.assertTrue(os.path.isfile('test.log.idx'))
+        # The cached index is used while the log is unchanged
+        log = self.open_jsonl()
+        self.assertEqual(log.end[0], 2)
+        log.close()
+        # Changing the log invalidates the index
+        with open('test.log', 'a') as f:
+            f.write('{"ts": 2.5, "channel": "str", "data": "Val2"}\n')
+        log = self.open_jsonl()
+        self.assertEqual(log.end, (3, rtshell.ilog.EntryTS(time=2.5)))
+        log.seek(index=3)
+        self.assertEqual(log.read()[0][2], ('str', 'Val2'))
+        log.close()
+
+    def test_read_unsupported(self):
+        self.write_test_log('csv')
+        self.assertRaises(NotImplementedError, rtshell.text_log.TextLog,
+                filename='test.log', mode='r', format='csv')
+
+
 class TimestampTests(unittest.TestCase):
     def test_lt(self):
         # EntryTS type
@@ -1590,8 +1906,21 @@ def other_suite():
     return unittest.TestLoader().loadTestsFromTestCase(OtherTests)
 
 
+def channel_suite():
+    return unittest.TestLoader().loadTestsFromTestCase(ChannelTests)
+
+
+def verify_suite():
+    return unittest.TestLoader().loadTestsFromTestCase(VerifyTests)
+
+
+def text_suite():
+    return unittest.TestLoader().loadTestsFromTestCase(TextLogTests)
+
+
 def suite():
-    return unittest.TestSuite([write_suite(), read_suite(), other_suite()])
+    return unittest.TestSuite([write_suite(), read_suite(), other_suite(),
+        channel_suite(), verify_suite(), text_suite()])
 
 
 if __name__ == '__main__':
@@ -19,6 +19,7 @@ Tests for the commands.
 '''
 
 
+import json
 import os
 import os.path
 import re
@@ -2164,6 +2165,149 @@ class rtinjectTests(unittest.TestCase):
         self.assertEqual(ret, 0)
         self.assertEqual(self._get_comp_output('std'), '42\n')
 
+    def test_stdin_many(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-n', '-1',
+            '-r', '1000', '-b', '2',
+            '/localhost/local.host_cxt/Std0.rtc:in'],
+            stdin='\n'.join(['RTC.TimedLong({{time}}, {0})'.format(ii) \
+                    for ii in range(10)]))
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        self.assertEqual(self._get_comp_output('std'),
+                ''.join(['{0}\n'.format(ii) for ii in range(10)]))
+
+    def test_input_json(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-n', '-1',
+            '-r', '1000', '-i', 'json',
+            '/localhost/local.host_cxt/Std0.rtc:in'],
+            stdin='{"data": 42}\n{"tm": {"sec": 1, "nsec": 0}, "data": 43}\n'
+            '{"ts": 1.0, "port": "in", "data": {"data": 44}}\n')
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        self.assertEqual(self._get_comp_output('std'), '42\n43\n44\n')
+
+    def test_input_csv(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-n', '-1',
+            '-r', '1000', '-i', 'csv',
+            '/localhost/local.host_cxt/Std0.rtc:in'],
+            stdin='ts,port,tm.sec,tm.nsec,data\n1.0,in,1,0,42\n2.0,in,2,0,43\n')
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        self.assertEqual(self._get_comp_output('std'), '42\n43\n')
+
+    def test_input_bad(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-i', 'json',
+            '/localhost/local.host_cxt/Std0.rtc:in'], stdin='{"data": }\n')
+        self.assertEqual(stdout, '')
+        self.assert_(stderr.startswith('rtinject: Bad input at record 1: '))
+        self.assertEqual(ret, 1)
+
+    def test_generate_counter(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-g', 'counter',
+            '-n', '3', '-r', '100', '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assert_(stdout.startswith('Wrote 3 samples in 3 cycles'))
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'), '0\n1\n2\n')
+
+    def test_generate_burst(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-g',
+            'expr:RTC.TimedLong({time}, {n} * 2)', '--burst', '2', '-n', '4',
+            '-r', '100', '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assert_(stdout.startswith('Wrote 4 samples in 2 cycles'))
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'), '0\n2\n4\n6\n')
+
+    def test_bad_generator(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-g', 'blag',
+            '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr,
+                'rtinject: Bad generator "blag": unknown generator blag')
+        self.assertEqual(ret, 1)
+
+    def test_precise(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-c',
+            'RTC.TimedLong({time}, 42)', '--precise', '-n', '5', '-r', '1000',
+            '--batch', '2', '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assert_(stdout.startswith('Wrote 5 samples in 3 batches'))
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'), '42\n' * 5)
+
+    def test_precise_stdin(self):
+        stdout, stderr, ret = call_process(['./rtinject', '--precise',
+            '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr,
+                'rtinject: --precise requires --const, --generate or '
+                '--from-file')
+        self.assertEqual(ret, 1)
+
+    def _write_values_file(self):
+        with open('./test/inject_values.json', 'w') as f:
+            f.write('{"data": 1}\n{"data": 2}\n{"data": 3}\n')
+
+    def test_from_file(self):
+        self._write_values_file()
+        try:
+            stdout, stderr, ret = call_process(['./rtinject', '-f',
+                './test/inject_values.json', '-i', 'json', '-n', '-1',
+                '-r', '100', '/localhost/local.host_cxt/Std0.rtc:in'])
+        finally:
+            os.remove('./test/inject_values.json')
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'), '1\n2\n3\n')
+
+    def test_from_file_loop(self):
+        self._write_values_file()
+        try:
+            stdout, stderr, ret = call_process(['./rtinject', '-f',
+                './test/inject_values.json', '-i', 'json', '--loop',
+                '--chunk-size', '2', '-n', '7', '-r', '100',
+                '/localhost/local.host_cxt/Std0.rtc:in'])
+        finally:
+            os.remove('./test/inject_values.json')
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'),
+                '1\n2\n3\n1\n2\n3\n1\n')
+
+    def test_from_file_precise(self):
+        # Running out of values ends the schedule normally
+        self._write_values_file()
+        try:
+            stdout, stderr, ret = call_process(['./rtinject', '-f',
+                './test/inject_values.json', '-i', 'json', '-n', '-1',
+                '--precise', '-r', '1000',
+                '/localhost/local.host_cxt/Std0.rtc:in'])
+        finally:
+            os.remove('./test/inject_values.json')
+        self.assert_(stdout.startswith('Wrote 3 samples in 3 batches'))
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        time.sleep(1)
+        self.assertEqual(self._get_comp_output('std'), '1\n2\n3\n')
+
+    def test_bad_buffer_size(self):
+        stdout, stderr, ret = call_process(['./rtinject', '-b', '-1',
+            '/localhost/local.host_cxt/Std0.rtc:in'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtinject: --buffer-size cannot be negative')
+        self.assertEqual(ret, 1)
+
     def test_option(self):
         stdout, stderr, ret = call_process(['./rtinject', '-c',
             'RTC.TimedLong({time}, 42)',
@@ -3051,6 +3195,125 @@ class rtprintTests(unittest.TestCase):
         self.assertEqual(stderr, '')
         self.assertEqual(ret, 0)
 
+    def test_line_buffered(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '--line-buffered'])
+        self.assertEqual(stdout.count('rtctree.rtc.RTC.TimedLong'), 2)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_flush_interval(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '--flush-interval', '10'])
+        # Buffered output is written when the component is deactivated
+        self.assertEqual(stdout.count('rtctree.rtc.RTC.TimedLong'), 2)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_format_json(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '-f', 'json'])
+        records = [json.loads(l) for l in stdout.splitlines()]
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['port'], 'out')
+        self.assertEqual(sorted(records[0]['data'].keys()), ['data', 'tm'])
+        self.assertAlmostEqual(records[0]['ts'],
+                records[0]['data']['tm']['sec'] +
+                records[0]['data']['tm']['nsec'] / 1e9, places=6)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_format_csv(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '-f', 'csv'])
+        lines = stdout.splitlines()
+        self.assertEqual(lines[0], 'ts,port,tm.sec,tm.nsec,data')
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_stats(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-t', '2.5',
+            '--stats-interval', '1'])
+        lines = stdout.splitlines()
+        self.assert_(len(lines) >= 2)
+        self.assert_(lines[0].startswith('out: '))
+        self.assert_(' Hz; interval mean ' in lines[0])
+        self.assert_('latency mean ' in lines[0])
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_aggregate(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-t', '2.5',
+            '-a', '1', '--histogram', '4'])
+        lines = stdout.splitlines()
+        self.assert_(lines[0].startswith('out: '))
+        self.assert_(' stddev ' in lines[0])
+        self.assertEqual(len([l for l in lines[1:5] if l.startswith('  [')]),
+                4)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_latest(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-t', '2',
+            '-r', '2', '--latest'])
+        # At most one value is printed per cycle
+        self.assert_(1 <= stdout.count('RTC.TimedLong') <= 5)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_max_rate(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-t', '2',
+            '--max-rate', '1'])
+        self.assert_(1 <= stdout.count('RTC.TimedLong') <= 3)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_filter(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-t', '2',
+            '--filter', 'data.data < 0'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '--filter', 'port == "out" and data.tm.sec > 0'])
+        self.assertEqual(stdout.count('RTC.TimedLong'), 2)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_bad_filter(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '1',
+            '--filter', 'data.data >'])
+        self.assertEqual(stdout, '')
+        self.assert_(stderr.startswith('rtprint: Bad filter expression'))
+        self.assertEqual(ret, 1)
+
+    def test_bad_every(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '--every', '0'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtprint: --every must be at least 1')
+        self.assertEqual(ret, 1)
+
+    def test_bad_max_items(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '1',
+            '--max-items', '-1'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtprint: --max-items must not be negative')
+        self.assertEqual(ret, 1)
+
     def test_user_mod(self):
         stdout, stderr, ret = call_process(['./rtprint',
             '/localhost/local.host_cxt/C10.rtc:output', '-n', '1',
@@ -3083,6 +3346,62 @@ class rtprintTests(unittest.TestCase):
             '/localhost/local.host_cxt/Output0.rtc:noport')
         self.assertEqual(ret, 1)
 
+    def test_manager_pool(self):
+        # Run rtprint twice in one process, in the same manager
+        code = '''
+from rtshell import comp_mgmt, rtprint
+pool = comp_mgmt.ManagerPool()
+comp_mgmt.set_pool(pool)
+mgr = pool.manager
+for ii in range(2):
+    assert rtprint.main(['/localhost/local.host_cxt/Output0.rtc:out',
+        '-n', '1']) == 0
+    assert pool.names == []
+assert pool.manager is mgr
+pool.shutdown()
+print('done')
+'''
+        stdout, stderr, ret = call_process([sys.executable, '-c', code])
+        self.assertEqual(stdout.count('rtctree.rtc.RTC.TimedLong'), 2)
+        self.assert_(stdout.endswith('done'))
+        self.assertEqual(ret, 0)
+
+    def test_subscription_new(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '--subscription', 'new', '--push-policy', 'new'])
+        self.assertEqual(stdout.count('rtctree.rtc.RTC.TimedLong'), 2)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_subscription_periodic(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '2',
+            '--subscription', 'periodic', '--push-rate', '10',
+            '--buffer-length', '4', '--full-policy', 'overwrite'])
+        self.assertEqual(stdout.count('rtctree.rtc.RTC.TimedLong'), 2)
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_bad_conn_options(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '1',
+            '--push-rate', '10'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtprint: Bad connection options: '
+            '--push-rate requires the periodic subscription type')
+        self.assertEqual(ret, 1)
+
+    def test_unsupported_interface(self):
+        stdout, stderr, ret = call_process(['./rtprint',
+            '/localhost/local.host_cxt/Output0.rtc:out', '-n', '1',
+            '--interface', 'no_such_interface'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtprint: Port does not support the '
+            'no_such_interface interface: /localhost/local.host_cxt/'
+            'Output0.rtc:out')
+        self.assertEqual(ret, 1)
+
 
 def rtprint_suite():
     return unittest.TestLoader().loadTestsFromTestCase(rtprintTests)
@@ -3266,6 +3585,139 @@ def rtresurrect_suite():
     return unittest.TestLoader().loadTestsFromTestCase(rtresurrectTests)
 
 
+class rtshelldTests(unittest.TestCase):
+    _daemon_args = []
+
+    def setUp(self):
+        self._ns = start_ns()
+        self._std = launch_comp('std_comp')
+        wait_for_comp('Std0.rtc')
+        self._dir = tempfile.mkdtemp()
+        self._sock = os.path.join(self._dir, 'daemon.sock')
+        os.environ['RTSHELL_DAEMON_SOCKET'] = self._sock
+        self._daemon = start_process(['./rtshelld', '-f'] +
+                self._daemon_args)
+        for ii in range(40):
+            stdout, stderr, ret = call_process(['./rtshelld', '--status'])
+            if ret == 0:
+                break
+            time.sleep(0.1)
+
+    def tearDown(self):
+        call_process(['./rtshelld', '--stop'])
+        self._daemon.wait()
+        del os.environ['RTSHELL_DAEMON_SOCKET']
+        os.rmdir(self._dir)
+        stop_comp(self._std)
+        stop_ns(self._ns)
+
+    def _in_process(self, args):
+        os.environ['RTSHELL_NO_DAEMON'] = '1'
+        try:
+            return call_process(args)
+        finally:
+            del os.environ['RTSHELL_NO_DAEMON']
+
+    def test_status(self):
+        stdout, stderr, ret = call_process(['./rtshelld', '--status'])
+        self.assert_(stdout.startswith('The rtshell daemon is running on '
+            '{0} (process '.format(self._sock)))
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_already_running(self):
+        stdout, stderr, ret = call_process(['./rtshelld', '-f'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtshelld: The rtshell daemon is already '
+            'running on {0}.'.format(self._sock))
+        self.assertEqual(ret, 1)
+
+    def test_unsafe_dir(self):
+        d = tempfile.mkdtemp()
+        try:
+            os.chmod(d, 0o755)
+            sock = os.path.join(d, 'daemon.sock')
+            stdout, stderr, ret = call_process(['./rtshelld', '-f', '-s',
+                sock])
+            self.assertEqual(stdout, '')
+            self.assertEqual(stderr, 'rtshelld: The socket directory must '
+                'be owned by the user with mode 0700: {0}'.format(d))
+            self.assertEqual(ret, 1)
+            self.assertFalse(os.path.exists(sock))
+        finally:
+            os.rmdir(d)
+
+    def test_same_output(self):
+        args = ['./rtls', '-l', '/localhost/local.host_cxt']
+        self.assertEqual(call_process(args), self._in_process(args))
+        args = ['./rtcat', '/localhost/local.host_cxt/Std0.rtc']
+        self.assertEqual(call_process(args), self._in_process(args))
+
+    def test_error(self):
+        args = ['./rtls', '/localhost/local.host_cxt/NotAComp0.rtc']
+        stdout, stderr, ret = call_process(args)
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, 'rtls: No such object: '
+            '/localhost/local.host_cxt/NotAComp0.rtc')
+        self.assertEqual(ret, 1)
+        self.assertEqual((stdout, stderr, ret), self._in_process(args))
+
+    def test_env(self):
+        os.environ['RTCSH_CWD'] = '/localhost'
+        try:
+            stdout, stderr, ret = call_process(['./rtls'])
+        finally:
+            del os.environ['RTCSH_CWD']
+        self.assertEqual(stdout, 'local.host_cxt/')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+
+    def test_stop(self):
+        stdout, stderr, ret = call_process(['./rtshelld', '--stop'])
+        self.assertEqual(stdout, '')
+        self.assertEqual(stderr, '')
+        self.assertEqual(ret, 0)
+        self._daemon.wait()
+        self.assert_(not os.path.exists(self._sock))
+        stdout, stderr, ret = call_process(['./rtshelld', '--status'])
+        self.assertEqual(stderr, 'rtshelld: The rtshell daemon is not '
+            'running on {0}.'.format(self._sock))
+        self.assertEqual(ret, 1)
+        # Commands still work without the daemon
+        stdout, stderr, ret = call_process(['./rtls', '/localhost'])
+        self.assertEqual(stdout, 'local.host_cxt/')
+        self.assertEqual(ret, 0)
+
+
+class rtshelldCacheTests(rtshelldTests):
+    _daemon_args = ['-t', '60']
+
+    def test_refresh(self):
+        comp = '/localhost/local.host_cxt/Std0.rtc'
+        stdout, stderr, ret = call_process(['./rtcat', comp])
+        self.assertEqual(stdout.split()[1], 'Inactive')
+        stdout, stderr, ret = call_process(['./rtact', comp])
+        self.assertEqual(ret, 0)
+        stdout, stderr, ret = call_process(['./rtcat', comp])
+        self.assertEqual(stdout.split()[1], 'Active')
+        stdout, stderr, ret = call_process(['./rtdeact', comp])
+        self.assertEqual(ret, 0)
+        stdout, stderr, ret = call_process(['./rtls', '-l', comp])
+        self.assertEqual(stdout.split()[0], 'Inactive')
+
+    def test_bad_ttl(self):
+        stdout, stderr, ret = call_process(['./rtshelld', '-t', '-1'])
+        self.assertEqual(stderr,
+            'rtshelld: The tree time to live cannot be negative.')
+        self.assertEqual(ret, 1)
+
+
+def rtshelld_suite():
+    return unittest.TestSuite([
+        unittest.TestLoader().loadTestsFromTestCase(rtshelldTests),
+        unittest.TestLoader().loadTestsFromTestCase(rtshelldCacheTests)])
+
+
 class rtstartTests(unittest.TestCase):
     def setUp(self):
         self._ns = start_ns()
@@ -3663,9 +4115,9 @@ def suite():
         rtconf_suite(), rtcryo_suite(), rtcwd_suite(), rtdel_suite(),
         rtdis_suite(), rtdoc_suite(), rtexit_suite(), rtfind_suite(),
         rtinject_suite(), rtlog_suite(), rtls_suite(), rtmgr_suite(),
-        rtprint_suite(), rtresurrect_suite(), rtstart_suite(),
-        rtstodot_suite(), rtstop_suite(), rtteardown_suite(),
-        rtwatch_suite(), rtfsm_suite()])
+        rtprint_suite(), rtresurrect_suite(), rtshelld_suite(),
+        rtstart_suite(), rtstodot_suite(), rtstop_suite(),
+        rtteardown_suite(), rtwatch_suite(), rtfsm_suite()])
 
 
 if __name__ == '__main__':
@@ -19,11 +19,21 @@ Unit tests.
 '''
 
 
+import json
+import os
+import os.path
+import shutil
+import sys
+import tempfile
 import unittest
+from StringIO import StringIO
 
 import rtshell.port_types
 import rtshell.modmgr
 import rtshell.rts_exceptions
+import rtshell.struct_fields
+import rtshell.trees
+import rtshell.type_cache
 
 import blorg
 
@@ -55,13 +65,43 @@ class TestEvalConst(unittest.TestCase):
         self.mm = rtshell.modmgr.ModuleMgr()
         self.mm.load_mods(['test_mod1'])
 
-    def test_replace_mod_name(self):
-        self.assertEqual(self.mm._repl_mod_name(self.const),
-            'self._mods["test_mod1"].mod.Dummy(4,2)')
+    def test_hoist_literals(self):
+        self.assertEqual(rtshell.modmgr._hoist_literals(self.const),
+            ('test_mod1.Dummy(_rtshell_lits[0],_rtshell_lits[1])', [4, 2]))
+        self.assertEqual(rtshell.modmgr._hoist_literals('x2 + "3" + 0x4'),
+            ('x2 + "3" + 0x4', []))
 
-    def test_replace_time(self):
-        const = 'blurgle({time})'
-        self.assert_(len(rtshell.modmgr._replace_time(const)) > len(const))
+    def test_eval_time(self):
+        t = self.mm.evaluate('{time}')
+        self.assert_(isinstance(t, rtshell.modmgr.RTC.Time))
+
+    def test_eval_triple_quoted(self):
+        self.assertEqual(rtshell.modmgr._hoist_literals("'''it's 5''' * 2"),
+                ("'''it's 5''' * _rtshell_lits[0]", [2]))
+        self.assertEqual(self.mm.evaluate("'''it's 5'''"), "it's 5")
+
+    def test_eval_time_field(self):
+        # The time's argument name is not taken for a module to import
+        self.assertEqual(
+                rtshell.modmgr._find_module_names('_rtshell_time.sec'), [])
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            sec = self.mm.evaluate('{time}.sec')
+            warnings = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assert_(isinstance(sec, int))
+        self.assertEqual(warnings, '')
+
+    def test_eval_cache(self):
+        self.assertEqual(self.mm.evaluate(self.const).param1, 4)
+        self.assertEqual(self.mm.evaluate('test_mod1.Dummy(5,2)').param1, 5)
+        self.assertEqual(len(self.mm._eval_cache), 1)
+        mm = rtshell.modmgr.ModuleMgr(eval_cache_size=2)
+        for e in ['"a"', '"b"', '"a"', '"c"']:
+            mm.evaluate(e)
+        self.assertEqual(list(mm._eval_cache.keys()), ['"a"', '"c"'])
 
     def test_eval_const(self):
         class Data(object):
@@ -72,6 +112,258 @@ class TestEvalConst(unittest.TestCase):
         self.assertEqual(self.mm.evaluate('list((1, 2, 3))'), [1, 2, 3])
 
 
+class TestFindClass(unittest.TestCase):
+    def setUp(self):
+        self.mm = rtshell.modmgr.ModuleMgr()
+        self.mm.load_mods_and_poas(['test_mod1'])
+
+    def test_find_class(self):
+        import test_mod1
+        self.assertEqual(self.mm.find_class('test_mod1.Dummy'),
+                test_mod1.Dummy)
+        self.assertEqual(self.mm.find_class('test_mod1/Dummy'),
+                test_mod1.Dummy)
+        self.assertRaises(rtshell.rts_exceptions.TypeNotFoundError,
+                self.mm.find_class, 'test_mod1.Blurgle')
+
+    def test_index(self):
+        self.mm.find_class('test_mod1.Dummy')
+        self.assertEqual(self.mm._unindexed, [])
+        self.assertEqual([m for m, c in self.mm._classes['Dummy']],
+                ['test_mod1'])
+        # Reloading a module replaces its classes in the index
+        self.mm.load_mod('test_mod1')
+        self.mm.find_class('test_mod1.Dummy')
+        self.assertEqual(len(self.mm._classes['Dummy']), 1)
+
+
+class TestTypeCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rtshell', 'types.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def make_mm(self):
+        return rtshell.modmgr.ModuleMgr(
+                type_cache=rtshell.type_cache.TypeCache(path=self.path))
+
+    def test_record_type(self):
+        self.make_mm().find_class('test_mod1.Dummy')
+        self.assertTrue(os.path.exists(self.path))
+        cache = rtshell.type_cache.TypeCache(path=self.path)
+        self.assertEqual(cache.modules('test_mod1.Dummy'),
+                ['test_mod1', 'test_mod1__POA'])
+        # Types in the RTC module need no imports
+        self.make_mm().find_class('RTC.TimedLong')
+        cache = rtshell.type_cache.TypeCache(path=self.path)
+        self.assertEqual(cache.modules('RTC.TimedLong'), None)
+
+    def test_cached_type(self):
+        self.make_mm().find_class('test_mod1.Dummy')
+        mm = self.make_mm()
+        mm._auto_import = None
+        self.assertEqual(mm.find_class('test_mod1.Dummy').__name__, 'Dummy')
+        self.assertTrue('test_mod1__POA' in mm.loaded_mod_names)
+
+    def test_changed_module(self):
+        self.make_mm().find_class('test_mod1.Dummy')
+        cache = rtshell.type_cache.TypeCache(path=self.path)
+        cache._types['test_mod1.Dummy'][0][2] -= 1
+        self.assertEqual(cache.modules('test_mod1.Dummy'), None)
+        self.assertEqual(rtshell.type_cache.TypeCache(
+            path=self.path).modules('test_mod1.Dummy'), None)
+
+    def test_failed_import(self):
+        mm = self.make_mm()
+        self.assertRaises(rtshell.rts_exceptions.TypeNotFoundError,
+                mm.find_class, 'not_a_module.Dummy')
+        cache = rtshell.type_cache.TypeCache(path=self.path)
+        self.assertTrue(cache.failed('not_a_module'))
+        # A change to the search path invalidates the failure
+        sys.path.insert(0, self.dir)
+        try:
+            cache = rtshell.type_cache.TypeCache(path=self.path)
+            self.assertFalse(cache.failed('not_a_module'))
+        finally:
+            sys.path.remove(self.dir)
+
+    def test_unwritable(self):
+        cache = rtshell.type_cache.TypeCache(path=os.path.join(self.dir,
+            'file', 'types.json'))
+        open(os.path.join(self.dir, 'file'), 'w').close()
+        cache.add_failure('not_a_module')
+        self.assertTrue(cache.failed('not_a_module'))
+
+
+class FakeNode(object):
+    def __init__(self, tree, path):
+        self.tree = tree
+        self.path = path
+        self.is_component = path[-1].endswith('.rtc')
+        self.reparsed = 0
+
+    @property
+    def parent(self):
+        if len(self.path) == 1:
+            return None
+        return self.tree.nodes.get(self.path[:-1])
+
+    def remove_child(self, child):
+        for p in list(self.tree.nodes):
+            if p[:len(child.path)] == child.path:
+                del self.tree.nodes[p]
+
+    def reparse(self):
+        self.reparsed += 1
+
+
+class FakeTree(object):
+    def __init__(self, paths):
+        self.nodes = {}
+        for p in paths:
+            for ii in range(1, len(p) + 1):
+                self.nodes[tuple(p[:ii])] = FakeNode(self, tuple(p[:ii]))
+
+    def has_path(self, path):
+        return tuple(path) in self.nodes
+
+    def get_node(self, path):
+        return self.nodes[tuple(path)]
+
+
+class TestTreeCache(unittest.TestCase):
+    def setUp(self):
+        self.made = []
+        def new_tree(servers, paths, filter):
+            self.made.append(filter)
+            return FakeTree(filter)
+        self.orig_new_tree = rtshell.trees._new_tree
+        rtshell.trees._new_tree = new_tree
+        self.cache = rtshell.trees.TreeCache(60)
+        self.dir = ['/', 'localhost', 'dir']
+        self.comp = ['/', 'localhost', 'dir', 'comp0.rtc']
+
+    def tearDown(self):
+        rtshell.trees._new_tree = self.orig_new_tree
+
+    def get(self, *paths):
+        return self.cache.get(paths=list(paths), filter=list(paths))
+
+    def test_reuse(self):
+        t = self.get(self.comp)
+        self.assertTrue(self.get(self.comp) is t)
+        self.assertFalse(self.get(self.dir) is t)
+        self.assertEqual(len(self.made), 2)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_expire(self):
+        self.cache._ttl = 0
+        t = self.get(self.comp)
+        self.assertFalse(self.get(self.comp) is t)
+
+    def test_refresh(self):
+        t1 = self.get(self.comp)
+        t2 = self.get(self.dir, self.comp)
+        self.cache.begin()
+        self.get(self.comp)
+        self.cache.refresh()
+        self.assertEqual(t1.get_node(self.comp).reparsed, 1)
+        self.assertEqual(t2.get_node(self.comp).reparsed, 1)
+        self.assertEqual(len(self.cache), 2)
+        # Trees holding a changed object that is not a component are dropped
+        mgr = ['/', 'localhost', 'dir', 'manager.mgr']
+        self.get(mgr)
+        self.cache.begin()
+        self.get(mgr)
+        self.cache.refresh()
+        self.assertEqual(len(self.cache), 2)
+        self.assertTrue(self.get(self.comp) is t1)
+
+    def test_invalidate(self):
+        other = ['/', 'localhost', 'dir', 'comp1.rtc']
+        t1 = self.get(self.dir, self.comp)
+        t2 = self.get(other)
+        self.cache.begin()
+        self.get(self.dir)
+        self.cache.invalidate()
+        # Only the objects used are reparsed, in every tree holding them
+        self.assertEqual(t1.get_node(self.dir).reparsed, 1)
+        self.assertEqual(t1.get_node(self.comp).reparsed, 0)
+        self.assertEqual(t2.get_node(self.dir).reparsed, 1)
+        self.assertEqual(t2.get_node(other).reparsed, 0)
+        self.assertEqual(len(self.cache), 3)
+        self.assertTrue(self.get(other) is t2)
+        self.assertTrue(self.get(self.dir, self.comp) is t1)
+
+    def test_invalidate_failed(self):
+        # Trees holding an object that cannot be reparsed are dropped
+        other = ['/', 'localhost', 'dir', 'comp1.rtc']
+        t1 = self.get(self.comp)
+        t2 = self.get(other)
+        def fail():
+            raise Exception('Gone')
+        t1.get_node(self.comp).reparse = fail
+        self.cache.begin()
+        self.get(self.comp)
+        self.cache.invalidate()
+        self.assertEqual(len(self.cache), 1)
+        self.assertTrue(self.get(other) is t2)
+
+    def test_remove(self):
+        other = ['/', 'localhost', 'dir', 'comp1.rtc']
+        t1 = self.get(self.dir, self.comp)
+        t2 = self.get(other)
+        self.cache.begin()
+        self.get(self.comp)
+        self.cache.remove()
+        self.assertFalse(t1.has_path(self.comp))
+        self.assertTrue(t1.has_path(self.dir))
+        self.assertTrue(t2.has_path(other))
+        self.assertEqual(len(self.cache), 3)
+        # Trees in which the root is removed are dropped
+        self.cache.begin()
+        self.get(['/'])
+        self.cache.remove()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_invalidate_missing(self):
+        # A tree without the path it was made for is also dropped
+        self.cache.begin()
+        t = self.cache.get(paths=self.comp, filter=[self.comp])
+        t.nodes = {}
+        self.cache.invalidate()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_unicode_path(self):
+        # Paths are unicode in the daemon under Python 2
+        comp = [unicode(p) for p in self.comp]
+        self.assertEqual(rtshell.trees._used_paths(comp, []), [comp])
+        self.assertEqual(rtshell.trees._used_paths([comp, self.dir], []),
+                [comp, self.dir])
+
+
+class TestStructFields(unittest.TestCase):
+    def setUp(self):
+        import RTC
+        # Not ASCII, so not valid as a string in JSON under Python 2
+        self.val = RTC.TimedOctetSeq(RTC.Time(1, 2), b'\xff\x01')
+
+    def test_octet_seq_dict(self):
+        extract = rtshell.struct_fields.dict_extractor(self.val)
+        plain = json.loads(json.dumps(extract(self.val)))
+        self.assertEqual(plain, {'tm': {'sec': 1, 'nsec': 2},
+            'data': [255, 1]})
+        build = rtshell.struct_fields.builder(type(self.val))
+        self.assertEqual(build(plain).data, b'\xff\x01')
+
+    def test_octet_seq_row(self):
+        columns, extract = rtshell.struct_fields.row_extractor(self.val)
+        self.assertEqual(columns, ('tm.sec', 'tm.nsec', 'data'))
+        self.assertEqual(extract(self.val), (1, 2, [255, 1]))
+
+
 class TestParseTargets(unittest.TestCase):
     def setUp(self):
         self.t1 = '/localhost/my.host_cxt/comp0.rtc:input0.namae#blorg.format'